@@ -0,0 +1,61 @@
+"""
+Times sending a message with a large attachment to the local test sink
+with DATA against BDAT chunks, for servers advertising CHUNKING
+
+Usage
+-------
+    python benchmarks/bdat_vs_data.py [--size-mb 10] [--runs 5] [--chunk-kb 1024]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import emailee  # noqa: E402
+from tests.smtp_sink import SMTPSink  # noqa: E402
+
+
+def _timeSends(attachment: str, chunkSize: int, runs: int) -> float:
+    # CHUNKING is always advertised, chunkSize 0 sends with DATA regardless
+    timings = []
+    with SMTPSink(extensions=["CHUNKING"]) as sink:
+        for _ in range(runs):
+            mail = emailee.Emailee()
+            mail.sender("fake.sender@fakeemail.com")
+            mail.sendTo(["fake.receiver@fakeemail.com"])
+            mail.attachmentFiles([attachment])
+            mail.server(sink.host, port=sink.port, timeout=60, chunkSize=chunkSize)
+            start = time.perf_counter()
+            mail.send()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--chunk-kb", type=int, default=1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        attachment = os.path.join(directory, "attachment.bin")
+        with open(attachment, "wb") as file:
+            file.write(os.urandom(int(args.size_mb * 1024 * 1024)))
+
+        results = {
+            "DATA": _timeSends(attachment, 0, args.runs),
+            "BDAT": _timeSends(attachment, args.chunk_kb * 1024, args.runs),
+        }
+    for name, elapsed in results.items():
+        print(f"{name}: median {elapsed * 1000:7.1f}ms per {args.size_mb:g}MB send")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Times `import emailee` in fresh interpreters and lists the heavy stdlib
+modules it loads, to guard the lazy loading in emailee/__init__.py
+
+Usage
+-------
+    python benchmarks/import_time.py [--runs 20] [--max-ms 50]
+
+Exits non-zero if the median import time is over --max-ms, or if
+importing emailee loads smtplib, the MIME classes or multiprocessing
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+HEAVY_MODULES = ["smtplib", "ssl", "email.mime.multipart", "multiprocessing"]
+
+SCRIPT = f"""
+import sys, time
+start = time.perf_counter()
+import emailee
+elapsed = time.perf_counter() - start
+print(elapsed * 1000, ' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+"""
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    root = str(Path(__file__).resolve().parent.parent)
+    timings = []
+    loaded = set()
+    for _ in range(args.runs):
+        result = subprocess.run(
+            [sys.executable, "-c", SCRIPT],
+            cwd=root,
+            stdout=subprocess.PIPE,
+            check=True,
+        )
+        fields = result.stdout.decode().split()
+        timings.append(float(fields[0]))
+        loaded.update(fields[1:])
+
+    median = statistics.median(timings)
+    print(f"import emailee: median {median:.1f}ms, min {min(timings):.1f}ms")
+    print(f"heavy modules loaded: {', '.join(sorted(loaded)) or 'none'}")
+
+    if loaded or (args.max_ms is not None and median > args.max_ms):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
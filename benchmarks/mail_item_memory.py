@@ -0,0 +1,62 @@
+"""
+Compares the memory and pickled size of mail items held as dicts
+against MailItem objects, per item
+
+Usage
+-------
+    python benchmarks/mail_item_memory.py [--items 100000]
+"""
+
+import argparse
+import pickle
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import emailee  # noqa: E402
+
+
+def _mailDict(index: int) -> dict:
+    return {
+        "sender": "fake.sender@fakeemail.com",
+        "replyTo": "",
+        "subject": "Campaign email",
+        "msgText": "Raw text email for testing emailee",
+        "msgHTML": "",
+        "to": [f"receiver{index}@fakeemail.com"],
+        "cc": [],
+        "bcc": [],
+        "ignoreErrors": False,
+        "attachmentFiles": [],
+    }
+
+
+def _measure(build, items: int):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    mailList = [build(index) for index in range(items)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    pickled = sum(len(pickle.dumps(mailItem)) for mailItem in mailList[:1000])
+    return used / items, pickled / min(items, 1000)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100000)
+    args = parser.parse_args()
+
+    results = {
+        "dict": _measure(_mailDict, args.items),
+        "MailItem": _measure(
+            lambda index: emailee.MailItem.fromDict(_mailDict(index)), args.items
+        ),
+    }
+    for name, (memory, pickled) in results.items():
+        print(f"{name:>8}: {memory:7.0f} bytes in memory, {pickled:5.0f} bytes pickled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares the memory held by a mail merge's mail list, with every body
+filled in up front, against MailMerge's column arrays and shared template
+
+Usage
+-------
+    python benchmarks/merge_memory.py [--rows 50000] [--body-kb 20]
+"""
+
+import argparse
+import io
+import string
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import emailee  # noqa: E402
+
+SENDER = "fake.sender@fakeemail.com"
+
+
+def _csv(rows: int) -> str:
+    lines = ["email,name,company"]
+    lines += [f"receiver{n}@fakeemail.com,Name {n},Company {n}" for n in range(rows)]
+    return "\n".join(lines) + "\n"
+
+
+def _expanded(csvText: str, template: str) -> list:
+    # the usual mail list, one dict with its own rendered body per row
+    rows = csvText.splitlines()[1:]
+    mailList = []
+    for row in rows:
+        email, name, company = row.split(",")
+        body = string.Template(template).substitute(name=name, company=company)
+        mailList.append(
+            {"sender": SENDER, "subject": f"Hi {name}", "msgHTML": body, "to": [email]}
+        )
+    return mailList
+
+
+def _merge(csvText: str, template: str) -> emailee.MailMerge:
+    return emailee.MailMerge(
+        io.StringIO(csvText, newline=""), SENDER, subject="Hi $name", msgHTML=template
+    )
+
+
+def _measure(build, *args) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build(*args)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del held
+    return used / 1024 / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--body-kb", type=int, default=20)
+    args = parser.parse_args()
+
+    csvText = _csv(args.rows)
+    paragraph = "<p>Dear $name of $company, thank you for your order.</p>\n"
+    template = paragraph * max(1, args.body_kb * 1024 // len(paragraph))
+    for name, build in (("expanded", _expanded), ("MailMerge", _merge)):
+        print(f"{name:>9}: {_measure(build, csvText, template):8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
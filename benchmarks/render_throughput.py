@@ -0,0 +1,58 @@
+"""
+Compares rendering a mail list to .eml files one by one in this process
+against renderMailList() across a pool of processes
+
+Usage
+-------
+    python benchmarks/render_throughput.py [--emails 5000] [--processes 0] [--chunk 250]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import emailee  # noqa: E402
+from emailee.emailee import _helperEmaileeFromDict  # noqa: E402
+from tests.smtp_sink import fakeMailList  # noqa: E402
+
+
+def _serial(mailList: list, directory: str) -> float:
+    # the loop over Emailee._generate() renderMailList replaces
+    start = time.perf_counter()
+    for index, mailItem in enumerate(mailList):
+        with open(os.path.join(directory, f"{index}.eml"), "w") as file:
+            file.write(_helperEmaileeFromDict(mailItem)._generate())
+    return len(mailList) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--emails", type=int, default=5000)
+    parser.add_argument("--processes", type=int, default=0, help="0 for one per CPU")
+    parser.add_argument("--chunk", type=int, default=250)
+    args = parser.parse_args()
+
+    html = "<p>Emailee render benchmark</p>\n" * 200
+    mailList = [dict(mailItem, msgHTML=html) for mailItem in fakeMailList(args.emails)]
+    with tempfile.TemporaryDirectory() as directory:
+        serial = _serial(mailList, directory)
+    for outputFormat in ("eml", "mbox"):
+        with tempfile.TemporaryDirectory() as directory:
+            report = emailee.renderMailList(
+                mailList,
+                directory,
+                outputFormat=outputFormat,
+                maxProcesses=args.processes or None,
+                chunkSize=args.chunk,
+            )
+        print(f"renderMailList {outputFormat}: {report['messagesPerSecond']} msg/s")
+    print(f"serial _generate(): {serial:.1f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
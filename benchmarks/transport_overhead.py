@@ -0,0 +1,57 @@
+"""
+Sends the same campaign with AsyncThreads through the null and in-memory
+transports and over SMTP to the local test sink, separating generation and
+dispatch time from the cost of delivering over a socket
+
+Usage
+-------
+    python benchmarks/transport_overhead.py [--emails 2000] [--threads 10]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import emailee  # noqa: E402
+from tests.smtp_sink import SMTPSink, fakeMailList, sinkServer  # noqa: E402
+
+
+def _rate(mailList: list, threads: int, serverDict: dict, **kwargs) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        emails = emailee.AsyncThreads(
+            mailList,
+            serverDict,
+            outputFile=os.path.join(directory, "output.txt"),
+            maxThreads=threads,
+            **kwargs,
+        )
+        elapsed = time.perf_counter() - start
+    assert len(emails.emailReport) == len(mailList), emails.failedReport[:1]
+    return len(mailList) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=10)
+    args = parser.parse_args()
+
+    html = "<p>Emailee transport benchmark</p>\n" * 200
+    mailList = [dict(item, msgHTML=html) for item in fakeMailList(args.emails)]
+    null = _rate(mailList, args.threads, {}, transport=emailee.NullTransport())
+    memory = _rate(mailList, args.threads, {}, transport=emailee.MemoryTransport())
+    with SMTPSink() as sink:
+        smtp = _rate(mailList, args.threads, sinkServer(sink.port))
+    print(f"NullTransport:   {null:.1f} msg/s")
+    print(f"MemoryTransport: {memory:.1f} msg/s")
+    print(f"SMTP test sink:  {smtp:.1f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
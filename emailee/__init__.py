@@ -1,5 +1,7 @@
+import sys
+
 from .emailee import Emailee
-from .emailee_async import AsyncMP, AsyncThreads
+from .emailee_types import MailItem, ServerConfig
 
 __version__ = "1.0.0"
 
@@ -7,4 +9,66 @@ __all__ = [
     "Emailee",
     "AsyncThreads",
     "AsyncMP",
+    "Campaign",
+    "MailItem",
+    "ServerConfig",
+    "readRemainder",
+    "renderMailList",
+    "Transport",
+    "SMTPTransport",
+    "MemoryTransport",
+    "NullTransport",
+    "FileTransport",
+    "LMTPTransport",
+    "UnixSMTPTransport",
+    "SendmailTransport",
+    "MailMerge",
 ]
+
+# lazily loaded names and the modules they're loaded from
+_LAZY = {
+    "AsyncThreads": "emailee_async",
+    "AsyncMP": "emailee_async",
+    "Campaign": "emailee_async",
+    "readRemainder": "emailee_shutdown",
+    "renderMailList": "emailee_render",
+    "Transport": "emailee_transport",
+    "SMTPTransport": "emailee_transport",
+    "MemoryTransport": "emailee_transport",
+    "NullTransport": "emailee_transport",
+    "FileTransport": "emailee_transport",
+    "LMTPTransport": "emailee_transport",
+    "UnixSMTPTransport": "emailee_transport",
+    "SendmailTransport": "emailee_transport",
+    "MailMerge": "emailee_merge",
+}
+
+if sys.version_info >= (3, 7):
+    # the async classes pull in threading and multiprocessing, so they're
+    #  only imported when first used (PEP 562)
+    def __getattr__(name):
+        if name in _LAZY:
+            import importlib
+
+            module = importlib.import_module(f".{_LAZY[name]}", __name__)
+            return getattr(module, name)
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    def __dir__():
+        return sorted(list(globals()) + list(_LAZY))
+
+else:
+    from .emailee_async import AsyncMP, AsyncThreads, Campaign
+    from .emailee_merge import MailMerge
+    from .emailee_render import renderMailList
+    from .emailee_shutdown import readRemainder
+    from .emailee_transport import (
+        FileTransport,
+        LMTPTransport,
+        MemoryTransport,
+        NullTransport,
+        SendmailTransport,
+        SMTPTransport,
+        Transport,
+        UnixSMTPTransport,
+    )
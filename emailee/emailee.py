@@ -1,15 +1,11 @@
 import enum
-import mimetypes
+import io
+import os
 import re
-import smtplib
-from email.mime.application import MIMEApplication
-from email.mime.audio import MIMEAudio
-from email.mime.image import MIMEImage
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formatdate
 from pathlib import Path
-from typing import BinaryIO, List, TextIO, Union
+from typing import Any, BinaryIO, Dict, List, Optional, TextIO, Tuple, Union
+
+from .emailee_types import _CHUNK_SIZE, _COMPRESS_FORMATS, _COMPRESS_MIN_SIZE
 
 
 def _helperOutputFileCheck(filename: str) -> bool:
@@ -78,10 +74,13 @@ class Emailee:
             port no, encryption type, credentials,
             timeout for server connection timeout in seconds, default 30 seconds,
             increase if on slow connection
+        transport(transport: Transport) - deliver with a Transport, e.g. MemoryTransport
+            or NullTransport, rather than over SMTP to the server
         ready() - will return True if all required fields are entered and valid,
             does not guarantee emails actually exist
-        send(outputFile: str) - attempt to send the email, optional addition of an
-            outputFile to save metadata to. OutputFile is mandatory when sending emails in either async mode
+        send(outputFile: str, dryRun: bool) - attempt to send the email, optional addition of an
+            outputFile to save metadata to. OutputFile is mandatory when sending emails in either async mode.
+            With dryRun the email is generated but not delivered, and measured in dryRunReport
 
     Example
     -------
@@ -100,6 +99,38 @@ class Emailee:
 
     _EMAIL_REGEX = re.compile(r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)")
 
+    # no per instance __dict__, async sends build one Emailee per mail item
+    __slots__ = (
+        "_sender",
+        "_replyTo",
+        "_subject",
+        "_msgText",
+        "_msgHTML",
+        "_to",
+        "_cc",
+        "_bcc",
+        "_attachmentFiles",
+        "_splitOversized",
+        "_compressMinSize",
+        "_compressFormat",
+        "_compressionReport",
+        "_smtpServer",
+        "_port",
+        "_SSLTLS",
+        "_authUsername",
+        "_authPassword",
+        "_timeout",
+        "_chunkSize",
+        "_transport",
+        "_outputFile",
+        "_outputFileReady",
+        "_attachmentData",
+        "_refused",
+        "_wireSaved",
+        "_messageCount",
+        "dryRunReport",
+    )
+
     def __init__(self) -> None:
         self._sender: str = ""
         self._replyTo: str = ""
@@ -110,14 +141,33 @@ class Emailee:
         self._cc: List[str] = []
         self._bcc: List[str] = []
         self._attachmentFiles: List[str] = []
+        self._splitOversized: bool = False
+        # None sends attachments as they are, see compressAttachments()
+        self._compressMinSize: Optional[int] = None
+        self._compressFormat: str = "gzip"
+        # size, ratio and time of each attachment compressed on the last send
+        self._compressionReport: List[Dict[str, Any]] = []
         self._smtpServer: str = ""
         self._port: int = 0
         self._SSLTLS: Union[_EncType, None] = None
         self._authUsername: str = ""
         self._authPassword: str = ""
         self._timeout: int = 30
+        self._chunkSize: int = _CHUNK_SIZE
+        # None sends over SMTP to the server() settings, see transport()
+        self._transport: Any = None
         self._outputFile: str = ""
         self._outputFileReady: bool = False
+        # attachment file contents already read by AsyncMP, by file path
+        self._attachmentData: Dict[str, bytes] = {}
+        # recipients refused by the server on the last send, by address
+        self._refused: Dict[str, Tuple[int, bytes]] = {}
+        # bytes saved on the last send by choosing each text part's encoding
+        self._wireSaved: int = 0
+        # emails the last send was split into to fit the server's SIZE limit
+        self._messageCount: int = 1
+        # wire bytes, CPU time, peak RSS and time taken by the last dry run
+        self.dryRunReport: Dict[str, Any] = {}
 
     def __repr__(self) -> str:
         outputDict = {
@@ -150,7 +200,7 @@ class Emailee:
     def _addressCheck(
         self, emailList: List[str], type: str, ignoreErrors: bool
     ) -> List[str]:
-        self._tempEmailList = []
+        validEmailList = []
         for email in emailList:
             if not isinstance(email, str):
                 raise TypeError(f"{type} email not a string - {email}")
@@ -161,9 +211,9 @@ class Emailee:
                 else:
                     continue
             if ignoreErrors:
-                self._tempEmailList.append(email)
+                validEmailList.append(email)
         if ignoreErrors:
-            return self._tempEmailList
+            return validEmailList
         return emailList
 
     def sender(self, sender: str, replyTo: str = "") -> None:
@@ -225,10 +275,15 @@ class Emailee:
         if not self._to and not self._cc and not self._bcc:
             raise ValueError("No email addresses to send to are properly defined")
 
-    def attachmentFiles(self, attachmentFiles: List[str] = []) -> None:
+    def attachmentFiles(
+        self, attachmentFiles: List[str] = [], splitOversized: bool = False
+    ) -> None:
         if not isinstance(attachmentFiles, list):
             raise TypeError("attachmentFiles not in list format")
 
+        if not isinstance(splitOversized, bool):
+            raise TypeError("splitOversized is not a bool")
+
         for file in attachmentFiles:
             if not isinstance(file, str):
                 raise TypeError(f"file name listed not in string format - {file}")
@@ -239,6 +294,25 @@ class Emailee:
                 )
 
         self._attachmentFiles = attachmentFiles
+        self._splitOversized = splitOversized
+
+    def compressAttachments(
+        self, minSize: int = _COMPRESS_MIN_SIZE, compressFormat: str = "gzip"
+    ) -> None:
+        if not isinstance(minSize, int) or isinstance(minSize, bool):
+            raise TypeError("compression minSize not in integer format")
+
+        if not isinstance(compressFormat, str):
+            raise TypeError("compressFormat not in string format")
+
+        if minSize < 0:
+            raise ValueError("compression minSize cannot be a negative number")
+
+        if compressFormat not in _COMPRESS_FORMATS:
+            raise ValueError("compressFormat must be 'gzip' or 'zip'")
+
+        self._compressMinSize = minSize
+        self._compressFormat = compressFormat
 
     def server(
         self,
@@ -249,6 +323,7 @@ class Emailee:
         authUsername: str = "",
         authPassword: str = "",
         timeout: int = 30,
+        chunkSize: int = _CHUNK_SIZE,
     ) -> None:
         if not isinstance(smtpServer, str):
             raise TypeError("smtpServer name not in string format")
@@ -268,6 +343,9 @@ class Emailee:
         if not isinstance(timeout, int):
             raise TypeError("timeout server option not in integer format")
 
+        if not isinstance(chunkSize, int) or isinstance(chunkSize, bool):
+            raise TypeError("chunkSize server option not in integer format")
+
         if port < 0 or port > 65535:
             raise ValueError("Port is an invalid number")
 
@@ -277,6 +355,9 @@ class Emailee:
         if timeout <= 0:
             raise ValueError("Server timeout period is an invalid number")
 
+        if chunkSize < 0:
+            raise ValueError("chunkSize cannot be a negative number")
+
         self._smtpServer = smtpServer
 
         if port > 0:
@@ -303,6 +384,15 @@ class Emailee:
             self._authPassword = authPassword
 
         self._timeout = timeout
+        self._chunkSize = chunkSize
+
+    def transport(self, transport: Any) -> None:
+        from .emailee_transport import Transport
+
+        if not isinstance(transport, Transport):
+            raise TypeError("transport is not a Transport")
+
+        self._transport = transport
 
     def ready(self) -> bool:
         if self._authPassword and not self._authUsername and self._sender:
@@ -314,15 +404,27 @@ class Emailee:
         if (
             self._sender
             and (self._to or self._cc or self._bcc)
-            and self._smtpServer
-            and self._port
+            and ((self._smtpServer and self._port) or self._transport is not None)
         ):
             # minimum requirements in place to send an email
             return True
         else:
             return False
 
-    def _generate(self) -> str:
+    def _message(
+        self, attachmentFiles: Optional[List[str]] = None, subjectSuffix: str = ""
+    ) -> Any:
+        # the MIME classes are imported on first use to keep importing emailee fast
+        import mimetypes
+        from email.mime.application import MIMEApplication
+        from email.mime.audio import MIMEAudio
+        from email.mime.image import MIMEImage
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        from email.utils import formatdate
+
+        from .emailee_encoding import _textPart
+
         message = MIMEMultipart("mixed")
 
         message["to"] = ", ".join(self._to) if self._to else ""
@@ -330,7 +432,7 @@ class Emailee:
         message["cc"] = ", ".join(self._cc) if self._cc else ""
 
         message["from"] = self._sender
-        message["subject"] = self._subject
+        message["subject"] = self._subject + subjectSuffix
         message["date"] = formatdate(localtime=True)
 
         if self._replyTo:
@@ -339,16 +441,19 @@ class Emailee:
         messageRelated = MIMEMultipart("related")
         messageAlternative = MIMEMultipart("alternative")
 
+        # 8bit parts are re-encoded when sent if the server lacks 8BITMIME
         if self._msgText:
-            messageAlternative.attach(MIMEText(self._msgText, "plain"))
+            messageAlternative.attach(_textPart(self._msgText, "plain"))
         if self._msgHTML:
-            messageAlternative.attach(MIMEText(self._msgHTML, "html"))
+            messageAlternative.attach(_textPart(self._msgHTML, "html"))
 
         messageRelated.attach(messageAlternative)
 
         message.attach(messageRelated)
 
-        for attFile in self._attachmentFiles or []:
+        if attachmentFiles is None:
+            attachmentFiles = self._attachmentFiles
+        for attFile in attachmentFiles or []:
             contentType, encoding = mimetypes.guess_type(attFile)
 
             if contentType is None or encoding is not None:
@@ -357,28 +462,207 @@ class Emailee:
 
             attachment: Union[MIMEText, MIMEImage, MIMEAudio, MIMEApplication]
             fp: Union[TextIO, BinaryIO]
+            filename = Path(attFile).stem
+
+            compressed = None
+            if self._compressMinSize is not None:
+                from .emailee_compress import _compressedAttachment
 
-            if mainType == "text":
-                with open(attFile, "r") as fp:
-                    attachment = MIMEText(fp.read(), _subtype=subType)
+                compressed = _compressedAttachment(
+                    attFile,
+                    self._attachmentData.get(attFile),
+                    self._compressMinSize,
+                    self._compressFormat,
+                )
+
+            if compressed is not None:
+                content, filename, report = compressed
+                self._compressionReport.append(report)
+                attachment = MIMEApplication(content, _subtype=self._compressFormat)
+            elif mainType == "text":
+                if attFile in self._attachmentData:
+                    # already read by AsyncMP, decoded as open(attFile, "r") would
+                    fp = io.TextIOWrapper(io.BytesIO(self._attachmentData[attFile]))
+                else:
+                    fp = open(attFile, "r")
+                with fp:
+                    attachment = _textPart(fp.read(), subType)
             else:
-                with open(attFile, "rb") as fp:
-                    if mainType == "image":
-                        attachment = MIMEImage(fp.read(), _subtype=subType)
-                    elif mainType == "audio":
-                        attachment = MIMEAudio(fp.read(), _subtype=subType)
-                    else:
-                        attachment = MIMEApplication(fp.read(), _subtype=subType)
+                if attFile in self._attachmentData:
+                    content = self._attachmentData[attFile]
+                else:
+                    with open(attFile, "rb") as fp:
+                        content = fp.read()
+                if mainType == "image":
+                    attachment = MIMEImage(content, _subtype=subType)
+                elif mainType == "audio":
+                    attachment = MIMEAudio(content, _subtype=subType)
+                else:
+                    attachment = MIMEApplication(content, _subtype=subType)
 
-            filename = Path(attFile).stem
             attachment.add_header(
                 "Content-Disposition", "attachment; filename=" + filename
             )
             message.attach(attachment)
 
-        return message.as_string()
+        return message
+
+    def _generate(self) -> str:
+        return self._message().as_string()
+
+    def _attachmentSize(self, attFile: str, eightBit: bool) -> int:
+        # encoded size of an attachment, from its file size for binary files
+        import mimetypes
+
+        from .emailee_encoding import _base64WireSize, _encodedSize
+
+        data = self._attachmentData.get(attFile)
+        if self._compressMinSize is not None:
+            from .emailee_compress import _compressedAttachment
+
+            compressed = _compressedAttachment(
+                attFile, data, self._compressMinSize, self._compressFormat
+            )
+            if compressed is not None:
+                return _base64WireSize(len(compressed[0]))
+
+        contentType, encoding = mimetypes.guess_type(attFile)
+        if encoding is None and contentType and contentType.startswith("text/"):
+            if data is None:
+                with open(attFile, "rb") as fp:
+                    data = fp.read()
+            return _encodedSize(data, eightBit)
+        return _base64WireSize(
+            len(data) if data is not None else os.stat(attFile).st_size
+        )
+
+    def _estimateSize(self, attachmentFiles: List[str], eightBit: bool) -> int:
+        """
+        Encoded size of the email with the given attachments, estimated from
+        its body lengths and attachment sizes without generating it, erring
+        slightly over
+        """
+
+        from .emailee_encoding import _PART_OVERHEAD, _encodedSize
+
+        headers = [self._sender, self._replyTo, self._subject] + self._to + self._cc
+        # the mixed, related and alternative multiparts
+        size = 3 * _PART_OVERHEAD + sum(len(value.encode()) + 2 for value in headers)
+        for text in (self._msgText, self._msgHTML):
+            if text:
+                size += _PART_OVERHEAD + _encodedSize(text.encode("utf-8"), eightBit)
+        for attFile in attachmentFiles:
+            size += _PART_OVERHEAD + self._attachmentSize(attFile, eightBit)
+        return size
+
+    def _splitAttachments(self, limit: int, eightBit: bool) -> List[List[str]]:
+        # attachments grouped, largest first, into as few emails as fit within
+        #  limit bytes each, keeping their order within each email
+        capacity = limit - self._estimateSize([], eightBit)
+        sizes = {
+            attFile: self._estimateSize([attFile], eightBit) - (limit - capacity)
+            for attFile in self._attachmentFiles
+        }
+        groups: List[List[str]] = []
+        space: List[int] = []
+        for attFile in sorted(
+            self._attachmentFiles, key=sizes.__getitem__, reverse=True
+        ):
+            if sizes[attFile] > capacity:
+                raise ValueError(
+                    f"Attachment is too large to send within the server's SIZE "
+                    f"limit of {limit} bytes - {attFile}"
+                )
+            for position, free in enumerate(space):
+                if sizes[attFile] <= free:
+                    groups[position].append(attFile)
+                    space[position] -= sizes[attFile]
+                    break
+            else:
+                groups.append([attFile])
+                space.append(capacity - sizes[attFile])
+        order = {
+            attFile: position for position, attFile in enumerate(self._attachmentFiles)
+        }
+        return [sorted(group, key=order.__getitem__) for group in groups]
+
+    def _transmit(self, smtp: Any, rcpts: List[str]) -> Dict[str, Tuple[int, bytes]]:
+        """
+        Send the email over a connected smtp, returning any refused recipients.
+        Where the server advertises a SIZE limit, the email's estimated size is
+        checked against it before it's generated, and an oversized email is
+        either refused or, with splitOversized, its attachments split across
+        as many emails as it takes, each with a (1/N) subject suffix.
+        """
+
+        from .emailee_connect import _sendMessage, _sizeLimit
+        from .emailee_encoding import _wireSavings
+
+        eightBit = smtp.has_extn("8bitmime")
+        limit = _sizeLimit(smtp)
+        groups = [self._attachmentFiles]
+        if limit:
+            estimate = self._estimateSize(self._attachmentFiles, eightBit)
+            if estimate > limit:
+                if not self._splitOversized or len(self._attachmentFiles) < 2:
+                    raise ValueError(
+                        f"Email is about {estimate} bytes, over the server's "
+                        f"SIZE limit of {limit} bytes"
+                    )
+                groups = self._splitAttachments(limit, eightBit)
+
+        self._compressionReport = []
+        refused: Dict[str, Tuple[int, bytes]] = {}
+        saved = 0
+        for part, attachmentFiles in enumerate(groups, 1):
+            suffix = f" ({part}/{len(groups)})" if len(groups) > 1 else ""
+            message = self._message(attachmentFiles, suffix)
+            sizeEstimate = 0
+            if smtp.has_extn("size"):
+                sizeEstimate = self._estimateSize(attachmentFiles, eightBit)
+            refused.update(
+                _sendMessage(
+                    smtp, self._sender, rcpts, message, self._chunkSize, sizeEstimate
+                )
+            )
+            saved += _wireSavings(message)
+        self._wireSaved = saved
+        self._messageCount = len(groups)
+        return refused
+
+    def _deliveryMessage(self) -> Any:
+        # the email as one message, for transports other than SMTP, where
+        #  there's no SIZE limit or 8BITMIME support to work around
+        from .emailee_encoding import _wireSavings
+
+        self._compressionReport = []
+        message = self._message()
+        self._wireSaved = _wireSavings(message)
+        self._messageCount = 1
+        return message
+
+    def _dryRun(self) -> None:
+        # generate the email as send() would, stopping short of delivering
+        #  it or writing to the outputFile, and measure what it took
+        import time
+
+        from .emailee_dryrun import _cpuClock, _dryRunMessage, _peakRSS
+
+        if not self._sender or not (self._to or self._cc or self._bcc):
+            raise ValueError("Email is missing a sender or recipients")
+
+        started = time.monotonic()
+        cpuStarted = _cpuClock()
+        wireBytes = _dryRunMessage(self)
+        self._refused = {}
+        self.dryRunReport = {
+            "bytes": wireBytes,
+            "cpuTime": round(_cpuClock() - cpuStarted, 6),
+            "peakRSS": _peakRSS(),
+            "elapsed": round(time.monotonic() - started, 6),
+        }
 
-    def send(self, outputFile: str = "") -> bool:
+    def send(self, outputFile: str = "", dryRun: bool = False) -> bool:
         if self._authPassword and not self._authUsername and self._sender:
             # this may happen if server methods are invoked before
             #  the sender method AND the person has not added an
@@ -388,6 +672,9 @@ class Emailee:
         if not isinstance(outputFile, str):
             raise TypeError("outputFile path not in string format")
 
+        if not isinstance(dryRun, bool):
+            raise TypeError("dryRun is not a bool")
+
         # run checks against the output file, unless it's already been run
         #  during this run, this is for async batch jobs of emails
         #  where send is called repeatedly
@@ -396,52 +683,66 @@ class Emailee:
                 self._outputFileReady = _helperOutputFileCheck(outputFile)
             self._outputFile = outputFile
 
-        try:
-            generatedEmail: str = self._generate()
-        except Exception as error:
-            raise (error)
-
-        try:
-            smtp: object
-
-            if self._SSLTLS == _EncType.SSL:
-                try:
-                    smtp = smtplib.SMTP_SSL(
-                        self._smtpServer, self._port, timeout=self._timeout
-                    )
-                except Exception as error:
-                    raise ValueError(error)
-            else:
-                try:
-                    smtp = smtplib.SMTP(
-                        self._smtpServer, self._port, timeout=self._timeout
-                    )
-                except Exception as error:
-                    raise ValueError(error)
+        if dryRun:
+            self._dryRun()
+            return True
 
-            smtp.ehlo()
+        from .emailee_transport import SMTPTransport
 
-            if self._SSLTLS == _EncType.TLS:
-                smtp.starttls()
-                smtp.ehlo()
-        except Exception as error:
-            raise error
-        if self._authUsername and self._authPassword:
-            try:
-                smtp.login(self._authUsername, self._authPassword)
-            except Exception as error:
-                raise ValueError(error)
+        transport = self._transport
+        if transport is None:
+            transport = SMTPTransport()
+        self._refused = transport.deliver(self, self._to + self._cc + self._bcc)
 
         try:
-            smtp.sendmail(self._sender, self._to + self._cc + self._bcc, generatedEmail)
-        except Exception as error:
-            raise ValueError(error)
-
-        try:
-            smtp.close()
             if self._outputFile:
                 with open(self._outputFile, "a") as file:
                     file.write(self.__str__() + "\n")
             return True
         except Exception as error:
             raise (error)
+
+
+def _helperEmaileeFromDict(mailItem: Any) -> Emailee:
+    """
+    Build an Emailee from a mail item dict or MailItem, as used in the
+    async mailList, with defaults for any optional keys that are missing
+    """
+
+    mail = Emailee()
+    mail.sender(sender=mailItem.get("sender", ""), replyTo=mailItem.get("replyTo", ""))
+    mail.subject(mailItem.get("subject", ""))
+    msgText = mailItem.get("msgText", "")
+    msgHTML = mailItem.get("msgHTML", "")
+    mergeFields = mailItem.get("_mergeFields")
+    if mergeFields:
+        # a MailMerge item's bodies are its shared templates until now
+        from .emailee_merge import _mergeBody
+
+        msgText = _mergeBody(msgText, mergeFields, False)
+        msgHTML = _mergeBody(msgHTML, mergeFields, True)
+    mail.msgContent(msgText=msgText, msgHTML=msgHTML)
+    mail.sendTo(
+        to=mailItem.get("to", []),
+        cc=mailItem.get("cc", []),
+        bcc=mailItem.get("bcc", []),
+        ignoreErrors=mailItem.get("ignoreErrors", False),
+    )
+    mail.attachmentFiles(
+        mailItem.get("attachmentFiles", []),
+        splitOversized=mailItem.get("splitOversized", False),
+    )
+    mail._attachmentData = mailItem.get("_attachmentData") or {}
+    return mail
+
+
+def _helperMailReport(mailItem: Any) -> Dict[str, Any]:
+    # metadata reported for each async mail item, sent or failed
+    return {
+        "sender": mailItem.get("sender", ""),
+        "replyTo": mailItem.get("replyTo", ""),
+        "subject": mailItem.get("subject", ""),
+        "to": mailItem.get("to", []),
+        "cc": mailItem.get("cc", []),
+        "bcc": mailItem.get("bcc", []),
+    }
@@ -1,12 +1,231 @@
+import abc
+import collections
+import collections.abc
+import itertools
 import multiprocessing
+import os
+import queue
 import threading
 import time
-from typing import Any, Dict, List, Union
+from concurrent.futures import CancelledError, Future
+from typing import (
+    Any,
+    Callable,
+    Counter,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
-from .emailee import Emailee, _helperOutputFileCheck
+from .emailee import (
+    _helperEmaileeFromDict,
+    _helperMailReport,
+    _helperOutputFileCheck,
+)
+from .emailee_campaign import _Inbox, Campaign
+from .emailee_dryrun import _cpuClock, _DryRunTotals, _peakRSS
+from .emailee_outcome import _failureDetails, _sentDetails
+from .emailee_mx import (
+    _defaultMXResolver,
+    _mxWorker,
+    _planDomainJobs,
+    _withoutDomains,
+)
+from .emailee_relay import _isRelayFailure, _probeCache, _RelayPool, _serverKey
+from .emailee_schedule import (
+    _PRIORITY_AGING,
+    _DomainScheduler,
+    _mailDomains,
+    _mailPriority,
+)
+from .emailee_shm import _SharedBodies, _sharedBodies, _SharedReader
+from .emailee_shutdown import (
+    _drainDeadline,
+    _remaining,
+    _SigtermDrain,
+    _stopWorkers,
+    _workerSignals,
+    _writeRemainder,
+)
+from .emailee_transport import Transport
+from .emailee_types import _CHUNK_SIZE, _COMPRESS_FORMATS, MailItem, ServerConfig
+from .emailee_validate import _validateMailList
 
+_MailItemType = Union[Dict[str, Any], MailItem]
+_ServerType = Union[Dict[str, Any], ServerConfig]
 
-class _SendAsync:
+# mail items read ahead from an iterator mailList, waiting to be dispatched,
+#  so recipient domains can still be interleaved without reading it all
+_SOURCE_AHEAD: int = 1000
+
+
+def _checkServers(serverDict: Any) -> None:
+    # a server dict or ServerConfig, or a list of them with relay weights
+    if isinstance(serverDict, list) and serverDict:
+        for relay in serverDict:
+            if not isinstance(relay, (dict, ServerConfig)):
+                raise TypeError("Server items not valid type")
+            weight = relay.get("weight", 1)
+            if not isinstance(weight, int) or isinstance(weight, bool):
+                raise TypeError("relay weight is not valid int")
+            if weight <= 0:
+                raise ValueError("relay weight must be a number greater than 0")
+    elif not isinstance(serverDict, (dict, ServerConfig)):
+        raise TypeError("Server items not valid type")
+
+    for relay in serverDict if isinstance(serverDict, list) else [serverDict]:
+        chunkSize = relay.get("chunkSize", _CHUNK_SIZE)
+        if not isinstance(chunkSize, int) or isinstance(chunkSize, bool):
+            raise TypeError("chunkSize server option not in integer format")
+        if chunkSize < 0:
+            raise ValueError("chunkSize cannot be a negative number")
+
+
+def _checkDelivery(
+    mailList: Any,
+    serverDict: Any,
+    deliveryMode: Any,
+    mxResolver: Any,
+    transport: Any,
+) -> None:
+    # the delivery mode, and the options 'mx' mode can't be used with
+    if not isinstance(deliveryMode, str):
+        raise TypeError("deliveryMode not in string format")
+
+    if deliveryMode not in ("relay", "mx"):
+        raise ValueError("deliveryMode must be 'relay' or 'mx'")
+
+    if mxResolver is not None and not callable(mxResolver):
+        raise TypeError("mxResolver is not a function")
+
+    if transport is not None and not isinstance(transport, Transport):
+        raise TypeError("transport is not a Transport")
+
+    if deliveryMode != "mx":
+        return
+
+    if isinstance(serverDict, list):
+        raise ValueError("Relay lists can't be used when delivering direct to MX")
+
+    if serverDict.get("SSLTLS") == "SSL":
+        raise ValueError("SSL is not supported when delivering direct to MX")
+
+    if transport is not None:
+        raise ValueError("A transport can't be used when delivering direct to MX")
+
+    if not isinstance(mailList, list):
+        raise ValueError("Mail items must be a list when delivering direct to MX")
+
+
+def _checkDomainLimits(
+    domainConcurrency: Any, domainRate: Any, domainOrder: Any
+) -> None:
+    if not isinstance(domainConcurrency, dict):
+        raise TypeError("domainConcurrency not in dict format")
+
+    for domain, limit in domainConcurrency.items():
+        if not isinstance(domain, str) or not isinstance(limit, int):
+            raise TypeError("domainConcurrency must map domain strings to ints")
+        if limit <= 0:
+            raise ValueError("domainConcurrency limits must be greater than 0")
+
+    if not isinstance(domainRate, dict):
+        raise TypeError("domainRate not in dict format")
+
+    for domain, rate in domainRate.items():
+        if not isinstance(domain, str) or not isinstance(rate, (int, float)):
+            raise TypeError("domainRate must map domain strings to numbers")
+        if rate <= 0:
+            raise ValueError("domainRate limits must be greater than 0")
+
+    if not isinstance(domainOrder, (str, list)):
+        raise TypeError("domainOrder not in string or list format")
+
+    if isinstance(domainOrder, str) and domainOrder not in ("size", "list"):
+        raise ValueError("domainOrder must be 'size', 'list' or a list of domains")
+
+
+def _checkRelayOptions(
+    relayStrategy: Any, relayMaxFailures: Any, relayRetryAfter: Any, probeTTL: Any
+) -> None:
+    if not isinstance(relayStrategy, str):
+        raise TypeError("relayStrategy not in string format")
+
+    if relayStrategy not in ("roundrobin", "leastoutstanding"):
+        raise ValueError("relayStrategy must be 'roundrobin' or 'leastoutstanding'")
+
+    if not isinstance(relayMaxFailures, int):
+        raise TypeError("relayMaxFailures is not valid int")
+
+    if relayMaxFailures <= 0:
+        raise ValueError("relayMaxFailures must be a number greater than 0")
+
+    if not isinstance(relayRetryAfter, (int, float)):
+        raise TypeError("relayRetryAfter not valid number")
+
+    if relayRetryAfter < 0:
+        raise ValueError("relayRetryAfter cannot be a negative number")
+
+    if not isinstance(probeTTL, (int, float)) or isinstance(probeTTL, bool):
+        raise TypeError("probeTTL not valid number")
+
+    if probeTTL < 0:
+        raise ValueError("probeTTL cannot be a negative number")
+
+
+def _checkTiming(waitTime: Any, drainTimeout: Any, priorityAging: Any) -> None:
+    if not isinstance(waitTime, int) and not isinstance(waitTime, float):
+        raise TypeError("Email wait time not valid number")
+
+    if waitTime < 0:
+        raise ValueError("waitTime cannot be a negative number")
+
+    if drainTimeout is not None and not isinstance(drainTimeout, (int, float)):
+        raise TypeError("drainTimeout not valid number")
+
+    if drainTimeout is not None and drainTimeout < 0:
+        raise ValueError("drainTimeout cannot be a negative number")
+
+    if not isinstance(priorityAging, (int, float)) or isinstance(priorityAging, bool):
+        raise TypeError("priorityAging not valid number")
+
+    if priorityAging <= 0:
+        raise ValueError("priorityAging must be a number greater than 0")
+
+
+def _checkAttachmentOptions(
+    maxAttachmentSize: Any, compressAttachments: Any, compressFormat: Any
+) -> None:
+    if maxAttachmentSize is not None and (
+        not isinstance(maxAttachmentSize, int) or isinstance(maxAttachmentSize, bool)
+    ):
+        raise TypeError("maxAttachmentSize is not valid int")
+
+    if maxAttachmentSize is not None and maxAttachmentSize <= 0:
+        raise ValueError("maxAttachmentSize must be a number greater than 0")
+
+    if compressAttachments is not None and (
+        not isinstance(compressAttachments, int)
+        or isinstance(compressAttachments, bool)
+    ):
+        raise TypeError("compressAttachments is not valid int")
+
+    if compressAttachments is not None and compressAttachments < 0:
+        raise ValueError("compressAttachments cannot be a negative number")
+
+    if not isinstance(compressFormat, str):
+        raise TypeError("compressFormat not in string format")
+
+    if compressFormat not in _COMPRESS_FORMATS:
+        raise ValueError("compressFormat must be 'gzip' or 'zip'")
+
+
+class _SendAsync(abc.ABC):
     """
     No point having a great SMTP library without the ability to send asynchronous mail!
     You can roll your own using the Emailee class but all the hard work is already done here.
@@ -30,9 +249,16 @@ class _SendAsync:
                     'bcc': list of bcc emails, optional
                     'ignoreErrors': will continue to send the email, skipping invalid to/cc/bcc mail items, optional
                     'attachmentFiles': list of attachment file paths, optional
+                    'splitOversized': split attachments across several emails if over the server's SIZE limit, optional
+                    'priority': int, higher is sent sooner, see priorityAging, optional, default 0
                 },
                 {...},
             ]
+            MailItem objects can be used in place of the dicts, and are cheaper
+            to hold and to hand to processes for large campaigns.
+            An iterator of mail items, e.g. a generator reading them from a file, can be
+            used in place of the list in 'relay' mode. Items are read as they're needed,
+            up to 1000 ahead of those being sent, and indexed in the order they're read.
         serverDict -
             {
                 'smtpServer': SMTP server,
@@ -40,184 +266,983 @@ class _SendAsync:
                 'SSLTLS': SSL or TLS encryption, optional
                 'authUsername': authenticated username, optional
                 'authPassword': authenticated password, optional
+                'chunkSize': bytes per BDAT chunk when the server advertises CHUNKING,
+                    optional, default 1MiB, 0 to always send with DATA
             }
+            or a list of these dicts to spread mail across several relays, each with an optional
+            'weight' (default 1) and 'name' for reporting. ServerConfig objects can be used
+            in place of the dicts. Relays that keep failing are taken out
+            of rotation and mail is failed over to the others until a health probe succeeds.
         outputFile: str - empty or non-existant text file to write successful sent email metadata to.
             Similar to AsyncThreads/AsyncMP.emailReport(), but the outputFile is written to during the email
             processing, so if there is an exception which crashes the mail run you will have a list of what successfully
             sent. Helpful to check against mail send throttling issues, which you may not notice otherwise.
         waitTime: int or float - time in seconds between each mail item sent, useful if your sending too
              many emails, too quickly utilising services like gmail, who will stop sending emails if it looks like spam
+        deliveryMode: str - 'relay' to send everything through the serverDict smtpServer (default),
+            or 'mx' to deliver straight to each recipient domain's MX hosts. In 'mx' mode recipients
+            are grouped by domain and each domain gets one transaction per mail item carrying all of
+            its recipients, over a connection reused for all of that domain's mail. Only the
+            serverDict port (default 25), SSLTLS ('TLS' to require STARTTLS) and timeout are used.
+        mxResolver: function - 'mx' mode only, takes a domain and returns a list of
+            (preference, MX host) tuples, defaults to querying the system nameservers
+        domainConcurrency: dict - max sends in progress per recipient domain, e.g.
+            {'default': 2, 'bigprovider.com': 4}. In 'mx' mode this is max connections
+            per domain and 'default' is 1, in 'relay' mode domains are unlimited unless listed.
+            Mail items count against every one of their recipient domains.
+        domainRate: dict - max sends started per second per recipient domain, e.g.
+            {'bigprovider.com': 0.5}, 'default' for all other domains. Unlisted domains are unlimited.
+        domainOrder: str or list - 'mx' mode only, 'size' to start domains with the most mail first
+            (default), 'list' for mailList order, or a list of domains to start first
+        relayStrategy: str - 'roundrobin' for weighted round robin across relays (default), or
+            'leastoutstanding' for the relay with the fewest sends in progress per unit of weight
+        relayMaxFailures: int - consecutive failures before a relay is taken out of rotation, default 3
+        relayRetryAfter: int or float - seconds between health probes of a failed relay, default 30
+        onResult: function - called with each mail item's result as soon as it completes,
+            see iterResults() for the format. Called from the thread that is sending the mail list.
+        autoRun: bool - send the mail list when created (default), or False to send it later
+            with run(), by iterating over iterResults() to stream results as they complete,
+            or in the background with start()
+        remainderFile: str - file that mail left unsent when sending stops early, e.g. on
+            shutdown(), is written to, one JSON mail item per line. Load it with
+            emailee.readRemainder() to send the remainder on the next run.
+        drainTimeout: int or float - seconds sends already in progress are given to finish
+            when sending stops early, after which they're recorded as unsent and worker
+            processes are stopped. Waits for them by default (None).
+        handleSigterm: bool - shut down gracefully on SIGTERM while sending, rather than
+            the process being killed, default False. Must be started from the main thread.
+        preflight: bool - check every mail item with validate() before any mail is sent,
+            raising ValueError without sending anything if any are invalid, default False
+        maxAttachmentSize: int - largest attachment file in bytes allowed by validate(),
+            any size by default (None)
+        probeTTL: int or float - seconds a relay probe result is reused by later runs
+            against the same relay settings, default 300. Each relay is probed with
+            EHLO, STARTTLS and AUTH before sending, its extensions listed in relayReport.
+        compressAttachments: int - compress text and other compressible attachments, and
+            any others this many bytes or over, as they're sent. Off by default (None).
+            Each file is compressed once per process however many mail items attach it.
+        compressFormat: str - 'gzip' (default) or 'zip', for compressAttachments
+        transport: Transport - deliver each email with a Transport, e.g. MemoryTransport or
+            NullTransport, rather than over SMTP, 'relay' mode only. serverDict isn't used
+            and relays aren't probed, so it can be {}. AsyncMP needs a transport that works
+            across processes, so not MemoryTransport or an mbox FileTransport.
+        dryRun: bool - validate and generate every email through the workers as it would be
+            sent, without delivering any or writing to the outputFile, 'relay' mode only.
+            Relays aren't probed and waitTime and domainRate aren't waited on, but are
+            used to project how long the run would take, see dryRunReport. Default False.
+        keepReports: bool - keep every outcome in emailReport and failedReport (default),
+            or False for very long runs whose outcomes are taken from onResult or
+            iterResults(), so memory doesn't grow with the mail list
+        priorityAging: int or float - 'relay' mode only, mail items with a higher 'priority'
+            (default 0) are sent first, and a priority passed over for this many seconds
+            moves up one level, so lower priority mail still goes out while higher priority
+            mail keeps arriving. Default 10.
     """
 
     def __init__(
         self,
-        mailList: List[Dict[str, Any]],
-        serverDict: Dict[str, Any],
+        mailList: List[_MailItemType],
+        serverDict: Union[_ServerType, List[_ServerType]],
         outputFile: str,
         waitTime: Union[int, float] = 0,
+        *,
+        deliveryMode: str = "relay",
+        mxResolver: Optional[Callable] = None,
+        domainConcurrency: Optional[Dict[str, int]] = None,
+        domainOrder: Union[str, List[str]] = "size",
+        domainRate: Optional[Dict[str, Union[int, float]]] = None,
+        relayStrategy: str = "roundrobin",
+        relayMaxFailures: int = 3,
+        relayRetryAfter: Union[int, float] = 30,
+        onResult: Optional[Callable] = None,
+        autoRun: bool = True,
+        remainderFile: Optional[str] = None,
+        drainTimeout: Optional[Union[int, float]] = None,
+        handleSigterm: bool = False,
+        preflight: bool = False,
+        maxAttachmentSize: Optional[int] = None,
+        probeTTL: Union[int, float] = 300,
+        compressAttachments: Optional[int] = None,
+        compressFormat: str = "gzip",
+        transport: Optional[Transport] = None,
+        dryRun: bool = False,
+        keepReports: bool = True,
+        priorityAging: Union[int, float] = _PRIORITY_AGING,
     ) -> None:
-        if not isinstance(mailList, list):
+        if not isinstance(mailList, (list, collections.abc.Iterator)):
             raise TypeError("Email items not valid type")
 
-        if not isinstance(serverDict, dict):
-            raise TypeError("Server items not valid type")
+        _checkServers(serverDict)
+        _checkDelivery(mailList, serverDict, deliveryMode, mxResolver, transport)
+
+        for name, value in (
+            ("autoRun", autoRun),
+            ("handleSigterm", handleSigterm),
+            ("preflight", preflight),
+            ("dryRun", dryRun),
+            ("keepReports", keepReports),
+        ):
+            if not isinstance(value, bool):
+                raise TypeError(f"{name} is not a bool")
+
+        if dryRun and deliveryMode == "mx":
+            raise ValueError("A dry run can't be made when delivering direct to MX")
 
-        if not isinstance(waitTime, int) and not isinstance(waitTime, float):
-            raise TypeError("Email wait time not valid number")
+        if preflight and not isinstance(mailList, list):
+            raise ValueError("Mail items must be a list to preflight them")
 
-        if waitTime < 0:
-            raise ValueError("waitTime cannot be a negative number")
+        if domainConcurrency is None:
+            domainConcurrency = {}
 
-        self._mailList: List[Dict[str, str]] = mailList
-        self._serverDict: Dict[str, str] = serverDict
+        if domainRate is None:
+            domainRate = {}
+
+        _checkDomainLimits(domainConcurrency, domainRate, domainOrder)
+        _checkRelayOptions(relayStrategy, relayMaxFailures, relayRetryAfter, probeTTL)
+        _checkTiming(waitTime, drainTimeout, priorityAging)
+        _checkAttachmentOptions(maxAttachmentSize, compressAttachments, compressFormat)
+
+        if onResult is not None and not callable(onResult):
+            raise TypeError("onResult is not a function")
+
+        if remainderFile is not None and not isinstance(remainderFile, str):
+            raise TypeError("remainderFile path not in string format")
+
+        # an iterator mailList is read as it's sent, with nothing in _mailList
+        self._mailSource: Optional[Iterator[_MailItemType]] = None
+        if not isinstance(mailList, list):
+            self._mailSource, mailList = mailList, []
+        self._mailList: List[_MailItemType] = mailList
+        self._serverDict: Union[_ServerType, List[_ServerType]] = serverDict
+        self._multiRelay: bool = isinstance(serverDict, list)
+        self._relayPool = _RelayPool(
+            serverDict if isinstance(serverDict, list) else [serverDict],
+            strategy=relayStrategy,
+            maxFailures=relayMaxFailures,
+            retryAfter=relayRetryAfter,
+        )
         self._waitTime: Union[int, float] = waitTime
         self._outputFileReady: bool = False
+        self._deliveryMode: str = deliveryMode
+        self._mxResolver: Callable = mxResolver or _defaultMXResolver
+        # (minSize, compressFormat) given to each Emailee, or None
+        self._compression: Optional[Tuple[int, str]] = (
+            None
+            if compressAttachments is None
+            else (compressAttachments, compressFormat)
+        )
+        self._transport: Optional[Transport] = transport
+        self._dryRun: bool = dryRun
+        # totals across the mail list once a dry run has finished
+        self.dryRunReport: Dict[str, Any] = {}
+        self._keepReports: bool = keepReports
+        self._domainConcurrency: Dict[str, int] = {
+            domain.lower(): limit for domain, limit in domainConcurrency.items()
+        }
+        self._domainOrder: Union[str, List[str]] = domainOrder
+        self._priorityAging: Union[int, float] = priorityAging
+        self._domainRate: Dict[str, Union[int, float]] = {
+            domain.lower(): rate for domain, rate in domainRate.items()
+        }
+        # counts each email a dry run generates, see dryRunReport
+        self._dryRunTotals: Optional[_DryRunTotals] = None
+        if dryRun:
+            self._dryRunTotals = _DryRunTotals(waitTime, self._domainRate)
 
         self.emailReport: List[Dict[str, Any]] = []
+        self.failedReport: List[Dict[str, Any]] = []
+        self.relayReport: List[Dict[str, Any]] = []
 
-        self._processQueue: multiprocessing.Queue = multiprocessing.Queue()
+        self._onResult: Optional[Callable] = onResult
+        self._autoRun: bool = autoRun
+        self._started: bool = False
+        # set by start(), run() and iterResults() use an inbox nothing can be submitted to
+        self._futures: Dict[int, Future] = {}
+        self._inbox: _Inbox = _Inbox()
+
+        self._remainderFile: Optional[str] = remainderFile
+        self._drainTimeout: Optional[Union[int, float]] = drainTimeout
+        self._handleSigterm: bool = handleSigterm
+        # mail items that are still to be sent, a flag per mailList item
+        #  and submitted items by index, and those still being sent when
+        #  the drain timeout ran out, with the domains already delivered to
+        #  for items stopped part way through direct to MX delivery
+        self._unsentFlags: bytearray = bytearray()
+        self._submittedItems: Dict[int, Any] = {}
+        self._inProgress: Set[int] = set()
+        self._deliveredDomains: Dict[int, List[str]] = {}
+
+        self._preflight: bool = preflight
+        self._maxAttachmentSize: Optional[int] = maxAttachmentSize
+        self.validationReport: List[Dict[str, Any]] = []
+        self._probeTTL: Union[int, float] = probeTTL
+        self.unsentReport: List[Dict[str, Any]] = []
 
         self._outputFileReady = _helperOutputFileCheck(outputFile)
         self._outputFile: str = outputFile
 
         self._outputFileReady
 
-    def _runTest(self):
-        # run initial mail item procedurally to check server works
+    def _record(
+        self,
+        status: str,
+        index: int,
+        report: Dict[str, Any],
+        elapsed: float,
+        settle: bool = True,
+        error: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        # add an outcome to the reports and pass it on to onResult, settling
+        #  the mail item unless it has more to send. Its future gets error
+        #  if given, for items whose earlier deliveries failed.
+        if status == "sent" and self._dryRunTotals is not None:
+            self._dryRunTotals.add(report)
+        if self._keepReports and status == "sent":
+            self.emailReport.append(report)
+        elif self._keepReports:
+            self.failedReport.append(report)
+        result = dict(report, status=status, index=index, elapsed=elapsed)
+        if settle:
+            self._settle(index)
+            future = self._futures.pop(index, None)
+            if future is not None:
+                if status == "sent" and error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(ValueError(error or report.get("error", "")))
+        if self._onResult is not None:
+            self._onResult(result)
+        return result
+
+    def _claim(self, index: int) -> bool:
+        # False if a started campaign's item was cancelled before being sent
+        future = self._futures.get(index)
+        if future is None or future.set_running_or_notify_cancel():
+            return True
+        del self._futures[index]
+        self._settle(index)
+        return False
+
+    def _settle(self, index: int) -> None:
+        # the mail item no longer needs sending
+        if index < len(self._unsentFlags):
+            self._unsentFlags[index] = 0
+        else:
+            self._submittedItems.pop(index, None)
+
+    def _takeSubmitted(self) -> List[Tuple[int, Any]]:
+        # mail items submitted to a started campaign since last called
+        submitted = []
+        for index, mailItem, future in self._inbox.take():
+            self._futures[index] = future
+            self._submittedItems[index] = mailItem
+            submitted.append((index, mailItem))
+        return submitted
+
+    def _readSource(self, waiting: int) -> List[Tuple[int, Any]]:
+        # the next (index, mailItem) read from an iterator mailList, enough
+        #  to have _SOURCE_AHEAD items waiting to be dispatched. They're kept
+        #  with the submitted items until settled, so any left unsent when
+        #  sending stops are recorded.
+        items: List[Tuple[int, Any]] = []
+        while self._mailSource is not None and waiting + len(items) < _SOURCE_AHEAD:
+            try:
+                mailItem = next(self._mailSource)
+            except StopIteration:
+                self._mailSource = None
+                break
+            index = self._inbox.reserve()
+            self._submittedItems[index] = mailItem
+            items.append((index, mailItem))
+        return items
+
+    def _probeRelays(self) -> None:
+        # check the relays can be used before any mail is sent, in parallel,
+        #  reusing results cached within probeTTL. Relays that fail count a
+        #  failure, raises ValueError if none of them can be used.
+        relays = [relay for relay in self._relayPool.relays if relay.healthy]
+        results: Dict[int, Any] = {}
+
+        def probe(position: int, relay: Any) -> None:
+            try:
+                results[position] = _probeCache.resolve(
+                    *_serverKey(relay.serverDict), ttl=self._probeTTL
+                )
+            except Exception as error:
+                results[position] = error
+
+        threads = [
+            threading.Thread(target=probe, args=(position, relay))
+            for position, relay in enumerate(relays)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        error: Exception = ValueError("No healthy relay available")
+        for position, relay in enumerate(relays):
+            result = results[position]
+            if isinstance(result, Exception):
+                error = result
+                self._relayPool.recordProbe(relay)
+            else:
+                self._relayPool.recordProbe(relay, result)
+        self.relayReport = self._relayPool.stats()
+        if not any(isinstance(result, dict) for result in results.values()):
+            raise ValueError(error)
+
+    def _iterPool(
+        self,
+        workers: int,
+        workerClass: Any,
+        queueClass: Any,
+        shared: Optional[_SharedBodies] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        # hand the rest of the mail items, and anything submitted to a
+        #  started campaign, to a pool of workers, interleaving recipient
+        #  domains within their limits, choosing the relay for each as it's
+        #  dispatched and failing items over to another relay when theirs
+        #  fails. Bodies go through shared memory if shared is given.
+        # a dry run doesn't wait on rate limits, _projectedTime() adds them
+        domainRate = {} if self._dryRun else self._domainRate
+        scheduler = _DomainScheduler(
+            self._domainConcurrency, domainRate, self._priorityAging
+        )
+
+        def schedule(index: int, mailItem: Any) -> Optional[Dict[str, Any]]:
+            # queue a mail item at its priority, or record it as invalid
+            try:
+                if not isinstance(mailItem, (dict, MailItem)):
+                    raise TypeError("Email item not valid type")
+                priority = _mailPriority(mailItem)
+            except TypeError as invalid:
+                failed = _failedReport(
+                    mailItem if isinstance(mailItem, (dict, MailItem)) else {},
+                    {"error": str(invalid), "outcome": "invalid"},
+                )
+                return self._record("failed", index, failed, 0.0)
+            scheduler.push(
+                (index, mailItem, []), _mailDomains(mailItem), False, priority
+            )
+            return None
+
+        for index, mailItem in enumerate(self._mailList):
+            invalid = schedule(index, mailItem)
+            if invalid is not None:
+                yield invalid
+        inFlight: Dict[int, Tuple[Any, Any, List, List[str]]] = {}
+        # tasks holding shared memory blocks, released as their results arrive
+        sharedTasks: Dict[int, Dict[str, Any]] = {}
+
+        def outcome(result: Any, retry: bool) -> Optional[Dict[str, Any]]:
+            if shared:
+                shared.release(sharedTasks.pop(result[0]))
+            return self._relayOutcome(result, inFlight, scheduler, retry)
+
+        taskQueue = queueClass()
+        resultQueue = queueClass()
+        self._inbox.setWake(resultQueue)
+        active: List[Any] = []
+
         try:
-            _sendMailFunc(
-                self._mailList[0],
-                self._serverDict,
-                self._processQueue,
-                self._outputFile,
-                self._outputFileReady,
+            while True:
+                for index, mailItem in self._takeSubmitted():
+                    invalid = schedule(index, mailItem)
+                    if invalid is not None:
+                        yield invalid
+                if self._inbox.cancelled:
+                    return
+                for index, mailItem in self._readSource(len(scheduler)):
+                    invalid = schedule(index, mailItem)
+                    if invalid is not None:
+                        yield invalid
+
+                while len(inFlight) < workers:
+                    scheduled = scheduler.pop()
+                    if scheduled is None:
+                        break
+                    (index, mailItem, tried), domains = scheduled
+                    if not tried and not self._claim(index):
+                        scheduler.release(domains)
+                        continue
+                    relay = self._relayPool.choose(exclude=tried)
+                    if relay is None:
+                        scheduler.release(domains)
+                        failed = _failedReport(
+                            mailItem,
+                            {
+                                "error": "No healthy relay available",
+                                "outcome": "transient",
+                            },
+                        )
+                        yield self._record("failed", index, failed, 0.0)
+                        continue
+                    # workers are started as they're needed, up to the limit
+                    if len(active) <= len(inFlight):
+                        newWorker = workerClass(
+                            target=_relayWorker,
+                            args=(
+                                taskQueue,
+                                resultQueue,
+                                self._outputFile,
+                                self._outputFileReady,
+                                self._compression,
+                                self._transport,
+                                self._dryRun,
+                            ),
+                        )
+                        newWorker.start()
+                        active.append(newWorker)
+                    taskItem = mailItem
+                    if shared:
+                        taskItem = sharedTasks[index] = shared.intern(mailItem)
+                    taskQueue.put((index, taskItem, relay.serverDict))
+                    inFlight[index] = (mailItem, relay, tried, domains)
+                    if not self._dryRun:
+                        time.sleep(self._waitTime)
+
+                if (
+                    not scheduler
+                    and not inFlight
+                    and self._mailSource is None
+                    and self._inbox.finished()
+                ):
+                    return
+
+                # wakes for a result, a submitted item, or once the next
+                #  item held back by a domain rate can start
+                try:
+                    result = resultQueue.get(timeout=scheduler.wait())
+                except queue.Empty:
+                    continue
+                if result is None:
+                    continue
+                recorded = outcome(result, True)
+                if recorded is not None:
+                    yield recorded
+        finally:
+            # also reached if the caller stops iterating early, no more mail
+            #  is handed out but sends already in progress are given until
+            #  the drain timeout to finish and be recorded
+            self._inbox.setWake(None)
+            for _ in active:
+                taskQueue.put(None)
+            deadline = _drainDeadline(self._drainTimeout)
+            while inFlight:
+                try:
+                    result = resultQueue.get(timeout=_remaining(deadline))
+                except queue.Empty:
+                    break
+                if result is not None:
+                    outcome(result, False)
+            self._inProgress.update(inFlight)
+            _stopWorkers(active, deadline)
+            self.relayReport = self._relayPool.stats()
+
+    def _relayOutcome(
+        self,
+        result: Tuple[int, Optional[Dict[str, Any]], Dict[str, Any], bool, float],
+        inFlight: Dict[int, Tuple[Any, Any, List, List[str]]],
+        scheduler: _DomainScheduler,
+        retry: bool,
+    ) -> Optional[Dict[str, Any]]:
+        # record a worker's result, or queue the item again on another relay
+        #  if its relay failed, returning None if it was queued again
+        index, report, details, relayFailure, elapsed = result
+        mailItem, relay, tried, domains = inFlight.pop(index)
+        scheduler.release(domains)
+        self._relayPool.release(relay, report is not None, relayFailure)
+
+        if report is not None:
+            if self._multiRelay:
+                report["relay"] = relay.name
+            return self._record("sent", index, report, elapsed)
+
+        if retry and relayFailure and len(tried) + 1 < len(self._relayPool.relays):
+            scheduler.push(
+                (index, mailItem, tried + [relay]),
+                domains,
+                front=True,
+                priority=_mailPriority(mailItem),
             )
-            self.emailReport.append(self._processQueue.get())
-        except Exception as error:
-            raise ValueError(error)
+            return None
+
+        failed = _failedReport(mailItem, details)
+        if self._multiRelay:
+            failed["relay"] = relay.name
+        return self._record("failed", index, failed, elapsed)
+
+    def _queueDomainJobs(
+        self,
+        pending: Deque[Tuple[str, List[Tuple[int, Any]], float]],
+        mailList: List[Any],
+        firstIndex: int = 0,
+    ) -> None:
+        jobs = _planDomainJobs(
+            mailList, self._domainConcurrency, self._domainOrder, firstIndex
+        )
+
+        # a domain's rate is shared between its connections, each pausing
+        #  for long enough between messages to keep the domain under it
+        slots = collections.Counter(domain for domain, _ in jobs)
+        for domain, items in jobs:
+            rate = self._domainRate.get(domain, self._domainRate.get("default"))
+            waitTime = max(self._waitTime, slots[domain] / rate if rate else 0)
+            pending.append((domain, items, waitTime))
+
+    def _iterDirectMX(
+        self,
+        workers: int,
+        workerClass: Any,
+        queueClass: Any,
+        eventClass: Any,
+        shared: Optional[_SharedBodies] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        # deliver each domain's mail over its own reused connections, with
+        #  up to workers domain jobs running in parallel. Bodies go through
+        #  shared memory if shared is given.
+        pending: Deque[Tuple[str, List[Tuple[int, Any]], float]] = collections.deque()
+        # an item with recipients at several domains is in a job for each,
+        #  it's claimed by the first job started and settled once the last
+        #  delivery is finished, with the failures of any before it
+        deliveries: Counter[int] = collections.Counter()
+        deliveryErrors: Dict[int, List[Tuple[str, str]]] = {}
+        delivered: Dict[int, List[str]] = collections.defaultdict(list)
+        claimed: Dict[int, bool] = {}
+
+        def queueJobs(mailList: List[Any], firstIndex: int = 0) -> None:
+            queued = len(pending)
+            self._queueDomainJobs(pending, mailList, firstIndex)
+            for _, items, _ in itertools.islice(pending, queued, None):
+                deliveries.update(index for index, _ in items)
+
+        queueJobs(self._mailList)
+
+        jobQueue = queueClass()
+        resultQueue = queueClass()
+        stopEvent = eventClass()
+        self._inbox.setWake(resultQueue)
+        active: List[Any] = []
+        running: Dict[str, int] = collections.Counter()
+        # deliveries handed to workers that haven't been sent or failed
+        dispatched: Counter[int] = collections.Counter()
+        # tasks holding shared memory blocks by index and domain, released
+        #  as each item's result arrives
+        sharedTasks: Dict[Tuple[int, str], Dict[str, Any]] = {}
+
+        def release(index: int, domain: str) -> None:
+            if shared:
+                shared.release(sharedTasks.pop((index, domain)))
+
+        def claim(index: int) -> bool:
+            if index not in claimed:
+                claimed[index] = self._claim(index)
+            return claimed[index]
+
+        def startJobs() -> None:
+            # jobs are handed out as workers finish their last one, rather
+            #  than all up front, so they can be stopped between jobs. Jobs
+            #  for mail submitted later can't take a domain over its limit.
+            for _ in range(len(pending)):
+                job = pending.popleft()
+                domain, items, waitTime = job
+                limit = self._domainConcurrency.get(
+                    domain, self._domainConcurrency.get("default", 1)
+                )
+                if sum(running.values()) >= workers or running[domain] >= limit:
+                    pending.append(job)
+                    continue
+                items = [(index, item) for index, item in items if claim(index)]
+                if not items:
+                    continue
+                if len(active) <= sum(running.values()):
+                    newWorker = workerClass(
+                        target=_mxWorker,
+                        args=(
+                            jobQueue,
+                            resultQueue,
+                            self._serverDict,
+                            self._mxResolver,
+                            self._outputFile,
+                            stopEvent,
+                            self._compression,
+                        ),
+                    )
+                    newWorker.start()
+                    active.append(newWorker)
+                if shared:
+                    items = [(index, shared.intern(item)) for index, item in items]
+                    sharedTasks.update(((index, domain), item) for index, item in items)
+                jobQueue.put((domain, items, waitTime))
+                dispatched.update(index for index, _ in items)
+                running[domain] += 1
+
+        def jobMessage(
+            message: Tuple[str, int, Dict[str, Any], float],
+        ) -> Optional[Dict[str, Any]]:
+            # record a worker's message, returning the result if it's the
+            #  outcome of a delivery
+            status, index, report, elapsed = message
+            domain = report["domain"]
+            if status == "done":
+                running[domain] -= 1
+                for unsentIndex in report["unsent"]:
+                    dispatched[unsentIndex] -= 1
+                    release(unsentIndex, domain)
+                return None
+            dispatched[index] -= 1
+            release(index, domain)
+            deliveries[index] -= 1
+            if status == "sent":
+                delivered[index].append(domain)
+            else:
+                deliveryErrors.setdefault(index, []).append(
+                    (domain, report.get("error", ""))
+                )
+            if deliveries[index]:
+                return self._record(status, index, report, elapsed, settle=False)
+
+            del deliveries[index]
+            delivered.pop(index, None)
+            errors = deliveryErrors.pop(index, [])
+            error = None
+            if len(errors) == 1:
+                error = errors[0][1]
+            elif errors:
+                error = "; ".join(f"{failed} - {failure}" for failed, failure in errors)
+            return self._record(status, index, report, elapsed, error=error)
+
+        try:
+            while True:
+                submitted = self._takeSubmitted()
+                if submitted:
+                    queueJobs([item for _, item in submitted], submitted[0][0])
+                if self._inbox.cancelled:
+                    return
+
+                startJobs()
+                if not any(running.values()) and self._inbox.finished():
+                    return
+
+                message = resultQueue.get()
+                if message is not None:
+                    result = jobMessage(message)
+                    if result is not None:
+                        yield result
+        finally:
+            # also reached if the caller stops iterating early, no more jobs
+            #  are started and running jobs stop after their current email,
+            #  which is given until the drain timeout to finish and be recorded
+            self._inbox.setWake(None)
+            stopEvent.set()
+            for _ in active:
+                jobQueue.put(None)
+            deadline = _drainDeadline(self._drainTimeout)
+            while any(running.values()):
+                try:
+                    message = resultQueue.get(timeout=_remaining(deadline))
+                except queue.Empty:
+                    break
+                if message is not None:
+                    jobMessage(message)
+            self._inProgress.update(
+                index for index, count in dispatched.items() if count
+            )
+            # items started but stopped before every domain was delivered to
+            #  can't be cancelled, their futures get CancelledError instead,
+            #  and only the domains left are kept to send again
+            for index, count in deliveries.items():
+                if not count or not claimed.get(index):
+                    continue
+                if index in delivered:
+                    self._deliveredDomains[index] = delivered[index]
+                future = self._futures.get(index)
+                if future is not None and index not in self._inProgress:
+                    del self._futures[index]
+                    future.set_exception(
+                        CancelledError("Sending stopped before this item was sent")
+                    )
+            _stopWorkers(active, deadline)
+
+    def iterResults(self) -> Iterator[Dict[str, Any]]:
+        """
+        Send the mail list, yielding each mail item's outcome as it completes.
+        Each result is its report dict with 'status' ('sent' or 'failed'),
+        'index' (position in mailList) and 'elapsed' (seconds spent sending)
+        added. Stopping iteration early stops any more mail being sent, sends
+        already in progress are finished and recorded in the reports.
+        Use with autoRun=False, a mail list can only be sent once.
+        """
+
+        if self._started:
+            raise RuntimeError("This mail list has already been sent")
+        self._started = True
+        return self._send()
+
+    @abc.abstractmethod
+    def _iterResults(self) -> Iterator[Dict[str, Any]]:
+        """
+        Send the mail list with the subclass's threads or processes,
+        yielding each mail item's result as it completes
+        """
+
+    def _send(
+        self, sigtermDrain: Optional[_SigtermDrain] = None
+    ) -> Iterator[Dict[str, Any]]:
+        # sends the mail list through _iterResults, recording anything
+        #  left unsent when it stops
+        if self._preflight and self.validate():
+            raise ValueError(
+                f"{len(self.validationReport)} mail items failed validation, "
+                "nothing was sent, see validationReport"
+            )
+        self._unsentFlags = bytearray(b"\x01") * len(self._mailList)
+        if self._handleSigterm and sigtermDrain is None:
+            sigtermDrain = _SigtermDrain(self.shutdown)
+        started = time.monotonic()
+        try:
+            yield from self._iterResults()
+        finally:
+            if sigtermDrain is not None:
+                sigtermDrain.restore()
+            self._recordUnsent()
+            if self._dryRunTotals is not None:
+                self.dryRunReport = self._dryRunTotals.report(
+                    time.monotonic() - started
+                )
+
+    def _recordUnsent(self) -> None:
+        # mail that wasn't sent, failed or cancelled before sending stopped
+        #  is added to unsentReport and written to the remainderFile
+        self._inbox.close()
+        self._takeSubmitted()
+        unsent = [
+            (index, self._mailList[index])
+            for index, flag in enumerate(self._unsentFlags)
+            if flag
+        ]
+        unsent += sorted(self._submittedItems.items(), key=lambda item: item[0])
+        self._submittedItems = {}
+
+        remainder = []
+        for index, mailItem in unsent:
+            future = self._futures.get(index)
+            if future is not None and future.cancelled():
+                del self._futures[index]
+                continue
+            inProgress = index in self._inProgress
+            if future is not None and inProgress:
+                del self._futures[index]
+                future.set_exception(
+                    TimeoutError("Still being sent when the drain timeout ran out")
+                )
+            elif future is not None and not future.running():
+                del self._futures[index]
+                future.cancel()
+            # a running future left here is an item the run failed on,
+            #  which the campaign gives the run's error
+            if index in self._deliveredDomains:
+                mailItem = _withoutDomains(mailItem, self._deliveredDomains[index])
+            report = _helperMailReport(mailItem)
+            report.update(index=index, inProgress=inProgress)
+            self.unsentReport.append(report)
+            remainder.append(mailItem)
+
+        if self._remainderFile is not None:
+            # with what's still to be read of an iterator mailList
+            source, self._mailSource = self._mailSource, None
+            _writeRemainder(
+                self._remainderFile, itertools.chain(remainder, source or ())
+            )
+
+    def _validationProcesses(self) -> int:
+        return 1
+
+    def validate(self) -> List[Dict[str, Any]]:
+        """
+        Check every mail item in the mail list can be sent, without sending
+        any: addresses, subject length and that attachments exist and are
+        under maxAttachmentSize. Returns, and keeps in validationReport, a
+        report of each invalid item with its 'index', 'error' and an
+        'outcome' of 'invalid'. AsyncMP checks large lists across its processes.
+        """
+
+        if self._mailSource is not None:
+            raise ValueError("Mail items must be a list to validate them")
+
+        self.validationReport = _validateMailList(
+            self._mailList, self._validationProcesses(), self._maxAttachmentSize
+        )
+        return self.validationReport
+
+    def run(self) -> List:
+        for _ in self.iterResults():
+            pass
+        return self.emailReport
+
+    def shutdown(self) -> None:
+        """
+        Stop sending gracefully, as on SIGTERM with handleSigterm. No more
+        mail is sent, sends in progress are given drainTimeout seconds to
+        finish, connections are closed with QUIT and the mail left unsent
+        is recorded in unsentReport and written to the remainderFile.
+        Doesn't wait, returning straight away, and can be called from any thread.
+        """
+
+        self._inbox.close(cancel=True)
+
+    def start(self, keepOpen: bool = False) -> Campaign:
+        """
+        Start sending the mail list in the background, returning a Campaign
+        handle with a Future for each mail item, for waiting on, cancelling,
+        checking progress of and submitting more mail to the campaign.
+        Use with autoRun=False, a mail list can only be sent once.
+
+        Parameters
+        -------
+            keepOpen - Keep the threads or processes running for more mail
+                once the mail list is sent, until Campaign.close(), default False
+        """
+
+        if self._started:
+            raise RuntimeError("This mail list has already been sent")
+        campaign = Campaign(self, keepOpen)
+        self._started = True
+        return campaign
 
 
 def _sendMailFunc(
-    mailItem: Dict,
-    mailServer: Dict,
-    processQueue: multiprocessing.Queue,
+    mailItem: _MailItemType,
+    mailServer: _ServerType,
     outputFile: str,
     outputFileReady: bool,
-) -> None:
+    compression: Optional[Tuple[int, str]] = None,
+    transport: Optional[Transport] = None,
+    dryRun: bool = False,
+) -> Dict[str, Any]:
     """
     Helper function that sends each asynchronous mail item
-    when using AsyncThreads or AsyncMP
+    when using AsyncThreads or AsyncMP, returning its report
 
     Parameters
     -------
-        mailItem - Individual mail dict from _SendAsync.self._mailList
-        mailServer - Server settings in dict from _SendAsync.self._serverDict
-        processQueue - Queue object that sending results are added to
+        mailItem - Individual mail dict or MailItem from _SendAsync.self._mailList
+        mailServer - Server settings dict or ServerConfig from _SendAsync.self._serverDict
         outputFile - Text file append successful sends metadata to
+        outputFileReady - True if outputFile has already been checked
+        compression - (minSize, compressFormat) to compress attachments with, or None
+        transport - Transport to deliver with in place of mailServer, or None
+        dryRun - Generate the email without delivering it, see Emailee.send()
     """
 
-    mailItem.setdefault("sender", "")
-    mailItem.setdefault("replyTo", "")
-    mailItem.setdefault("subject", "")
-    mailItem.setdefault("msgText", "")
-    mailItem.setdefault("msgHTML", "")
-    mailItem.setdefault("to", [])
-    mailItem.setdefault("cc", [])
-    mailItem.setdefault("bcc", [])
-    mailItem.setdefault("ignoreErrors", False)
-    mailItem.setdefault("attachmentFiles", [])
-
-    mailServer.setdefault("smtpServer", [])
-    mailServer.setdefault("port", 0)
-    mailServer.setdefault("SSLTLS", None)
-    mailServer.setdefault("authUsername", "")
-    mailServer.setdefault("authPassword", "")
-    mailServer.setdefault("timeout", 30)
-
-    mail = Emailee()
+    # a dry run's CPU time covers building the Emailee as well as generating
+    cpuStarted = _cpuClock()
+    mail = _helperEmaileeFromDict(mailItem)
+    if compression is not None:
+        mail.compressAttachments(*compression)
     # override the class attribute as we've already checked the output
     #  file is valid for all async email sends
     mail._outputFileReady = outputFileReady
-    mail.sender(sender=mailItem["sender"], replyTo=mailItem["replyTo"])
-    mail.subject(mailItem["subject"])
-    mail.msgContent(msgText=mailItem["msgText"], msgHTML=mailItem["msgHTML"])
-    mail.sendTo(
-        to=mailItem["to"],
-        cc=mailItem["cc"],
-        bcc=mailItem["bcc"],
-        ignoreErrors=mailItem["ignoreErrors"],
-    )
-    mail.attachmentFiles(mailItem["attachmentFiles"])
-
-    mail.server(
-        smtpServer=mailServer["smtpServer"],
-        port=mailServer["port"],
-        SSLTLS=mailServer["SSLTLS"],
-        authUsername=mailServer["authUsername"],
-        authPassword=mailServer["authPassword"],
-        timeout=mailServer["timeout"],
-    )
+
+    if transport is not None:
+        mail.transport(transport)
+    elif mailServer or not dryRun:
+        # a dry run needs no server, but checks the settings of any given
+        mail.server(
+            smtpServer=mailServer.get("smtpServer", []),
+            port=mailServer.get("port", 0),
+            SSLTLS=mailServer.get("SSLTLS") or "",
+            authUsername=mailServer.get("authUsername", ""),
+            authPassword=mailServer.get("authPassword", ""),
+            timeout=mailServer.get("timeout", 30),
+            chunkSize=mailServer.get("chunkSize", _CHUNK_SIZE),
+        )
+    if not mail.ready() and not dryRun:
+        raise ValueError("Mail item is missing a sender, recipients or server")
+
     try:
-        if mail.ready():
-            mail.send(outputFile)
-            processQueue.put(
-                {
-                    "sender": mailItem["sender"],
-                    "replyTo": mailItem["replyTo"],
-                    "subject": mailItem["subject"],
-                    "to": mailItem["to"],
-                    "cc": mailItem["cc"],
-                    "bcc": mailItem["bcc"],
-                }
-            )
+        mail.send(outputFile, dryRun=dryRun)
     except Exception as error:
-        raise ValueError(error)
+        raise ValueError(error) from error
+
+    report = _helperMailReport(mailItem)
+    report.update(_sentDetails(mail._refused))
+    if dryRun:
+        report["bytes"] = mail.dryRunReport["bytes"]
+        report["cpuTime"] = round(_cpuClock() - cpuStarted, 6)
+        report["peakRSS"] = _peakRSS()
+    report["bytesSaved"] = mail._wireSaved
+    if mail._compressionReport:
+        report["compressed"] = mail._compressionReport
+    if mail._messageCount > 1:
+        report["parts"] = mail._messageCount
+    return report
+
+
+def _failedReport(mailItem: Any, details: Dict[str, Any]) -> Dict[str, Any]:
+    # details is the error and outcome from _failureDetails()
+    report = _helperMailReport(mailItem)
+    report.update(details)
+    return report
 
 
-class _myThread(threading.Thread):
+def _relayWorker(
+    taskQueue: Any,
+    resultQueue: Any,
+    outputFile: str,
+    outputFileReady: bool,
+    compression: Optional[Tuple[int, str]] = None,
+    transport: Optional[Transport] = None,
+    dryRun: bool = False,
+) -> None:
     """
-    Class called by AsyncThreads to generate a new thread
+    Thread or process target that sends (index, mailItem, serverDict) tasks
+    from taskQueue until it receives None. Each task adds an
+    (index, report or None, failure details, relayFailure, elapsed) result to resultQueue.
 
     Parameters
     -------
-        mailItem - Individual mail dict from _SendAsync.self._mailList
-        serverDict - Server settings in dict from _SendAsync.self._serverDict
-        poolSema - Pool BoundedSemaphore for threading
-        processQueue - Queue object that sending results are added to
+        taskQueue - Queue of mail items to send and the relay to send them through
+        resultQueue - Queue object that sending results are added to
+        outputFile - Text file append successful sends metadata to
+        outputFileReady - True if outputFile has already been checked
+        compression - (minSize, compressFormat) to compress attachments with, or None
+        transport - Transport to deliver with in place of each task's relay, or None
+        dryRun - Generate each email without delivering it
     """
 
-    def __init__(
-        self,
-        mailItem: Dict,
-        serverDict: Dict,
-        poolSema: threading.BoundedSemaphore,
-        processQueue: multiprocessing.Queue,
-        outputFile: str,
-        outputFileReady: bool,
-    ) -> None:
-        threading.Thread.__init__(self)
-
-        self._mailItem: Dict = mailItem
-        self._serverDict: Dict = serverDict
-        self._poolSema = poolSema
-        self._processQueue = processQueue
-        self._outputFile: str = outputFile
-        self._outputFileReady: bool = outputFileReady
-
-    def run(self):
-        self._poolSema.acquire()
-        try:
-            _sendMailFunc(
-                self._mailItem,
-                self._serverDict,
-                self._processQueue,
-                self._outputFile,
-                self._outputFileReady,
-            )
-        except Exception as error:
-            raise error
-        finally:
-            self._poolSema.release()
+    _workerSignals()
+    reader = _SharedReader()
+    try:
+        while True:
+            task = taskQueue.get()
+            if task is None:
+                return
+            index, mailItem, mailServer = task
+            started = time.monotonic()
+            try:
+                report = _sendMailFunc(
+                    reader.resolve(mailItem),
+                    mailServer,
+                    outputFile,
+                    outputFileReady,
+                    compression,
+                    transport,
+                    dryRun,
+                )
+                elapsed = time.monotonic() - started
+                resultQueue.put((index, report, {}, False, elapsed))
+            except Exception as error:
+                elapsed = time.monotonic() - started
+                relayFailure = _isRelayFailure(error)
+                details = _failureDetails(error)
+                resultQueue.put((index, None, details, relayFailure, elapsed))
+    finally:
+        reader.close()
+        if transport is not None:
+            # e.g. QUIT connections kept open by this worker
+            transport._closeWorker()
 
 
 class AsyncThreads(_SendAsync):
@@ -236,6 +1261,7 @@ class AsyncThreads(_SendAsync):
         maxThreads - Maximum number of concurrent threads allowed, optional, default 10
         outputFile - Empty text file to store successfuly sends, sent to _SendAsync
         waitTime - Time in seconds before each email item, sent to _SendAsync
+        kwargs - Delivery mode and relay options, sent to _SendAsync
 
     Example
     -------
@@ -250,13 +1276,14 @@ class AsyncThreads(_SendAsync):
 
     def __init__(
         self,
-        mailList: List[Dict[str, Any]],
-        serverDict: Dict[str, Any],
+        mailList: List[_MailItemType],
+        serverDict: Union[_ServerType, List[_ServerType]],
         outputFile: str,
         maxThreads: int = 10,
         waitTime: Union[int, float] = 0,
+        **kwargs: Any,
     ) -> None:
-        _SendAsync.__init__(self, mailList, serverDict, outputFile, waitTime)
+        _SendAsync.__init__(self, mailList, serverDict, outputFile, waitTime, **kwargs)
 
         if not isinstance(maxThreads, int):
             raise TypeError("maxThread is not valid int")
@@ -265,38 +1292,24 @@ class AsyncThreads(_SendAsync):
             raise ValueError("maxThreads must be a number greater than 0")
         self._maxThreads = maxThreads
 
-        self._active: List = []
+        if self._autoRun:
+            self.run()
 
-        self.run()
-
-    def run(self) -> List:
-        self._runTest()
-        if len(self._mailList) == 1:
-            return self.emailReport
-
-        self._poolSema = threading.BoundedSemaphore(value=self._maxThreads)
-
-        for mailItem in self._mailList[1:]:
-            newThread = _myThread(
-                mailItem,
-                self._serverDict,
-                self._poolSema,
-                self._processQueue,
-                self._outputFile,
-                self._outputFileReady,
+    def _iterResults(self) -> Iterator[Dict[str, Any]]:
+        if self._deliveryMode == "mx":
+            yield from self._iterDirectMX(
+                self._maxThreads, threading.Thread, queue.Queue, threading.Event
             )
-            newThread.start()
-            self._active.append(newThread)
-            time.sleep(self._waitTime)
-
-        # wait for all items to complete before exiting
-        for jobs in self._active:
-            jobs.join()
+            return
 
-        while self._processQueue.qsize():
-            self.emailReport.append(self._processQueue.get())
-
-        return self.emailReport
+        if (
+            (self._mailList or self._mailSource is not None)
+            and not self._inbox.cancelled
+            and self._transport is None
+            and not self._dryRun
+        ):
+            self._probeRelays()
+        yield from self._iterPool(self._maxThreads, threading.Thread, queue.Queue)
 
 
 class AsyncMP(_SendAsync):
@@ -315,6 +1328,8 @@ class AsyncMP(_SendAsync):
         serverDict - Server settings in dict, sent to _SendAsync
         outputFile - Empty text file to store successfuly sends, sent to _SendAsync
         waitTime - Time in seconds before each email item, sent to _SendAsync
+        maxProcesses - Maximum number of concurrent processes, optional, defaults to the number of CPUs
+        kwargs - Delivery mode and relay options, sent to _SendAsync
 
     Example
     -------
@@ -329,42 +1344,62 @@ class AsyncMP(_SendAsync):
 
     def __init__(
         self,
-        mailList: List[Dict[str, Any]],
-        serverDict: Dict[str, Any],
+        mailList: List[_MailItemType],
+        serverDict: Union[_ServerType, List[_ServerType]],
         outputFile: str,
         waitTime: Union[int, float] = 0,
+        maxProcesses: Optional[int] = None,
+        **kwargs: Any,
     ) -> None:
-        _SendAsync.__init__(self, mailList, serverDict, outputFile, waitTime)
+        _SendAsync.__init__(self, mailList, serverDict, outputFile, waitTime, **kwargs)
 
-        self._active: List = []
+        if maxProcesses is not None and not isinstance(maxProcesses, int):
+            raise TypeError("maxProcesses is not valid int")
 
-        self.run()
+        if maxProcesses is not None and maxProcesses <= 0:
+            raise ValueError("maxProcesses must be a number greater than 0")
+        self._maxProcesses: int = maxProcesses or os.cpu_count() or 1
 
-    def run(self) -> List:
-        self._runTest()
-        if len(self._mailList) == 1:
-            return self.emailReport
-
-        for mailItem in self._mailList[1:]:
-            newProcess = multiprocessing.Process(
-                target=_sendMailFunc,
-                args=(
-                    mailItem,
-                    self._serverDict,
-                    self._processQueue,
-                    self._outputFile,
-                    self._outputFileReady,
-                ),
+        if self._transport is not None and not self._transport._processSafe:
+            raise ValueError(
+                f"{type(self._transport).__name__} can't be used across processes"
             )
-            newProcess.start()
-            self._active.append(newProcess)
-            time.sleep(self._waitTime)
 
-        # wait for all items to complete before exiting
-        for jobs in self._active:
-            jobs.join()
+        if self._autoRun:
+            self.run()
 
-        while not self._processQueue.empty():
-            self.emailReport.append(self._processQueue.get())
+    def _validationProcesses(self) -> int:
+        return self._maxProcesses
 
-        return self.emailReport
+    def _iterResults(self) -> Iterator[Dict[str, Any]]:
+        if (
+            self._deliveryMode != "mx"
+            and (self._mailList or self._mailSource is not None)
+            and not self._inbox.cancelled
+            and self._transport is None
+            and not self._dryRun
+        ):
+            self._probeRelays()
+
+        # bodies and attachments are shared with the processes rather
+        #  than copied into every task, where supported
+        shared = _sharedBodies()
+        try:
+            if self._deliveryMode == "mx":
+                yield from self._iterDirectMX(
+                    self._maxProcesses,
+                    multiprocessing.Process,
+                    multiprocessing.Queue,
+                    multiprocessing.Event,
+                    shared,
+                )
+            else:
+                yield from self._iterPool(
+                    self._maxProcesses,
+                    multiprocessing.Process,
+                    multiprocessing.Queue,
+                    shared,
+                )
+        finally:
+            if shared:
+                shared.close()
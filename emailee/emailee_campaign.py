@@ -0,0 +1,258 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from .emailee_shutdown import _SigtermDrain
+from .emailee_types import MailItem
+
+
+class _Inbox:
+    """
+    Mail items submitted to a running Campaign, waiting for the sender's
+    dispatcher to pick them up. The dispatcher is woken through its result
+    queue, so it never has to poll for new items. An inbox nothing is
+    submitted to, as used by run() and iterResults(), is always finished.
+
+    Parameters
+    -------
+        nextIndex - Index given to the first submitted item, after the mailList items
+        keepOpen - Keep accepting items once everything submitted has been sent, until close()
+    """
+
+    def __init__(self, nextIndex: int = 0, keepOpen: bool = False) -> None:
+        self._lock = threading.Lock()
+        self._items: List[Tuple[int, Any, Future]] = []
+        self._nextIndex: int = nextIndex
+        self._keepOpen: bool = keepOpen
+        self._wakeQueue: Any = None
+        self.closed: bool = False
+        self.cancelled: bool = False
+
+    def _wake(self) -> None:
+        if self._wakeQueue is not None:
+            self._wakeQueue.put(None)
+
+    def setWake(self, wakeQueue: Any) -> None:
+        """
+        Set the queue the dispatcher is waiting on, None is put on it
+        whenever there's something new for the dispatcher to look at
+        """
+
+        with self._lock:
+            self._wakeQueue = wakeQueue
+
+    def put(self, mailItem: Any, future: Future) -> int:
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("This campaign is no longer accepting mail")
+            index = self._nextIndex
+            self._nextIndex += 1
+            self._items.append((index, mailItem, future))
+            self._wake()
+        return index
+
+    def reserve(self) -> int:
+        """
+        Index for a mail item the dispatcher reads from an iterator
+        mailList itself, so it's never also given to a submitted item
+        """
+
+        with self._lock:
+            index = self._nextIndex
+            self._nextIndex += 1
+        return index
+
+    def take(self) -> List[Tuple[int, Any, Future]]:
+        with self._lock:
+            items, self._items = self._items, []
+        return items
+
+    def finished(self) -> bool:
+        """
+        Called by the dispatcher once it has nothing left to send, True
+        if nothing more can be submitted, which stops it accepting more
+        """
+
+        with self._lock:
+            if self._items:
+                return False
+            if self._keepOpen and not self.closed:
+                return False
+            self.closed = True
+            return True
+
+    def close(self, cancel: bool = False) -> None:
+        with self._lock:
+            self.closed = True
+            self.cancelled = self.cancelled or cancel
+            self._wake()
+
+
+class Campaign:
+    """
+    Handle on a mail list being sent in the background, returned by
+    AsyncThreads.start() and AsyncMP.start(). Each mail item gets a
+    concurrent.futures.Future, in mailList order in Campaign.futures, whose
+    result() is the item's result (see iterResults()) once it's sent, or
+    raises ValueError if it failed. Cancelling a future before its item
+    is sent skips it. More mail can be added to the running pool with submit().
+
+    By default the campaign finishes once everything submitted has been
+    sent, with keepOpen=True it keeps its threads or processes running for
+    more mail until close() is called.
+
+    Parameters
+    -------
+        sender - AsyncThreads or AsyncMP class to send the mail list from
+        keepOpen - Keep accepting mail until close(), default False
+
+    Example
+    -------
+    import emailee
+
+    emails = emailee.AsyncThreads([{...}], server, outputFile='output.txt', autoRun=False)
+    campaign = emails.start(keepOpen=True)
+    future = campaign.submit({...})
+    print(future.result())
+    campaign.close()
+    campaign.wait()
+    """
+
+    def __init__(self, sender: Any, keepOpen: bool = False) -> None:
+        if not isinstance(keepOpen, bool):
+            raise TypeError("keepOpen is not a bool")
+
+        self._sender: Any = sender
+        # the handler is set here as it can only be from the main thread
+        self._sigtermDrain: Optional[_SigtermDrain] = (
+            _SigtermDrain(sender.shutdown) if sender._handleSigterm else None
+        )
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {"sent": 0, "failed": 0, "cancelled": 0}
+        self._error: Optional[Exception] = None
+
+        self.futures: List[Future] = []
+        for _ in sender._mailList:
+            self._newFuture()
+        sender._futures = dict(enumerate(self.futures))
+        sender._inbox = self._inbox = _Inbox(len(self.futures), keepOpen)
+
+        self._thread = threading.Thread(target=self._dispatch)
+        self._thread.start()
+
+    def _newFuture(self) -> Future:
+        future: Future = Future()
+        future.add_done_callback(self._count)
+        self.futures.append(future)
+        return future
+
+    def _count(self, future: Future) -> None:
+        if future.cancelled():
+            outcome = "cancelled"
+        elif future.exception() is not None:
+            outcome = "failed"
+        else:
+            outcome = "sent"
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def _dispatch(self) -> None:
+        # runs in the background thread, sending everything through the
+        #  sender until it's finished, closed or cancelled
+        sender = self._sender
+        try:
+            for _ in sender._send(self._sigtermDrain):
+                pass
+        except Exception as error:
+            self._error = error
+            # mail already being sent when the run failed gets the error,
+            #  mail not yet sent is cancelled
+            for future in sender._futures.values():
+                if future.running():
+                    future.set_exception(error)
+        finally:
+            self._inbox.close()
+            for future in sender._futures.values():
+                future.cancel()
+            for _, _, future in self._inbox.take():
+                future.cancel()
+
+    def submit(self, mailItem: Any) -> Future:
+        """
+        Add a mail item (dict or MailItem) to the running campaign,
+        returning its Future. Raises RuntimeError once the campaign has
+        finished or been closed.
+        """
+
+        if not isinstance(mailItem, (dict, MailItem)):
+            raise TypeError("Email item not valid type")
+
+        with self._lock:
+            future = self._newFuture()
+        try:
+            self._inbox.put(mailItem, future)
+        except RuntimeError:
+            with self._lock:
+                self.futures.remove(future)
+            raise
+        return future
+
+    def close(self) -> None:
+        """
+        Stop accepting mail, the campaign finishes once everything
+        already submitted has been sent. Doesn't wait, see wait().
+        """
+
+        self._inbox.close()
+
+    def cancel(self) -> None:
+        """
+        Stop sending, mail already being sent is finished and recorded
+        but everything else is cancelled. Doesn't wait, see wait().
+        """
+
+        self._inbox.close(cancel=True)
+        for future in list(self.futures):
+            future.cancel()
+
+    def shutdown(self) -> None:
+        """
+        Stop sending gracefully, keeping the mail left unsent in the
+        sender's unsentReport and remainderFile, see shutdown() on the
+        sender. Doesn't wait, see wait().
+        """
+
+        self._sender.shutdown()
+
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait up to timeout seconds (forever if None) for the campaign to
+        finish, returning True if it has. Raises the error that stopped
+        the campaign, e.g. if no relay could be connected to.
+        """
+
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            return False
+        if self._error is not None:
+            raise self._error
+        return True
+
+    def progress(self) -> Dict[str, int]:
+        """
+        Count of mail items 'submitted', and how many have been 'sent',
+        have 'failed', were 'cancelled' or are still 'pending'
+        """
+
+        with self._lock:
+            counts = dict(self._counts, submitted=len(self.futures))
+        counts["pending"] = (
+            counts["submitted"]
+            - counts["sent"]
+            - counts["failed"]
+            - counts["cancelled"]
+        )
+        return counts
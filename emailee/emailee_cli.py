@@ -0,0 +1,415 @@
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+_INPUT_FORMATS = ("jsonl", "csv")
+
+# CSV columns holding lists, separated by semicolons, and yes/no flags
+_CSV_LISTS = ("to", "cc", "bcc", "attachmentFiles")
+_CSV_FLAGS = ("ignoreErrors", "splitOversized")
+_CSV_COLUMNS = ("sender", "replyTo", "subject", "msgText", "msgHTML")
+_CSV_INTS = ("priority",)
+
+# seconds between redraws of the progress line
+_PROGRESS_INTERVAL: float = 0.5
+
+# outcomes a resumed run doesn't send again, transient failures are retried
+_SETTLED_OUTCOMES = ("sent", "partial", "permanent", "invalid")
+
+_DESCRIPTION = """
+Send mail items streamed from a JSONL or CSV file, or stdin, through
+AsyncThreads or AsyncMP, with the server settings read from a TOML file.
+Items are read as they're sent, so memory stays flat however long the input.
+"""
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m emailee", description=_DESCRIPTION)
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="-",
+        help="JSONL or CSV file of mail items, or - for stdin (default)",
+    )
+    parser.add_argument(
+        "--server",
+        help="TOML file with a [server] table, or [[relays]] tables for several relays",
+    )
+    parser.add_argument(
+        "--format",
+        choices=_INPUT_FORMATS,
+        help="input format, by default csv for .csv files and jsonl otherwise",
+    )
+    parser.add_argument(
+        "--workers",
+        choices=("threads", "processes"),
+        default="threads",
+        help="send with AsyncThreads (default) or AsyncMP",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="threads (default 10) or processes (default one per CPU) to send with",
+    )
+    parser.add_argument(
+        "--rate", type=float, help="most emails to start sending per second"
+    )
+    parser.add_argument(
+        "--log",
+        help="file to log each mail item's outcome to, one JSON line per item",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip the mail items --log already has as sent or permanently failed",
+    )
+    parser.add_argument(
+        "--output",
+        default=os.devnull,
+        help="outputFile to write sent emails' metadata to, empty or new",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="generate every email without sending, printing the dryRunReport",
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="don't show the progress line"
+    )
+    return parser
+
+
+def _loadToml(path: str) -> Dict[str, Any]:
+    # tomllib from Python 3.11, or the toml package before it
+    try:
+        import tomllib  # type: ignore
+    except ImportError:
+        try:
+            import toml  # type: ignore
+        except ImportError:
+            raise ValueError(
+                "Reading server settings needs Python 3.11+ or the toml package"
+            )
+        with open(path) as file:
+            return toml.load(file)
+    with open(path, "rb") as file:
+        return tomllib.load(file)
+
+
+def _readServer(path: str) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Server settings from a TOML file, the serverDict keys in a [server]
+    table, or a list of relays from [[relays]] tables
+
+    Parameters
+    -------
+        path - TOML file path
+    """
+
+    settings = _loadToml(path)
+    if "relays" in settings:
+        relays = settings["relays"]
+        if not isinstance(relays, list) or not relays:
+            raise ValueError("relays must be one or more [[relays]] tables")
+        return relays
+    if isinstance(settings.get("server"), dict):
+        return settings["server"]
+    raise ValueError("Server settings need a [server] table or [[relays]] tables")
+
+
+def _csvItem(row: Dict[str, Any]) -> Dict[str, Any]:
+    # a mail item from a CSV row, empty cells and other columns are left out
+    mailItem: Dict[str, Any] = {}
+    for column in _CSV_COLUMNS:
+        if row.get(column):
+            mailItem[column] = row[column]
+    for column in _CSV_LISTS:
+        values = [value.strip() for value in (row.get(column) or "").split(";")]
+        if any(values):
+            mailItem[column] = [value for value in values if value]
+    for column in _CSV_FLAGS:
+        if row.get(column):
+            mailItem[column] = row[column].strip().lower() in ("1", "true", "yes")
+    for column in _CSV_INTS:
+        if row.get(column):
+            # a cell that isn't a number is left for the sender to report
+            value = row[column].strip()
+            mailItem[column] = int(value) if value.lstrip("-").isdigit() else value
+    return mailItem
+
+
+def _readItems(
+    file: TextIO, inputFormat: str
+) -> Iterator[Tuple[int, Optional[Dict[str, Any]], str]]:
+    """
+    Read (line, mailItem, error) from a JSONL or CSV file as it's iterated
+    over, with the line number each item ends on. mailItem is None with
+    the error if the line can't be read as one. Blank lines are skipped.
+
+    Parameters
+    -------
+        file - Text file of mail items, opened with newline=""
+        inputFormat - 'jsonl' or 'csv'
+    """
+
+    if inputFormat == "csv":
+        reader = csv.DictReader(file)
+        for row in reader:
+            if any(row.values()):
+                yield reader.line_num, _csvItem(row), ""
+        return
+
+    for line, text in enumerate(file, 1):
+        if not text.strip():
+            continue
+        try:
+            mailItem = json.loads(text)
+        except ValueError as error:
+            yield line, None, f"Line isn't valid JSON - {error}"
+            continue
+        if isinstance(mailItem, dict):
+            yield line, mailItem, ""
+        else:
+            yield line, None, "Email item not valid type"
+
+
+def _settledLines(path: str) -> bytearray:
+    # a flag per input line already sent or permanently failed in the log,
+    #  one byte a line so resuming a long run stays small
+    settled = bytearray()
+    with open(path) as file:
+        for text in file:
+            try:
+                entry = json.loads(text)
+            except ValueError:
+                # e.g. the last line, cut short when the run was killed
+                continue
+            if entry.get("outcome") in _SETTLED_OUTCOMES and not entry.get("dryRun"):
+                line = entry["line"]
+                if line >= len(settled):
+                    settled.extend(bytes(line + 1 - len(settled)))
+                settled[line] = 1
+    return settled
+
+
+def _countLines(path: str) -> int:
+    # lines in a file, read in blocks, for the progress line's ETA
+    count = 0
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            count += block.count(b"\n")
+    return count
+
+
+class _Progress:
+    """
+    Progress line on stderr, redrawn at most every _PROGRESS_INTERVAL
+    seconds, with the mail items done, send rate and, if the total is
+    known, the time left at that rate
+
+    Parameters
+    -------
+        total - Mail items to send, or None if unknown, e.g. from stdin
+        stream - Where to draw it, None to not draw it
+    """
+
+    def __init__(self, total: Optional[int], stream: Optional[TextIO]) -> None:
+        self._total = total
+        self._stream = stream
+        self._started = time.monotonic()
+        self._drawn: float = 0.0
+        self.sent: int = 0
+        self.failed: int = 0
+
+    def _line(self) -> str:
+        done = self.sent + self.failed
+        elapsed = time.monotonic() - self._started
+        rate = done / elapsed if elapsed else 0.0
+        line = f"{done}"
+        if self._total is not None:
+            line += f"/{self._total}"
+        line += f" done, {self.sent} sent, {self.failed} failed, {rate:.1f} msg/s"
+        if self._total is not None and rate:
+            left = max(self._total - done, 0) / rate
+            line += f", ETA {int(left // 3600)}:{int(left % 3600 // 60):02}:{int(left % 60):02}"
+        return line
+
+    def update(self, sent: bool) -> None:
+        if sent:
+            self.sent += 1
+        else:
+            self.failed += 1
+        now = time.monotonic()
+        if self._stream is not None and now - self._drawn >= _PROGRESS_INTERVAL:
+            self._drawn = now
+            self._stream.write(f"\r{self._line()}\033[K")
+            self._stream.flush()
+
+    def finish(self) -> None:
+        if self._stream is not None:
+            self._stream.write(f"\r{self._line()}\033[K\n")
+            self._stream.flush()
+
+
+def _openLog(path: str, resume: bool) -> TextIO:
+    # the outcome log, appended to when resuming, line buffered so a killed
+    #  run loses at most the line being written
+    if not resume and os.path.isfile(path) and os.path.getsize(path):
+        raise ValueError(f"{path} isn't empty, use --resume to continue its run")
+    log = open(path, "a", buffering=1)
+    if log.tell():
+        with open(path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            if file.read() != b"\n":
+                # finish a line cut short by a killed run
+                log.write("\n")
+    return log
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the command line sender, returning the exit status: 0 if every
+    mail item was sent, 1 if any failed or were left unsent, 2 on an error
+    in the arguments or settings
+
+    Parameters
+    -------
+        argv - Arguments, sys.argv[1:] if None
+    """
+
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.server is None and not args.dry_run:
+        parser.error("--server is required unless it's a --dry-run")
+    if args.resume and args.log is None:
+        parser.error("--resume needs the --log of the run to resume")
+    if args.concurrency is not None and args.concurrency <= 0:
+        parser.error("--concurrency must be greater than 0")
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--rate must be greater than 0")
+
+    inputFormat = args.format
+    if inputFormat is None:
+        inputFormat = "csv" if args.input.lower().endswith(".csv") else "jsonl"
+
+    from . import AsyncMP, AsyncThreads
+
+    log: Optional[TextIO] = None
+    try:
+        serverDict: Any = _readServer(args.server) if args.server else {}
+        settled = _settledLines(args.log) if args.resume else bytearray()
+        if args.log is not None:
+            log = _openLog(args.log, args.resume)
+        if args.input == "-":
+            file = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+            total = None
+        else:
+            file = open(args.input, encoding="utf-8", newline="")
+            total = _countLines(args.input) - settled.count(1)
+            if inputFormat == "csv":
+                total -= 1
+    except (OSError, ValueError) as error:
+        print(f"emailee: {error}", file=sys.stderr)
+        if log is not None:
+            log.close()
+        return 2
+
+    progress = _Progress(total, None if args.quiet else sys.stderr)
+    # input line of each mail item being sent, by the index the sender gives
+    #  it, which is the order it's read in
+    lines: Dict[int, int] = {}
+    indexes = itertools.count()
+
+    def record(line: int, result: Dict[str, Any]) -> None:
+        result.pop("index", None)
+        if args.dry_run:
+            # so a later run can't be resumed from it
+            result["dryRun"] = True
+        if log is not None:
+            log.write(json.dumps(dict(result, line=line)) + "\n")
+        progress.update(result["status"] == "sent")
+
+    def mailItems() -> Iterator[Dict[str, Any]]:
+        for line, mailItem, error in _readItems(file, inputFormat):
+            if line < len(settled) and settled[line]:
+                continue
+            if mailItem is None:
+                # lines that aren't mail items are failed here, not sent
+                record(line, {"status": "failed", "outcome": "invalid", "error": error})
+                continue
+            lines[next(indexes)] = line
+            yield mailItem
+
+    def onResult(result: Dict[str, Any]) -> None:
+        record(lines.pop(result["index"]), result)
+
+    options: Dict[str, Any] = {
+        "waitTime": 1 / args.rate if args.rate else 0,
+        "onResult": onResult,
+        "autoRun": False,
+        "keepReports": False,
+        "dryRun": args.dry_run,
+    }
+    mainThread = threading.current_thread() is threading.main_thread()
+    try:
+        if args.workers == "processes":
+            sender: Any = AsyncMP(
+                mailItems(),
+                serverDict,
+                args.output,
+                maxProcesses=args.concurrency,
+                handleSigterm=mainThread,
+                **options,
+            )
+        else:
+            sender = AsyncThreads(
+                mailItems(),
+                serverDict,
+                args.output,
+                maxThreads=args.concurrency or 10,
+                handleSigterm=mainThread,
+                **options,
+            )
+    except (OSError, TypeError, ValueError) as error:
+        print(f"emailee: {error}", file=sys.stderr)
+        file.close()
+        if log is not None:
+            log.close()
+        return 2
+
+    previous: Any = None
+    if mainThread:
+        # Ctrl-C stops sending gracefully, like SIGTERM, a second stops it now
+        def interrupt(signum: int, frame: Any) -> None:
+            signal.signal(signal.SIGINT, previous)
+            threading.Thread(target=sender.shutdown).start()
+
+        previous = signal.signal(signal.SIGINT, interrupt)
+    try:
+        sender.run()
+    except ValueError as error:
+        # e.g. no relay could be connected to
+        print(f"\nemailee: {error}", file=sys.stderr)
+        return 1
+    finally:
+        if mainThread:
+            signal.signal(signal.SIGINT, previous)
+        file.close()
+        if log is not None:
+            log.close()
+        progress.finish()
+
+    if args.dry_run:
+        print(json.dumps(sender.dryRunReport, indent=2))
+    unsent = len(sender.unsentReport)
+    if unsent:
+        print(f"emailee: {unsent} mail items were left unsent", file=sys.stderr)
+    return 1 if progress.failed or unsent else 0
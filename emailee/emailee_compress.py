@@ -0,0 +1,194 @@
+import gzip
+import io
+import mimetypes
+import os
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+# attachment file bytes read at a time while compressing
+_READ_SIZE: int = 1024 * 1024
+
+# most compressed attachment bytes kept by each process's cache
+_CACHE_SIZE: int = 64 * 1024 * 1024
+
+# types that are already compressed, and never compressed again
+_COMPRESSED_TYPES = {
+    "application/gzip",
+    "application/pdf",
+    "application/x-7z-compressed",
+    "application/x-bzip2",
+    "application/x-rar-compressed",
+    "application/x-xz",
+    "application/zip",
+    "image/gif",
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+}
+
+# types that compress well, compressed whatever their size
+_COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/rtf",
+    "application/sql",
+    "application/x-sh",
+    "application/x-tar",
+    "application/xml",
+    "image/bmp",
+    "image/svg+xml",
+    "image/tiff",
+}
+
+
+def _shouldCompress(path: str, size: int, minSize: int) -> bool:
+    """
+    True if an attachment is worth compressing, text and other compressible
+    types always are, anything else once it's minSize bytes or over
+    """
+
+    contentType, encoding = mimetypes.guess_type(path)
+    if encoding is not None or contentType is None:
+        # e.g. .gz files, or unknown types which are only compressed if large
+        return encoding is None and size >= minSize
+    mainType = contentType.split("/", 1)[0]
+    if (
+        contentType in _COMPRESSED_TYPES
+        or mainType in ("audio", "video")
+        or ".openxmlformats" in contentType
+    ):
+        return False
+    return mainType == "text" or contentType in _COMPRESSIBLE_TYPES or size >= minSize
+
+
+def _readChunks(path: str, data: Optional[bytes]) -> Iterator[bytes]:
+    # data is the file's contents if they've already been read
+    file: BinaryIO = io.BytesIO(data) if data is not None else open(path, "rb")
+    with file:
+        while True:
+            chunk = file.read(_READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _compress(path: str, data: Optional[bytes], compressFormat: str) -> bytes:
+    # streamed a chunk at a time, the uncompressed file is never read whole
+    output = io.BytesIO()
+    name = Path(path).name
+    if compressFormat == "zip":
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+            with archive.open(name, "w") as target:
+                for chunk in _readChunks(path, data):
+                    target.write(chunk)
+    else:
+        # mtime 0 so the same file always compresses to the same bytes
+        with gzip.GzipFile(name, "wb", fileobj=output, mtime=0) as target:
+            for chunk in _readChunks(path, data):
+                target.write(chunk)
+    return output.getvalue()
+
+
+class _CompressionCache:
+    """
+    Compressed attachments by file identity (path, inode, size and
+    modification time) and format, so a file attached to many mail items is
+    compressed once per process. Least recently used entries are dropped
+    once the cached bytes go over maxBytes.
+
+    Parameters
+    -------
+        maxBytes - Most compressed bytes to keep
+    """
+
+    def __init__(self, maxBytes: int = _CACHE_SIZE) -> None:
+        self._maxBytes: int = maxBytes
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[bytes, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        self._size: int = 0
+        self._lock = threading.Lock()
+
+    def compress(
+        self, path: str, compressFormat: str, data: Optional[bytes] = None
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        The attachment compressed, and a report of its size, compressed size,
+        ratio and the seconds compressing it took, with cached True if it was
+        already compressed. data is the file's contents if already read.
+        """
+
+        stat = os.stat(path)
+        key = (
+            os.path.abspath(path),
+            stat.st_dev,
+            stat.st_ino,
+            stat.st_size,
+            stat.st_mtime_ns,
+            compressFormat,
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0], dict(entry[1], cached=True)
+
+        started = time.perf_counter()
+        compressed = _compress(path, data, compressFormat)
+        size = stat.st_size if data is None else len(data)
+        report = {
+            "file": path,
+            "format": compressFormat,
+            "size": size,
+            "compressedSize": len(compressed),
+            "ratio": round(len(compressed) / max(size, 1), 4),
+            "seconds": round(time.perf_counter() - started, 4),
+        }
+
+        with self._lock:
+            if key not in self._entries and len(compressed) <= self._maxBytes:
+                self._entries[key] = (compressed, report)
+                self._size += len(compressed)
+                while self._size > self._maxBytes:
+                    _, (dropped, _) = self._entries.popitem(last=False)
+                    self._size -= len(dropped)
+        return compressed, dict(report, cached=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+_compressionCache = _CompressionCache()
+
+
+def _compressedAttachment(
+    path: str, data: Optional[bytes], minSize: int, compressFormat: str
+) -> Optional[Tuple[bytes, str, Dict[str, Any]]]:
+    """
+    The compressed attachment, the file name to send it as and its
+    compression report, or None if it isn't worth compressing or didn't
+    get any smaller
+
+    Parameters
+    -------
+        path - Attachment file path
+        data - Attachment file contents if already read, or None to read the file
+        minSize - Size in bytes other than compressible types are compressed from
+        compressFormat - 'gzip' or 'zip'
+    """
+
+    size = os.stat(path).st_size if data is None else len(data)
+    if not _shouldCompress(path, size, minSize):
+        return None
+    compressed, report = _compressionCache.compress(path, compressFormat, data)
+    if len(compressed) >= size:
+        return None
+    name = Path(path).name
+    filename = f"{name}.gz" if compressFormat == "gzip" else f"{Path(name).stem}.zip"
+    return compressed, filename, report
@@ -0,0 +1,553 @@
+import errno
+import io
+import os
+import re
+import selectors
+import smtplib
+import socket
+import subprocess
+import threading
+import time
+from email.generator import BytesGenerator
+from email.policy import compat32
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .emailee_encoding import _downgrade8bit, _has8bit
+
+# delay between staggered connection attempts, as recommended by RFC 8305
+_CONNECT_ATTEMPT_DELAY: float = 0.25
+
+_IN_PROGRESS = {0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN}
+
+# messages are generated as bytes with CRLF line endings, as smtplib only
+#  converts line endings of str messages
+_WIRE_POLICY = compat32.clone(linesep="\r\n")
+
+
+def _getaddrinfo(host: str, port: int) -> List[Any]:
+    return socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+
+
+class _ResolverCache:
+    """
+    TTL bound cache of DNS lookups, by default of SMTP server addresses,
+    shared by every Emailee and async sender in the process so a campaign only
+    resolves its server once per TTL rather than once per email.
+    Concurrent lookups of the same host wait on the first one in flight.
+
+    Parameters
+    -------
+        ttl - Seconds a resolved address list is reused before resolving again
+        lookup - Function doing the uncached lookup, defaults to getaddrinfo
+    """
+
+    def __init__(self, ttl: float = 300, lookup: Optional[Callable] = None) -> None:
+        self._ttl: float = ttl
+        self._lookup: Callable = lookup or _getaddrinfo
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[Any, ...], Tuple[float, Any]] = {}
+        self._pending: Dict[Tuple[Any, ...], threading.Event] = {}
+
+    def resolve(self, *key: Any, ttl: Optional[float] = None) -> Any:
+        # ttl overrides the cache's own for this lookup
+        ttl = self._ttl if ttl is None else ttl
+        while True:
+            with self._lock:
+                entry = self._cache.get(key)
+                if entry and entry[0] + ttl > time.monotonic():
+                    return entry[1]
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    break
+            # another thread is already resolving this host
+            pending.wait()
+
+        try:
+            result = self._lookup(*key)
+            with self._lock:
+                self._cache[key] = (time.monotonic(), result)
+            return result
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+_resolverCache = _ResolverCache()
+
+
+def _interleaveFamilies(addrInfos: List[Any]) -> List[Any]:
+    # alternate address families starting with the resolver's preferred
+    #  one, so a broken family can't delay every attempt (RFC 8305 4)
+    byFamily: Dict[int, List[Any]] = {}
+    for addrInfo in addrInfos:
+        byFamily.setdefault(addrInfo[0], []).append(addrInfo)
+    families = list(byFamily.values())
+    interleaved = []
+    while families:
+        for family in list(families):
+            interleaved.append(family.pop(0))
+            if not family:
+                families.remove(family)
+    return interleaved
+
+
+def _happyEyeballs(
+    addrInfos: List[Any],
+    timeout: Optional[float],
+    delay: float = _CONNECT_ATTEMPT_DELAY,
+    sourceAddress: Optional[Tuple[str, int]] = None,
+) -> socket.socket:
+    """
+    Race staggered non-blocking connection attempts across addrInfos and
+    return the first socket to connect, closing the others. A new attempt is
+    started every delay seconds, or straight away when an attempt fails.
+
+    Parameters
+    -------
+        addrInfos - getaddrinfo style address list
+        timeout - Overall connection timeout in seconds, also set on the returned socket
+        delay - Seconds to wait on an attempt before starting the next one
+        sourceAddress - Optional (host, port) to bind each attempt to
+    """
+
+    remaining = _interleaveFamilies(addrInfos)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    selector = selectors.DefaultSelector()
+    pending: Dict[socket.socket, Any] = {}
+    errors: List[OSError] = []
+    winner: Optional[socket.socket] = None
+    nextAttempt = 0.0
+
+    try:
+        while winner is None:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                raise socket.timeout("timed out")
+
+            if remaining and (not pending or now >= nextAttempt):
+                family, sockType, proto, _, address = remaining.pop(0)
+                sock = socket.socket(family, sockType, proto)
+                sock.setblocking(False)
+                try:
+                    if sourceAddress:
+                        sock.bind(sourceAddress)
+                    result = sock.connect_ex(address)
+                except OSError as error:
+                    sock.close()
+                    errors.append(error)
+                    continue
+                if result not in _IN_PROGRESS:
+                    sock.close()
+                    errors.append(OSError(result, os.strerror(result)))
+                    continue
+                selector.register(sock, selectors.EVENT_WRITE)
+                pending[sock] = address
+                nextAttempt = now + delay
+                continue
+
+            if not pending:
+                break
+
+            wait = max(nextAttempt - now, 0) if remaining else None
+            if deadline is not None:
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+
+            for key, _ in selector.select(wait):
+                sock = key.fileobj  # type: ignore
+                selector.unregister(sock)
+                del pending[sock]
+                result = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if result == 0:
+                    winner = sock
+                    break
+                sock.close()
+                errors.append(OSError(result, os.strerror(result)))
+                nextAttempt = time.monotonic()
+    finally:
+        for sock in pending:
+            sock.close()
+        selector.close()
+
+    if winner is None:
+        if errors:
+            raise errors[0]
+        raise OSError("getaddrinfo returned an empty list")
+
+    winner.setblocking(True)
+    winner.settimeout(timeout)
+    return winner
+
+
+def _createConnection(
+    host: str,
+    port: int,
+    timeout: Any,
+    sourceAddress: Optional[Tuple[str, int]] = None,
+) -> socket.socket:
+    if timeout is socket._GLOBAL_DEFAULT_TIMEOUT:  # type: ignore
+        timeout = socket.getdefaulttimeout()
+    addrInfos = _resolverCache.resolve(host, port)
+    return _happyEyeballs(addrInfos, timeout, sourceAddress=sourceAddress)
+
+
+class _SMTP(smtplib.SMTP):
+    """
+    smtplib.SMTP connecting through the shared resolver cache and
+    happy eyeballs connection attempts
+    """
+
+    def _get_socket(self, host, port, timeout):
+        if self.debuglevel > 0:
+            self._print_debug("connect: to", (host, port), self.source_address)
+        return _createConnection(host, port, timeout, self.source_address)
+
+
+class _SMTP_SSL(smtplib.SMTP_SSL):
+    """
+    smtplib.SMTP_SSL connecting through the shared resolver cache and
+    happy eyeballs connection attempts
+    """
+
+    def _get_socket(self, host, port, timeout):
+        if self.debuglevel > 0:
+            self._print_debug("connect: to", (host, port), self.source_address)
+        newSocket = _createConnection(host, port, timeout, self.source_address)
+        return self.context.wrap_socket(newSocket, server_hostname=self._host)
+
+
+def _unixSocket(path: str, timeout: Any) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)  # type: ignore
+    try:
+        if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:  # type: ignore
+            sock.settimeout(timeout)
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class _UnixSMTP(_SMTP):
+    """
+    _SMTP that connects to a Unix domain socket when host is a path
+    starting "/", e.g. a local MTA, and over TCP otherwise
+    """
+
+    def connect(self, host="localhost", port=0, source_address=None):
+        if not host.startswith("/"):
+            return super().connect(host, port, source_address)
+        if self.debuglevel > 0:
+            self._print_debug("connect: to", host)
+        self._host = host
+        self.sock = _unixSocket(host, self.timeout)
+        self.file = None
+        return self.getreply()
+
+
+class _LMTP(_UnixSMTP):
+    """
+    LMTP client (RFC 2033), over a Unix domain socket or TCP. Sent with
+    _sendMessage, each recipient accepted by RCPT gets its own reply to DATA.
+    """
+
+    ehlo_msg = "lhlo"
+
+
+class _SendmailSMTP(smtplib.SMTP):
+    """
+    smtplib.SMTP session with a sendmail compatible binary run in SMTP mode
+    (-bs), over a socket pair for its stdin and stdout so replies are read
+    with the timeout as they would be from a server. The process exits once
+    the session ends with QUIT, or is stopped when the session is closed.
+
+    Parameters
+    -------
+        command - sendmail binary and any arguments before -bs
+        timeout - Seconds to wait for each reply, and for sendmail to exit
+    """
+
+    def __init__(self, command: List[str], timeout: float) -> None:
+        super().__init__(timeout=timeout)
+        ours, theirs = socket.socketpair()
+        try:
+            self._process = subprocess.Popen(
+                command + ["-bs"],
+                stdin=theirs.fileno(),
+                stdout=theirs.fileno(),
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError:
+            ours.close()
+            raise
+        finally:
+            theirs.close()
+        ours.settimeout(timeout)
+        self.sock = ours
+        code, reply = self.getreply()
+        if code != 220:
+            self.close()
+            raise smtplib.SMTPConnectError(code, reply)
+
+    def close(self) -> None:
+        super().close()
+        try:
+            self._process.wait(self.timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+
+def _sizeLimit(smtp: smtplib.SMTP) -> int:
+    # the largest message in bytes the server advertised with SIZE, 0 if none
+    try:
+        return int(smtp.esmtp_features.get("size", "").split()[0])
+    except (IndexError, ValueError):
+        return 0
+
+
+class _PartGenerator(BytesGenerator):
+    """
+    BytesGenerator writing a multipart message's headers, boundaries and
+    parts to its target as it goes, one part generated at a time, where
+    BytesGenerator buffers the whole body first to pick a boundary that isn't
+    in it. A multipart without a boundary is given a random one up front.
+    Signed multiparts and everything that isn't multipart are generated as
+    BytesGenerator does.
+    """
+
+    # BytesGenerator internals typeshed leaves out
+    _fp: Any
+    _NL: str
+    _mangle_from_: bool
+    _make_boundary: Callable[..., str]
+    _write_headers: Callable[[Any], None]
+    _write_lines: Callable[[str], None]
+
+    def _write(self, msg: Any) -> None:
+        if (
+            msg.get_content_maintype() != "multipart"
+            or msg.get_content_subtype() == "signed"
+            or not isinstance(msg.get_payload(), list)
+        ):
+            super()._write(msg)  # type: ignore
+            return
+
+        if not msg.get_boundary():
+            msg.set_boundary(self._make_boundary())
+        boundary = msg.get_boundary()
+        self._write_headers(msg)
+        if msg.preamble is not None:
+            self._write_lines(self._mangled(msg.preamble))
+            self.write(self._NL)
+        self.write(f"--{boundary}{self._NL}")
+        for index, part in enumerate(msg.get_payload()):
+            if index:
+                self.write(f"{self._NL}--{boundary}{self._NL}")
+            self.clone(self._fp).flatten(part, unixfrom=False, linesep=self._NL)
+        self.write(f"{self._NL}--{boundary}--{self._NL}")
+        if msg.epilogue is not None:
+            self._write_lines(self._mangled(msg.epilogue))
+
+    def _mangled(self, text: str) -> str:
+        return (
+            re.sub("^From ", ">From ", text, flags=re.M) if self._mangle_from_ else text
+        )
+
+
+def _writeWire(message: Any, target: Any) -> None:
+    # the message as sent, with CRLF line endings and unfolded headers as
+    #  message.as_string() generates them, and 8bit parts as raw bytes rather
+    #  than re-encoded to base64 as as_string() does, written to target a
+    #  part at a time
+    _PartGenerator(
+        target, mangle_from_=False, maxheaderlen=0, policy=_WIRE_POLICY
+    ).flatten(message)
+
+
+def _wireBytes(message: Any) -> bytes:
+    output = io.BytesIO()
+    _writeWire(message, output)
+    return output.getvalue()
+
+
+class _BDATWriter:
+    """
+    File-like target for _writeWire that sends the message as it's
+    generated, one BDAT chunk each time chunkSize bytes are written (RFC 3030),
+    so no more than a chunk and the part being generated are held at once
+
+    Parameters
+    -------
+        smtp - Connected smtplib.SMTP, after MAIL FROM and RCPT TO
+        chunkSize - Bytes per BDAT chunk
+    """
+
+    def __init__(self, smtp: smtplib.SMTP, chunkSize: int) -> None:
+        self._smtp = smtp
+        self._chunkSize = chunkSize
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self._buffer += data
+        if len(self._buffer) < self._chunkSize:
+            return
+        # full chunks are sent as slices of the buffer rather than copies
+        sent = 0
+        with memoryview(self._buffer) as view:
+            while len(view) - sent >= self._chunkSize:
+                with view[sent : sent + self._chunkSize] as chunk:
+                    self._send(chunk, last=False)
+                sent += self._chunkSize
+        del self._buffer[:sent]
+
+    def finish(self) -> None:
+        self._send(self._buffer, last=True)
+        self._buffer = bytearray()
+
+    def _send(self, chunk: Any, last: bool) -> None:
+        # no dot stuffing, the server reads exactly the length given
+        command = f"BDAT {len(chunk)}{' LAST' if last else ''}\r\n"
+        self._smtp.send(command.encode("ascii"))
+        self._smtp.send(chunk)
+        code, reply = self._smtp.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, reply)
+
+
+def _rsetQuietly(smtp: smtplib.SMTP) -> None:
+    try:
+        smtp.rset()
+    except smtplib.SMTPServerDisconnected:
+        pass
+
+
+def _sendChunked(
+    smtp: smtplib.SMTP,
+    sender: str,
+    rcpts: List[str],
+    message: Any,
+    chunkSize: int,
+    mailOptions: List[str],
+) -> Dict[str, Tuple[int, bytes]]:
+    # smtplib's sendmail() with BDAT in place of DATA, raising the same errors
+    code, reply = smtp.mail(sender, mailOptions)
+    if code != 250:
+        if code == 421:
+            smtp.close()
+        else:
+            _rsetQuietly(smtp)
+        raise smtplib.SMTPSenderRefused(code, reply, sender)
+
+    refused: Dict[str, Tuple[int, bytes]] = {}
+    for rcpt in rcpts:
+        code, reply = smtp.rcpt(rcpt)
+        if code not in (250, 251):
+            refused[rcpt] = (code, reply)
+        if code == 421:
+            smtp.close()
+            raise smtplib.SMTPRecipientsRefused(refused)
+    if len(refused) == len(rcpts):
+        _rsetQuietly(smtp)
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    writer = _BDATWriter(smtp, chunkSize)
+    try:
+        _writeWire(message, writer)
+        writer.finish()
+    except smtplib.SMTPDataError:
+        _rsetQuietly(smtp)
+        raise
+    return refused
+
+
+def _sendLMTP(
+    smtp: smtplib.SMTP,
+    sender: str,
+    rcpts: List[str],
+    data: bytes,
+    mailOptions: List[str],
+) -> Dict[str, Tuple[int, bytes]]:
+    # smtplib's sendmail() reading LMTP's reply per accepted recipient after
+    #  DATA, raising the same errors, SMTPRecipientsRefused if every
+    #  recipient was refused either at RCPT or after DATA
+    if smtp.has_extn("size"):
+        mailOptions = mailOptions + [f"SIZE={len(data)}"]
+    code, reply = smtp.mail(sender, mailOptions)
+    if code != 250:
+        if code == 421:
+            smtp.close()
+        else:
+            _rsetQuietly(smtp)
+        raise smtplib.SMTPSenderRefused(code, reply, sender)
+
+    refused: Dict[str, Tuple[int, bytes]] = {}
+    accepted = []
+    for rcpt in rcpts:
+        code, reply = smtp.rcpt(rcpt)
+        if code not in (250, 251):
+            refused[rcpt] = (code, reply)
+        else:
+            accepted.append(rcpt)
+        if code == 421:
+            smtp.close()
+            raise smtplib.SMTPRecipientsRefused(refused)
+    if not accepted:
+        _rsetQuietly(smtp)
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, reply = smtp.data(data)
+    replies = [(code, reply)] + [smtp.getreply() for _ in accepted[1:]]
+    for rcpt, (code, reply) in zip(accepted, replies):
+        if code != 250:
+            refused[rcpt] = (code, reply)
+    if len(refused) == len(rcpts):
+        raise smtplib.SMTPRecipientsRefused(refused)
+    return refused
+
+
+def _sendMessage(
+    smtp: smtplib.SMTP,
+    sender: str,
+    rcpts: List[str],
+    message: Any,
+    chunkSize: int,
+    sizeEstimate: int = 0,
+) -> Dict[str, Tuple[int, bytes]]:
+    """
+    Send a generated email.message.Message, with BDAT chunks of chunkSize
+    bytes if the server advertises CHUNKING, otherwise with DATA, which LMTP
+    always uses, with a reply per recipient. 8bit parts
+    are sent as they are to servers advertising 8BITMIME, and re-encoded for
+    others. Returns the refused recipients as smtplib's sendmail() does.
+
+    Parameters
+    -------
+        smtp - smtplib.SMTP after EHLO, and STARTTLS and login where used
+        sender - Envelope sender address
+        rcpts - Envelope recipient addresses
+        message - Message to send
+        chunkSize - Bytes per BDAT chunk, 0 to always send with DATA
+        sizeEstimate - Estimated message size declared with SIZE= on MAIL FROM when
+            sending with BDAT, sendmail() declares the exact size for DATA
+    """
+
+    mailOptions = []
+    if _has8bit(message):
+        if smtp.has_extn("8bitmime"):
+            mailOptions.append("BODY=8BITMIME")
+        else:
+            _downgrade8bit(message)
+
+    if isinstance(smtp, _LMTP):
+        return _sendLMTP(smtp, sender, rcpts, _wireBytes(message), mailOptions)
+    if chunkSize and smtp.has_extn("chunking"):
+        if sizeEstimate and smtp.has_extn("size"):
+            mailOptions.append(f"SIZE={sizeEstimate}")
+        return _sendChunked(smtp, sender, rcpts, message, chunkSize, mailOptions)
+    return smtp.sendmail(sender, rcpts, _wireBytes(message), mailOptions)
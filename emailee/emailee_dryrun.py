@@ -0,0 +1,111 @@
+import sys
+import time
+from typing import Any, Callable, Dict, Optional, Union
+
+from .emailee_render import _CountingWriter, _writeMessage
+from .emailee_schedule import _mailDomains
+
+# CPU seconds used by the calling thread, so each of AsyncThreads' workers
+#  is measured on its own, or by the whole process before Python 3.7
+_cpuClock: Callable[[], float] = getattr(time, "thread_time", time.process_time)
+
+
+def _peakRSS(children: bool = False) -> Optional[int]:
+    """
+    The most memory in bytes this process has held at once, or None where
+    the resource module isn't available, e.g. on Windows
+
+    Parameters
+    -------
+        children - Also count child processes that have been waited for,
+            e.g. AsyncMP's finished workers, taking the largest of any one
+    """
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kilobytes, except on macOS where it's bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _dryRunMessage(mail: Any) -> int:
+    # generate the email as it would be delivered and discard it, returning
+    #  its size in bytes on the wire, CRLF line endings included
+    counter = _CountingWriter(None)
+    _writeMessage(mail._deliveryMessage(), counter, "eml")
+    return counter.written
+
+
+class _DryRunTotals:
+    """
+    Running totals of a dry run's email reports, so they're counted as each
+    email is generated rather than from reports kept for the whole run
+
+    Parameters
+    -------
+        waitTime - Seconds waited after each mail item is dispatched
+        domainRate - Dict of domain to max sends started per second, 'default' for all others
+    """
+
+    def __init__(
+        self, waitTime: Union[int, float], domainRate: Dict[str, Union[int, float]]
+    ) -> None:
+        self._waitTime = waitTime
+        self._domainRate = domainRate
+        self._messages: int = 0
+        self._bytes: int = 0
+        self._cpuTime: float = 0.0
+        self._peakRSS: Optional[int] = None
+        # emails per recipient domain, only counted when there are rates
+        self._domains: Dict[str, int] = {}
+
+    def add(self, report: Dict[str, Any]) -> None:
+        """
+        Count a generated email from its report, with its 'bytes', 'cpuTime'
+        and 'peakRSS' and the recipients its domains are taken from
+        """
+
+        self._messages += 1
+        self._bytes += report["bytes"]
+        self._cpuTime += report["cpuTime"]
+        if report["peakRSS"] is not None:
+            self._peakRSS = max(self._peakRSS or 0, report["peakRSS"])
+        if self._domainRate:
+            for domain in _mailDomains(report):
+                self._domains[domain] = self._domains.get(domain, 0) + 1
+
+    def _projectedTime(self, elapsed: float) -> float:
+        # seconds a real run would take at least, the longest of the dry
+        #  run's own time, waitTime after every email and each recipient
+        #  domain's rate limit. Network time isn't included.
+        projected = max(elapsed, self._messages * self._waitTime)
+        for domain, count in self._domains.items():
+            rate = self._domainRate.get(domain, self._domainRate.get("default"))
+            if rate:
+                # each domain's first send starts straight away
+                projected = max(projected, (count - 1) / rate)
+        return projected
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """
+        The dry run's totals, per message averages, largest peak RSS of any
+        one process and projected time, once it's taken elapsed seconds
+        """
+
+        messages = self._messages
+        peaks = [peak for peak in (self._peakRSS, _peakRSS(children=True)) if peak]
+        return {
+            "messages": messages,
+            "bytes": self._bytes,
+            "bytesPerMessage": round(self._bytes / messages) if messages else 0,
+            "cpuTime": round(self._cpuTime, 6),
+            "cpuPerMessage": round(self._cpuTime / messages, 6) if messages else 0.0,
+            "peakRSS": max(peaks) if peaks else None,
+            "elapsed": round(elapsed, 6),
+            "projectedTime": round(self._projectedTime(elapsed), 6),
+        }
@@ -0,0 +1,146 @@
+from email.charset import BASE64, QP, Charset
+from typing import Any, Dict, Tuple
+
+# longest line RFC 5322 allows without a transfer encoding, excluding CRLF
+_MAX_LINE: int = 998
+
+# quoted-printable and base64 lines are wrapped at 76 characters
+_ENCODED_LINE: int = 76
+
+_ASCII: bytes = bytes(range(128))
+
+# headers and boundary lines each MIME part adds, a little over the usual
+_PART_OVERHEAD: int = 200
+
+# Charset body encodings by Content-Transfer-Encoding, None lets the email
+#  package mark the part 7bit or 8bit from its content
+_BODY_ENCODINGS: Dict[str, Any] = {
+    "7bit": None,
+    "8bit": None,
+    "quoted-printable": QP,
+    "base64": BASE64,
+}
+
+
+def _base64Size(length: int) -> int:
+    encoded = (length + 2) // 3 * 4
+    return encoded + -(-encoded // _ENCODED_LINE)
+
+
+def _cheapestEncoding(data: bytes, eightBit: bool) -> Tuple[str, int]:
+    """
+    Smallest valid Content-Transfer-Encoding for a text body and its
+    approximate encoded size, from one scan of the body's bytes
+
+    Parameters
+    -------
+        data - Text body encoded in its charset
+        eightBit - True if the server accepts 8bit bodies (8BITMIME)
+    """
+
+    lines = data.splitlines()
+    longest = max(map(len, lines), default=0)
+    highBytes = len(data.translate(None, _ASCII))
+    if longest <= _MAX_LINE and b"\0" not in data:
+        if not highBytes:
+            return "7bit", len(data)
+        if eightBit:
+            return "8bit", len(data)
+
+    # high bytes and "=" are escaped as =XX, and encoded lines over 76
+    #  characters get =CRLF soft breaks, escapes taken as evenly spread
+    escaped = highBytes + data.count(b"=")
+    growth = (len(data) + 2 * escaped) / max(len(data), 1)
+    softBreaks = sum(int(len(line) * growth) // (_ENCODED_LINE - 1) for line in lines)
+    qpSize = len(data) + 2 * escaped + 2 * softBreaks
+    base64Size = _base64Size(len(data))
+    if qpSize <= base64Size:
+        return "quoted-printable", qpSize
+    return "base64", base64Size
+
+
+def _base64WireSize(length: int) -> int:
+    # a base64 body's size on the wire, each line ending in CRLF
+    encoded = _base64Size(length)
+    return encoded + -(-encoded // (_ENCODED_LINE + 1))
+
+
+def _encodedSize(data: bytes, eightBit: bool) -> int:
+    # a text body's size on the wire, each line ending in CRLF
+    _, size = _cheapestEncoding(data, eightBit)
+    return size + data.count(b"\n") + 2
+
+
+def _setTextBody(part: Any, text: str, charset: str, encoding: str) -> None:
+    # replaces a text part's payload, encoded with the given transfer encoding
+    del part["Content-Transfer-Encoding"]
+    bodyCharset = Charset(charset)
+    bodyCharset.body_encoding = _BODY_ENCODINGS[encoding]
+    part.set_payload(text, bodyCharset)
+
+
+def _textPart(text: str, subtype: str, eightBit: bool = True) -> Any:
+    """
+    MIMEText part for text, with the cheapest transfer encoding for its
+    content in place of MIMEText's, which base64 encodes any non-ASCII text
+
+    Parameters
+    -------
+        text - Body text
+        subtype - MIME subtype, e.g. plain or html
+        eightBit - True to allow 8bit encoding, for servers advertising 8BITMIME
+    """
+
+    from email.mime.text import MIMEText
+
+    try:
+        data = text.encode("us-ascii")
+        charset = "us-ascii"
+    except UnicodeEncodeError:
+        data = text.encode("utf-8")
+        charset = "utf-8"
+    encoding, _ = _cheapestEncoding(data, eightBit)
+    part = MIMEText("", subtype, charset)
+    _setTextBody(part, text, charset, encoding)
+    return part
+
+
+def _has8bit(message: Any) -> bool:
+    return any(
+        part.get("Content-Transfer-Encoding") == "8bit" for part in message.walk()
+    )
+
+
+def _downgrade8bit(message: Any) -> None:
+    """
+    Re-encode a message's 8bit parts as quoted-printable or base64,
+    whichever is smaller, for servers that don't advertise 8BITMIME
+    """
+
+    for part in message.walk():
+        if part.get("Content-Transfer-Encoding") != "8bit":
+            continue
+        data = part.get_payload(decode=True)
+        charset = part.get_content_charset() or "utf-8"
+        encoding, _ = _cheapestEncoding(data, eightBit=False)
+        _setTextBody(part, data.decode(charset), charset, encoding)
+
+
+def _wireSavings(message: Any) -> int:
+    """
+    Bytes a message's text parts are smaller by than with MIMEText's
+    encodings, 7bit for ASCII text and base64 for anything else
+    """
+
+    saved = 0
+    for part in message.walk():
+        if part.get_content_maintype() != "text":
+            continue
+        data = part.get_payload(decode=True)
+        try:
+            data.decode("us-ascii")
+            default = len(data)
+        except UnicodeDecodeError:
+            default = _base64Size(len(data))
+        saved += default - len(part.get_payload())
+    return saved
@@ -0,0 +1,270 @@
+import csv
+import html
+import itertools
+import string
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Union
+
+# CSV rows read at a time, each chunk added to the columns at once
+_MERGE_CHUNK: int = 10000
+
+
+def _templateFields(template: str) -> List[str]:
+    # the $name and ${name} placeholders of a string.Template, in order,
+    #  raising ValueError for a $ that isn't one or $$
+    fields: List[str] = []
+    for match in string.Template.pattern.finditer(template):
+        if match.group("invalid") is not None:
+            raise ValueError(
+                f"Invalid placeholder in template at character {match.start()}, "
+                "use $$ for a $"
+            )
+        name = match.group("named") or match.group("braced")
+        if name and name not in fields:
+            fields.append(name)
+    return fields
+
+
+def _mergeBody(template: str, fields: Dict[str, str], escape: bool) -> str:
+    """
+    Fill in a body template's placeholders for one recipient, as each email
+    is built, so the template is the only copy of the body held until then
+
+    Parameters
+    -------
+        template - Body with $name placeholders
+        fields - Dict of placeholder name to the recipient's value
+        escape - HTML escape the values, for HTML bodies
+    """
+
+    if escape:
+        fields = {name: html.escape(value) for name, value in fields.items()}
+    return string.Template(template).substitute(fields)
+
+
+class _Column:
+    """
+    One CSV column's values, held as a single UTF-8 buffer and the offset
+    each value ends at, 8 bytes a row on top of the text rather than a str
+    object per value
+    """
+
+    __slots__ = ("_data", "_ends")
+
+    def __init__(self) -> None:
+        self._data = bytearray()
+        self._ends = array("Q")
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def extend(self, values: Iterable[str]) -> None:
+        for value in values:
+            self._data += value.encode("utf-8", "surrogatepass")
+            self._ends.append(len(self._data))
+
+    def __getitem__(self, index: int) -> str:
+        start = self._ends[index - 1] if index else 0
+        end = self._ends[index]
+        return self._data[start:end].decode("utf-8", "surrogatepass")
+
+
+def _addresses(value: str) -> List[str]:
+    # a cell of one or more addresses separated by semicolons
+    return [address.strip() for address in value.split(";") if address.strip()]
+
+
+class MailMerge:
+    """
+    Mail merge of a CSV file with one row per recipient and templates shared
+    by every email, as a mail list for AsyncThreads/AsyncMP that's made as
+    it's sent. The CSV is read in chunks of rows into compact column arrays,
+    keeping only the columns the recipients and templates use, so memory
+    grows with the columns and rows rather than with the body for every row.
+
+    Templates use $column or ${column} placeholders (string.Template), with
+    $$ for a $. The subject is filled in as each mail item is made, the text
+    and HTML bodies only as each email is built by the thread or process
+    sending it, HTML escaping values in the HTML body. Until then every mail
+    item shares the one template, which AsyncMP passes to its processes
+    through shared memory rather than once per email.
+
+    Parameters
+    -------
+        csvFile - CSV file path, or a text file opened with newline="", with a header row
+        sender - sender email
+        subject - subject template, optional
+        msgText - raw text template, optional
+        msgHTML - HTML template, optional
+        replyTo - reply to email, optional
+        toColumn - column of each row's to emails, several separated by semicolons, default 'email'
+        ccColumn - column of cc emails, optional
+        bccColumn - column of bcc emails, optional
+        attachmentFiles - list of attachment file paths for every email, optional
+        ignoreErrors - skip invalid to/cc/bcc addresses rather than failing the email, optional
+        chunkSize - rows read at a time, default 10000
+
+    Example
+    -------
+    import emailee
+
+    merge = emailee.MailMerge("customers.csv", "news@fakeemail.com", subject="Hi $name", msgHTML=template)
+    emails = emailee.AsyncMP(merge.mailItems(), server, outputFile='output.txt', keepReports=False)
+    """
+
+    def __init__(
+        self,
+        csvFile: Union[str, TextIO],
+        sender: str,
+        subject: str = "",
+        msgText: str = "",
+        msgHTML: str = "",
+        replyTo: str = "",
+        toColumn: str = "email",
+        ccColumn: str = "",
+        bccColumn: str = "",
+        attachmentFiles: List[str] = [],
+        ignoreErrors: bool = False,
+        chunkSize: int = _MERGE_CHUNK,
+    ) -> None:
+        for name, value in (
+            ("sender", sender),
+            ("subject", subject),
+            ("msgText", msgText),
+            ("msgHTML", msgHTML),
+            ("replyTo", replyTo),
+            ("toColumn", toColumn),
+            ("ccColumn", ccColumn),
+            ("bccColumn", bccColumn),
+        ):
+            if not isinstance(value, str):
+                raise TypeError(f"{name} not a string")
+
+        if not toColumn:
+            raise ValueError("toColumn can't be empty")
+
+        if not isinstance(attachmentFiles, list) or not all(
+            isinstance(path, str) for path in attachmentFiles
+        ):
+            raise TypeError("attachmentFiles not a list of strings")
+
+        if not isinstance(ignoreErrors, bool):
+            raise TypeError("ignoreErrors is not a bool")
+
+        if not isinstance(chunkSize, int) or isinstance(chunkSize, bool):
+            raise TypeError("chunkSize is not valid int")
+
+        if chunkSize <= 0:
+            raise ValueError("chunkSize must be a number greater than 0")
+
+        self._sender = sender
+        self._replyTo = replyTo
+        self._subject = subject
+        self._msgText = msgText
+        self._msgHTML = msgHTML
+        self._attachmentFiles = list(attachmentFiles)
+        self._ignoreErrors = ignoreErrors
+        self._recipientColumns = {
+            key: column
+            for key, column in (("to", toColumn), ("cc", ccColumn), ("bcc", bccColumn))
+            if column
+        }
+        self._subjectFields = _templateFields(subject)
+        self._bodyFields = _templateFields(msgText)
+        for field in _templateFields(msgHTML):
+            if field not in self._bodyFields:
+                self._bodyFields.append(field)
+
+        if isinstance(csvFile, str):
+            with open(csvFile, encoding="utf-8-sig", newline="") as file:
+                self._columns = self._read(file, chunkSize)
+        elif hasattr(csvFile, "read"):
+            self._columns = self._read(csvFile, chunkSize)
+        else:
+            raise TypeError("csvFile not a path or file")
+
+        self._rows = len(self._columns[toColumn])
+
+    def _read(self, file: TextIO, chunkSize: int) -> Dict[str, _Column]:
+        # the columns the recipients and templates use, read chunkSize rows
+        #  at a time, one column array each
+        reader = csv.reader(file)
+        header = next(reader, None) or []
+        if header:
+            # a file opened as utf-8 rather than utf-8-sig keeps any BOM
+            header[0] = header[0].lstrip("\ufeff")
+        used = list(self._recipientColumns.values())
+        used += [f for f in self._subjectFields + self._bodyFields if f not in used]
+        missing = [name for name in used if name not in header]
+        if missing:
+            raise ValueError(f"CSV has no column for - {missing}")
+
+        positions = {name: header.index(name) for name in used}
+        columns = {name: _Column() for name in used}
+        while True:
+            chunk = list(itertools.islice(reader, chunkSize))
+            if not chunk:
+                return columns
+            for name, position in positions.items():
+                columns[name].extend(
+                    row[position] if position < len(row) else "" for row in chunk
+                )
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def mailItem(self, index: int) -> Dict[str, Any]:
+        """
+        The mail item for the row at index, counting from 0 after the header.
+        Its msgText and msgHTML are the templates, filled in from its
+        '_mergeFields' as the email is built.
+
+        Parameters
+        -------
+            index - Row index
+        """
+
+        if not isinstance(index, int):
+            raise TypeError("index is not valid int")
+
+        if not 0 <= index < self._rows:
+            raise IndexError("MailMerge row index out of range")
+
+        mailItem: Dict[str, Any] = {
+            "sender": self._sender,
+            "replyTo": self._replyTo,
+            "subject": string.Template(self._subject).substitute(
+                {name: self._columns[name][index] for name in self._subjectFields}
+            ),
+            "msgText": self._msgText,
+            "msgHTML": self._msgHTML,
+            "ignoreErrors": self._ignoreErrors,
+            "attachmentFiles": list(self._attachmentFiles),
+        }
+        for key, column in self._recipientColumns.items():
+            mailItem[key] = _addresses(self._columns[column][index])
+        if self._bodyFields:
+            mailItem["_mergeFields"] = {
+                name: self._columns[name][index] for name in self._bodyFields
+            }
+        return mailItem
+
+    def mailItems(self, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Each row's mail item in order, made as it's needed, to pass as an
+        AsyncThreads/AsyncMP mailList
+
+        Parameters
+        -------
+            start - Row index to start from, e.g. to carry on a run, default 0
+        """
+
+        for index in range(start, self._rows):
+            yield self.mailItem(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.mailItems()
+
+    def __repr__(self) -> str:
+        columns = list(self._columns)
+        return f"MailMerge(rows={self._rows}, columns={columns})"
@@ -0,0 +1,406 @@
+import os
+import smtplib
+import socket
+import struct
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .emailee import _helperEmaileeFromDict, _helperMailReport
+from .emailee_connect import _SMTP, _ResolverCache
+from .emailee_outcome import _failureDetails, _sentDetails
+from .emailee_shm import _SharedReader
+from .emailee_shutdown import _workerSignals
+from .emailee_types import _CHUNK_SIZE, MailItem
+
+_DNS_PORT: int = 53
+_DNS_TIMEOUT: float = 5
+_TYPE_MX: int = 15
+
+
+def _nameservers() -> List[str]:
+    # read the system resolvers, defaulting to localhost like glibc does
+    nameservers = []
+    try:
+        with open("/etc/resolv.conf", "r") as file:
+            for line in file:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    nameservers.append(fields[1])
+    except OSError:
+        pass
+    return nameservers or ["127.0.0.1"]
+
+
+def _recvExact(sock: socket.socket, length: int) -> bytes:
+    data = b""
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            raise OSError("DNS server closed the connection")
+        data += chunk
+    return data
+
+
+def _dnsQuery(domain: str, qType: int, nameserver: str, timeout: float) -> bytes:
+    queryId = int.from_bytes(os.urandom(2), "big")
+    question = b"".join(
+        bytes([len(label)]) + label
+        for label in domain.rstrip(".").encode("idna").split(b".")
+    )
+    query = (
+        struct.pack("!HHHHHH", queryId, 0x0100, 1, 0, 0, 0)
+        + question
+        + b"\x00"
+        + struct.pack("!HH", qType, 1)
+    )
+
+    family = socket.AF_INET6 if ":" in nameserver else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        sock.sendto(query, (nameserver, _DNS_PORT))
+        while True:
+            response = sock.recv(65535)
+            if len(response) >= 12 and struct.unpack("!H", response[:2])[0] == queryId:
+                break
+
+    if struct.unpack("!H", response[2:4])[0] & 0x0200:
+        # response truncated, ask again over TCP
+        with socket.create_connection((nameserver, _DNS_PORT), timeout) as sock:
+            sock.sendall(struct.pack("!H", len(query)) + query)
+            length = struct.unpack("!H", _recvExact(sock, 2))[0]
+            response = _recvExact(sock, length)
+    return response
+
+
+def _readName(packet: bytes, offset: int) -> Tuple[str, int]:
+    # returns the dotted name at offset and the offset just past it,
+    #  following compression pointers (RFC 1035 4.1.4)
+    labels = []
+    end = None
+    jumps = 0
+    while True:
+        length = packet[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            jumps += 1
+            if jumps > 20:
+                raise ValueError("DNS name compression loop")
+            offset = struct.unpack_from("!H", packet, offset)[0] & 0x3FFF
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labelEnd = offset + length
+        labels.append(packet[offset:labelEnd].decode("ascii", "replace"))
+        offset = labelEnd
+    return ".".join(labels), end if end is not None else offset
+
+
+def _parseMXResponse(response: bytes, domain: str) -> List[Tuple[int, str]]:
+    try:
+        flags, qdCount, anCount = struct.unpack_from("!HHH", response, 2)
+        if flags & 0x000F == 3:
+            raise ValueError(f"Domain does not exist - {domain}")
+        if flags & 0x000F != 0:
+            raise OSError(f"DNS server error code {flags & 0x000F} for {domain}")
+
+        offset = 12
+        for _ in range(qdCount):
+            offset = _readName(response, offset)[1] + 4
+
+        records = []
+        for _ in range(anCount):
+            offset = _readName(response, offset)[1]
+            rType, _, _, rdLength = struct.unpack_from("!HHIH", response, offset)
+            offset += 10
+            if rType == _TYPE_MX:
+                preference = struct.unpack_from("!H", response, offset)[0]
+                records.append((preference, _readName(response, offset + 2)[0]))
+            offset += rdLength
+    except (IndexError, struct.error):
+        raise ValueError(f"Malformed DNS response for {domain}")
+
+    if not records:
+        # no MX published, deliver to the domain itself (RFC 5321 5.1)
+        return [(0, domain)]
+    if records == [(0, "")]:
+        raise ValueError(f"Domain does not accept email (null MX) - {domain}")
+    return sorted(records)
+
+
+def _lookupMX(domain: str) -> List[Tuple[int, str]]:
+    errors = []
+    for nameserver in _nameservers():
+        try:
+            response = _dnsQuery(domain, _TYPE_MX, nameserver, _DNS_TIMEOUT)
+            return _parseMXResponse(response, domain)
+        except OSError as error:
+            errors.append(f"{nameserver} - {error}")
+    raise ValueError(f"MX lookup failed for {domain} - {errors}")
+
+
+_mxCache = _ResolverCache(lookup=_lookupMX)
+
+
+def _defaultMXResolver(domain: str) -> List[Tuple[int, str]]:
+    """
+    Default direct to MX resolver, querying the system nameservers
+    with results cached per domain
+
+    Returns a list of (preference, MX host) tuples
+    """
+
+    return _mxCache.resolve(domain.lower())
+
+
+def _recipientDomain(address: Any) -> str:
+    if not isinstance(address, str):
+        return ""
+    return address.rsplit("@", 1)[-1].lower()
+
+
+def _withoutDomains(mailItem: Any, domains: List[str]) -> Any:
+    # the mail item with recipients at domains already delivered to removed,
+    #  for sending the rest of an item again
+    values = mailItem.asDict() if isinstance(mailItem, MailItem) else dict(mailItem)
+    for key in ("to", "cc", "bcc"):
+        if values.get(key):
+            values[key] = [
+                address
+                for address in values[key]
+                if _recipientDomain(address) not in domains
+            ]
+    return MailItem.fromDict(values) if isinstance(mailItem, MailItem) else values
+
+
+def _planDomainJobs(
+    mailList: List[Any],
+    domainConcurrency: Dict[str, int],
+    domainOrder: Union[str, List[str]],
+    firstIndex: int = 0,
+) -> List[Tuple[str, List[Tuple[int, Any]]]]:
+    """
+    Group mail items by recipient domain into delivery jobs. Each job is
+    delivered over one reused connection, so a domain is split into at most
+    its domainConcurrency limit of jobs. Items keep their mailList order
+    within a job.
+
+    Parameters
+    -------
+        mailList - List of all mail items
+        domainConcurrency - Dict of domain to max connections, 'default' for all others
+        domainOrder - 'size' for domains with the most mail first, 'list' for
+            mailList order, or a list of domains to start first, then by size
+        firstIndex - Index of the first mail item, for mail lists that continue another
+    """
+
+    byDomain: Dict[str, List[int]] = {}
+    for index, mailItem in enumerate(mailList, firstIndex):
+        addresses = (
+            mailItem.get("to", []) + mailItem.get("cc", []) + mailItem.get("bcc", [])
+        )
+        for address in addresses:
+            indexes = byDomain.setdefault(_recipientDomain(address), [])
+            if not indexes or indexes[-1] != index:
+                indexes.append(index)
+
+    domains = list(byDomain)
+    if domainOrder != "list":
+        domains.sort(key=lambda domain: len(byDomain[domain]), reverse=True)
+    if isinstance(domainOrder, list):
+        first = [domain.lower() for domain in domainOrder]
+        domains.sort(
+            key=lambda domain: first.index(domain) if domain in first else len(first)
+        )
+
+    jobs = []
+    for domain in domains:
+        indexes = byDomain[domain]
+        limit = domainConcurrency.get(domain, domainConcurrency.get("default", 1))
+        slots = min(limit, len(indexes))
+        for slot in range(slots):
+            jobs.append(
+                (
+                    domain,
+                    [
+                        (index, mailList[index - firstIndex])
+                        for index in indexes[slot::slots]
+                    ],
+                )
+            )
+    return jobs
+
+
+def _connectMX(
+    domain: str, mailServer: Any, mxResolver: Callable
+) -> Tuple[smtplib.SMTP, str]:
+    # STARTTLS is used whenever offered, and required if SSLTLS is TLS. When
+    #  it's only offered and fails, the host is retried once in plaintext, as
+    #  a failed handshake leaves the session unusable
+    required = mailServer.get("SSLTLS") == "TLS"
+    errors = []
+    for _, mxHost in sorted(mxResolver(domain)):
+        for plaintext in (False, True):
+            try:
+                smtp = _SMTP(
+                    mxHost,
+                    mailServer.get("port") or 25,
+                    timeout=mailServer.get("timeout", 30),
+                )
+            except Exception as error:
+                errors.append(f"{mxHost} - {error}")
+                break
+            startTLS = False
+            try:
+                smtp.ehlo()
+                startTLS = required or (not plaintext and smtp.has_extn("starttls"))
+                if startTLS:
+                    smtp.starttls()
+                    smtp.ehlo()
+                return smtp, mxHost
+            except Exception as error:
+                smtp.close()
+                errors.append(f"{mxHost} - {error}")
+                if required or not startTLS:
+                    break
+    raise ConnectionError(f"No MX host for {domain} accepted a connection - {errors}")
+
+
+def _deliverDomain(
+    domain: str,
+    items: List[Tuple[int, Any]],
+    mailServer: Any,
+    mxResolver: Callable,
+    resultQueue: Any,
+    outputFile: str,
+    waitTime: Union[int, float],
+    stopEvent: Any,
+    compression: Optional[Tuple[int, str]] = None,
+) -> List[int]:
+    # returns the indexes of any items left unsent as stopEvent was set
+    smtp: Optional[smtplib.SMTP] = None
+    mxHost = ""
+    connectFailure: Dict[str, Any] = {}
+
+    try:
+        for position, (index, mailItem) in enumerate(items):
+            if stopEvent.is_set():
+                return [index for index, _ in items[position:]]
+            report = _helperMailReport(mailItem)
+            report["domain"] = domain
+            started = time.monotonic()
+            if connectFailure:
+                report.update(connectFailure)
+                resultQueue.put(("failed", index, report, 0.0))
+                continue
+
+            try:
+                mail = _helperEmaileeFromDict(mailItem)
+                if compression is not None:
+                    mail.compressAttachments(*compression)
+                rcpts = [
+                    address
+                    for address in mail._to + mail._cc + mail._bcc
+                    if _recipientDomain(address) == domain
+                ]
+                if not rcpts:
+                    raise ValueError(f"No valid recipients for {domain}")
+                mail._chunkSize = mailServer.get("chunkSize", _CHUNK_SIZE)
+
+                if smtp is None:
+                    try:
+                        smtp, mxHost = _connectMX(domain, mailServer, mxResolver)
+                    except Exception as error:
+                        # don't retry every remaining item against a dead domain,
+                        #  one that doesn't exist won't start to
+                        connectFailure = _failureDetails(error)
+                        if connectFailure["outcome"] == "invalid":
+                            connectFailure["outcome"] = "permanent"
+                        raise
+
+                refused = mail._transmit(smtp, rcpts)
+
+                if outputFile:
+                    with open(outputFile, "a") as file:
+                        file.write(mail.__str__() + "\n")
+                report["mx"] = mxHost
+                report.update(_sentDetails(refused))
+                report["bytesSaved"] = mail._wireSaved
+                if mail._compressionReport:
+                    report["compressed"] = mail._compressionReport
+                if mail._messageCount > 1:
+                    report["parts"] = mail._messageCount
+                resultQueue.put(("sent", index, report, time.monotonic() - started))
+            except Exception as error:
+                report.update(connectFailure or _failureDetails(error))
+                resultQueue.put(("failed", index, report, time.monotonic() - started))
+                if smtp is not None:
+                    # keep the connection for the next item if it's still usable
+                    try:
+                        smtp.rset()
+                    except Exception:
+                        smtp.close()
+                        smtp = None
+
+            stopEvent.wait(waitTime)
+        return []
+    finally:
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                smtp.close()
+
+
+def _mxWorker(
+    jobQueue: Any,
+    resultQueue: Any,
+    mailServer: Any,
+    mxResolver: Callable,
+    outputFile: str,
+    stopEvent: Any,
+    compression: Optional[Tuple[int, str]] = None,
+) -> None:
+    """
+    Thread or process target for direct to MX delivery, delivering
+    domain jobs from jobQueue until it receives None. Once stopEvent is
+    set, jobs stop after the email in progress and QUIT their connection.
+
+    Parameters
+    -------
+        jobQueue - Queue of (domain, [(index, mailItem)], waitTime) jobs, as planned by
+            _planDomainJobs with the time in seconds to wait between each email sent
+        resultQueue - Queue that ('sent' or 'failed', index, report, elapsed) results are
+            added to, and ('done', -1, {'domain': domain, 'unsent': [index]}, 0.0) once each
+            job is finished, listing any items it didn't send as it was stopped
+        mailServer - Server settings, only port, SSLTLS and timeout are used
+        mxResolver - Function returning (preference, MX host) tuples for a domain
+        outputFile - Text file append successful sends metadata to
+        stopEvent - threading or multiprocessing Event, set to stop sending
+        compression - (minSize, compressFormat) to compress attachments with, or None
+    """
+
+    _workerSignals()
+    reader = _SharedReader()
+    try:
+        while True:
+            job = jobQueue.get()
+            if job is None:
+                return
+            domain, items, waitTime = job
+            items = [(index, reader.resolve(mailItem)) for index, mailItem in items]
+            unsent = _deliverDomain(
+                domain,
+                items,
+                mailServer,
+                mxResolver,
+                resultQueue,
+                outputFile,
+                waitTime,
+                stopEvent,
+                compression,
+            )
+            resultQueue.put(("done", -1, {"domain": domain, "unsent": unsent}, 0.0))
+    finally:
+        reader.close()
@@ -0,0 +1,74 @@
+import smtplib
+from typing import Any, Dict, List, Tuple
+
+# the outcome reported for each mail item is one of
+#  sent - accepted for every recipient
+#  partial - accepted, but some recipients were refused
+#  transient - failed in a way that may succeed if tried again (4xx, connection, timeout)
+#  permanent - rejected by the server (5xx)
+#  invalid - never sent as the mail item itself isn't valid
+
+
+def _rootCause(error: BaseException) -> BaseException:
+    # errors are wrapped in ValueError as they're raised through Emailee.send
+    #  and _sendMailFunc, with or without "from", so follow both links
+    seen = {id(error)}
+    while True:
+        cause = error.__cause__
+        if cause is None and not error.__suppress_context__:
+            cause = error.__context__
+        if cause is None or id(cause) in seen:
+            return error
+        seen.add(id(cause))
+        error = cause
+
+
+def _refusedCodes(refused: Dict[str, Tuple[int, Any]]) -> Dict[str, List[Any]]:
+    # smtplib's {address: (code, message bytes)} as plain [code, message] lists
+    return {
+        address: [
+            code,
+            (
+                message.decode("utf-8", "replace")
+                if isinstance(message, bytes)
+                else str(message)
+            ),
+        ]
+        for address, (code, message) in refused.items()
+    }
+
+
+def _sentDetails(refused: Dict[str, Tuple[int, Any]]) -> Dict[str, Any]:
+    """
+    Outcome of a mail item the server accepted, given the refused
+    recipients dict returned by smtplib's sendmail()
+    """
+
+    if not refused:
+        return {"outcome": "sent"}
+    return {"outcome": "partial", "refused": _refusedCodes(refused)}
+
+
+def _failureDetails(error: BaseException) -> Dict[str, Any]:
+    """
+    Error message, outcome and, where the server gave them, the reply code
+    or per recipient codes of a mail item that failed
+    """
+
+    details: Dict[str, Any] = {"error": str(error)}
+    cause = _rootCause(error)
+    if isinstance(cause, smtplib.SMTPRecipientsRefused):
+        details["refused"] = _refusedCodes(cause.recipients)
+        codes = [code for code, _ in cause.recipients.values()]
+        details["outcome"] = "permanent" if min(codes or [500]) >= 500 else "transient"
+    elif isinstance(cause, smtplib.SMTPResponseException):
+        details["code"] = cause.smtp_code
+        details["outcome"] = "permanent" if cause.smtp_code >= 500 else "transient"
+    elif isinstance(cause, (ValueError, TypeError)):
+        details["outcome"] = "invalid"
+    elif isinstance(cause, OSError) and cause.filename is not None:
+        # file errors carry the file name, network errors don't
+        details["outcome"] = "invalid"
+    else:
+        details["outcome"] = "transient"
+    return details
@@ -0,0 +1,292 @@
+import smtplib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .emailee_connect import _SMTP, _SMTP_SSL, _ResolverCache
+from .emailee_outcome import _rootCause
+
+
+def _relayName(serverDict: Any) -> str:
+    if serverDict.get("name"):
+        return serverDict["name"]
+    if serverDict.get("port"):
+        return f"{serverDict.get('smtpServer', '')}:{serverDict['port']}"
+    return serverDict.get("smtpServer", "")
+
+
+# extensions recorded by _probeServer, as named in EHLO replies
+_PROBE_EXTENSIONS: Tuple[str, ...] = (
+    "size",
+    "pipelining",
+    "8bitmime",
+    "chunking",
+    "smtputf8",
+)
+
+
+def _serverKey(serverDict: Any) -> Tuple[Any, ...]:
+    # the settings a connection to a server depends on, with the port and
+    #  encryption filled in as Emailee.server() would
+    port = serverDict.get("port") or 0
+    SSLTLS = serverDict.get("SSLTLS") or ("SSL" if port == 465 else "")
+    if not SSLTLS and port == 587:
+        SSLTLS = "TLS"
+    port = port or {"SSL": 465, "TLS": 587}.get(SSLTLS, 25)
+    return (
+        serverDict.get("smtpServer", ""),
+        port,
+        SSLTLS,
+        serverDict.get("authUsername", ""),
+        serverDict.get("authPassword", ""),
+        serverDict.get("timeout", 30),
+    )
+
+
+def _probeServer(
+    smtpServer: str,
+    port: int,
+    SSLTLS: str,
+    authUsername: str,
+    authPassword: str,
+    timeout: float,
+) -> Dict[str, str]:
+    """
+    Check a server works without sending anything: connects, EHLO,
+    STARTTLS if used, AUTH if there are credentials and NOOP. Returns the
+    extensions in _PROBE_EXTENSIONS the server advertises, with their
+    parameters, e.g. {'size': '35882577', 'pipelining': ''}. Raises the
+    error if any step fails.
+    """
+
+    smtpClass = _SMTP_SSL if SSLTLS == "SSL" else _SMTP
+    smtp = smtpClass(smtpServer, port, timeout=timeout)
+    try:
+        smtp.ehlo()
+        if SSLTLS == "TLS":
+            smtp.starttls()
+            smtp.ehlo()
+        if authUsername and authPassword:
+            smtp.login(authUsername, authPassword)
+        code, message = smtp.noop()
+        if code != 250:
+            raise smtplib.SMTPResponseException(code, message)
+        return {
+            name: smtp.esmtp_features[name]
+            for name in _PROBE_EXTENSIONS
+            if smtp.has_extn(name)
+        }
+    finally:
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+
+# probe results by server settings, so repeated runs against the same
+#  relays skip the probe until the TTL given by each sender runs out
+_probeCache = _ResolverCache(lookup=_probeServer)
+
+
+def _probeRelay(serverDict: Any) -> bool:
+    """
+    Health probe for a relay taken out of rotation, never cached
+    """
+
+    try:
+        _probeServer(*_serverKey(serverDict))
+    except Exception:
+        return False
+    return True
+
+
+def _isRelayFailure(error: BaseException) -> bool:
+    # refused recipients or senders, rejected content, invalid mail items and
+    #  unreadable attachments are problems with the email, anything else
+    #  (connection, auth, 4xx, timeouts) counts against the relay
+    cause = _rootCause(error)
+    if isinstance(cause, smtplib.SMTPRecipientsRefused):
+        return False
+    if isinstance(cause, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return cause.smtp_code < 500
+    if isinstance(cause, (ValueError, TypeError)):
+        return False
+    # file errors carry the file name, network errors don't
+    if isinstance(cause, OSError) and cause.filename is not None:
+        return False
+    return True
+
+
+class _Relay:
+    """
+    Weight, health and usage stats for one relay in a _RelayPool
+
+    Parameters
+    -------
+        serverDict - Server settings in dict, with an optional weight and name
+    """
+
+    def __init__(self, serverDict: Any) -> None:
+        self.serverDict: Any = serverDict
+        self.name: str = _relayName(serverDict)
+        self.weight: int = serverDict.get("weight", 1)
+        self.currentWeight: int = 0
+        self.outstanding: int = 0
+        self.healthy: bool = True
+        self.consecutiveFailures: int = 0
+        self.retryAt: float = 0
+        self.sent: int = 0
+        self.failed: int = 0
+        self.probes: int = 0
+        self.probing: bool = False
+        self.extensions: Dict[str, str] = {}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "relay": self.name,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "sent": self.sent,
+            "failed": self.failed,
+            "probes": self.probes,
+            "extensions": self.extensions,
+        }
+
+
+class _RelayPool:
+    """
+    Spreads mail items across relays, either by smooth weighted round robin
+    or by least outstanding sends per unit of weight. When more than one relay
+    is configured, a relay failing maxFailures times in a row is taken out of
+    rotation and only re-admitted once a health probe succeeds, tried every
+    retryAfter seconds. Probes run in the background, so choosing a relay
+    never waits on the network.
+
+    Parameters
+    -------
+        relays - List of server settings dicts, each with an optional weight
+        strategy - 'roundrobin' or 'leastoutstanding'
+        maxFailures - Consecutive relay failures before a relay is taken out of rotation
+        retryAfter - Seconds between health probes of an unhealthy relay
+        probe - Function taking a server dict and returning True if healthy
+    """
+
+    def __init__(
+        self,
+        relays: List[Any],
+        strategy: str = "roundrobin",
+        maxFailures: int = 3,
+        retryAfter: float = 30,
+        probe: Callable[[Any], bool] = _probeRelay,
+    ) -> None:
+        self.relays: List[_Relay] = [_Relay(serverDict) for serverDict in relays]
+        self._strategy: str = strategy
+        self._maxFailures: int = maxFailures
+        self._retryAfter: float = retryAfter
+        self._probe = probe
+        self._lock = threading.Lock()
+        self._probeThreads: List[threading.Thread] = []
+
+    def _readmit(self) -> None:
+        # called with the lock held, starts a probe of each unhealthy relay
+        #  that's due one
+        now = time.monotonic()
+        for relay in self.relays:
+            if not relay.healthy and not relay.probing and now >= relay.retryAt:
+                relay.probes += 1
+                relay.probing = True
+                thread = threading.Thread(
+                    target=self._runProbe, args=(relay,), daemon=True
+                )
+                self._probeThreads = [t for t in self._probeThreads if t.is_alive()]
+                self._probeThreads.append(thread)
+                thread.start()
+
+    def _runProbe(self, relay: _Relay) -> None:
+        try:
+            healthy = bool(self._probe(relay.serverDict))
+        except Exception:
+            healthy = False
+        with self._lock:
+            relay.probing = False
+            if healthy:
+                relay.healthy = True
+                relay.consecutiveFailures = 0
+            else:
+                relay.retryAt = time.monotonic() + self._retryAfter
+
+    def choose(self, exclude: List[_Relay] = []) -> Optional[_Relay]:
+        """
+        Pick the relay for the next mail item, skipping unhealthy relays and
+        any in exclude, returns None if there are none left to use
+        """
+
+        with self._lock:
+            self._readmit()
+            candidates = [
+                relay for relay in self.relays if relay.healthy and relay not in exclude
+            ]
+            if not candidates:
+                return None
+
+            if self._strategy == "leastoutstanding":
+                chosen = min(
+                    candidates,
+                    key=lambda relay: (relay.outstanding / relay.weight, -relay.weight),
+                )
+            else:
+                # smooth weighted round robin, spreads heavy relays out
+                #  rather than sending them runs of consecutive items
+                for relay in candidates:
+                    relay.currentWeight += relay.weight
+                chosen = max(candidates, key=lambda relay: relay.currentWeight)
+                chosen.currentWeight -= sum(relay.weight for relay in candidates)
+
+            chosen.outstanding += 1
+            return chosen
+
+    def release(self, relay: _Relay, sent: bool, relayFailure: bool) -> None:
+        """
+        Record the outcome of a send chosen with choose()
+        """
+
+        with self._lock:
+            relay.outstanding -= 1
+            if sent:
+                relay.sent += 1
+                relay.consecutiveFailures = 0
+                return
+
+            relay.failed += 1
+            if relayFailure:
+                self._relayFailed(relay)
+
+    def _relayFailed(self, relay: _Relay) -> None:
+        # called with the lock held, takes the relay out of rotation once
+        #  it has failed too many times in a row
+        relay.consecutiveFailures += 1
+        if len(self.relays) > 1 and relay.consecutiveFailures >= self._maxFailures:
+            relay.healthy = False
+            relay.retryAt = time.monotonic() + self._retryAfter
+
+    def recordProbe(
+        self, relay: _Relay, extensions: Optional[Dict[str, str]] = None
+    ) -> None:
+        """
+        Record the result of probing a relay before sending, its extensions
+        if it passed or None if it failed, which counts as a relay failure
+        """
+
+        with self._lock:
+            relay.probes += 1
+            if extensions is not None:
+                relay.extensions = extensions
+                relay.consecutiveFailures = 0
+                return
+
+            relay.failed += 1
+            self._relayFailed(relay)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [relay.stats() for relay in self.relays]
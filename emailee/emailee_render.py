@@ -0,0 +1,239 @@
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from email.policy import compat32
+from email.utils import parseaddr
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .emailee import _helperEmaileeFromDict, _helperMailReport
+from .emailee_types import MailItem
+
+_OUTPUT_FORMATS = ("eml", "mbox")
+
+# mail items rendered by each process pool task
+_RENDER_CHUNK: int = 250
+
+# mbox and Maildir files use LF line endings
+_MBOX_POLICY = compat32.clone(linesep="\n")
+
+_MBOX_NAME = "emails.mbox"
+
+
+class _CountingWriter:
+    # file wrapper counting the bytes the generator writes through it, or
+    #  only counting them if file is None
+    def __init__(self, file: Any) -> None:
+        self._file = file
+        self.written: int = 0
+
+    def write(self, data: bytes) -> int:
+        self.written += len(data)
+        if self._file is None:
+            return len(data)
+        return self._file.write(data)
+
+
+def _writeMessage(message: Any, file: Any, outputFormat: str) -> None:
+    """
+    Write a message straight to file as it's generated, a part at a time,
+    so no more than the part being generated is held besides the message
+    object itself. 'eml' is the message as sent, with CRLF line endings,
+    'maildir' the same with LF, and 'mbox' a From line, the message with
+    body lines starting "From " escaped, and a blank line after.
+
+    Parameters
+    -------
+        message - Message to write
+        file - Binary file, or anything with a write method taking bytes
+        outputFormat - 'eml', 'maildir' or 'mbox'
+    """
+
+    from .emailee_connect import _PartGenerator, _writeWire
+
+    if outputFormat == "eml":
+        _writeWire(message, file)
+        return
+
+    mbox = outputFormat == "mbox"
+    if mbox:
+        sender = parseaddr(message["from"] or "")[1] or "MAILER-DAEMON"
+        file.write(f"From {sender} {time.asctime(time.gmtime())}\n".encode())
+    _PartGenerator(
+        file, mangle_from_=mbox, maxheaderlen=0, policy=_MBOX_POLICY
+    ).flatten(message)
+    if mbox:
+        file.write(b"\n")
+
+
+def _renderChunk(
+    chunk: List[Tuple[int, Any]], outputDir: str, outputFormat: str, width: int
+) -> Tuple[int, int, List[Tuple[int, str]], Optional[str]]:
+    """
+    Process pool task rendering a chunk of mail items, returning the number
+    rendered, bytes written, the (index, error) of each item that couldn't be
+    rendered, and for mbox the part file the chunk was written to
+    """
+
+    mbox = outputFormat == "mbox"
+    rendered = 0
+    errors = []
+    partPath = None
+    partFile = None
+    if mbox and chunk:
+        partPath = os.path.join(outputDir, f".{_MBOX_NAME}.{chunk[0][0]}.part")
+        partFile = open(partPath, "wb")
+    target = _CountingWriter(partFile)
+    written = 0
+    try:
+        for index, mailItem in chunk:
+            try:
+                if not isinstance(mailItem, (dict, MailItem)):
+                    raise TypeError("Email item not valid type")
+                mail = _helperEmaileeFromDict(mailItem)
+                message = mail._message()
+            except Exception as error:
+                errors.append((index, str(error) or type(error).__name__))
+                continue
+
+            if mbox:
+                _writeMessage(message, target, "mbox")
+            else:
+                path = os.path.join(outputDir, f"{index:0{width}d}.eml")
+                with open(path, "wb") as file:
+                    emlTarget = _CountingWriter(file)
+                    _writeMessage(message, emlTarget, "eml")
+                written += emlTarget.written
+            rendered += 1
+    finally:
+        if partFile is not None:
+            partFile.close()
+    return rendered, written + target.written, errors, partPath
+
+
+def _renderChunks(
+    chunks: List[List[Tuple[int, Any]]],
+    outputDir: str,
+    outputFormat: str,
+    width: int,
+    processes: int,
+) -> Iterator[Tuple[int, int, List[Tuple[int, str]], Optional[str]]]:
+    # each chunk's result in mail list order, across a process pool if
+    #  there's more than one chunk to render
+    count = len(chunks)
+    if processes > 1 and count > 1:
+        with ProcessPoolExecutor(max_workers=min(processes, count)) as executor:
+            yield from executor.map(
+                _renderChunk,
+                chunks,
+                [outputDir] * count,
+                [outputFormat] * count,
+                [width] * count,
+            )
+    else:
+        for chunk in chunks:
+            yield _renderChunk(chunk, outputDir, outputFormat, width)
+
+
+def renderMailList(
+    mailList: List[Any],
+    outputDir: str,
+    outputFormat: str = "eml",
+    maxProcesses: Optional[int] = None,
+    chunkSize: int = _RENDER_CHUNK,
+) -> Dict[str, Any]:
+    """
+    Render every mail item in a mail list to RFC 5322 files without sending
+    any, e.g. to archive outgoing mail. Items are rendered in chunks across a
+    pool of processes, each message written to disk as it's generated.
+
+    With 'eml' each message is written to its own file, named by its index in
+    the mail list, e.g. 0042.eml, with CRLF line endings as it would be sent.
+    With 'mbox' the messages are written in mail list order to one
+    emails.mbox file in outputDir.
+
+    Returns a report of the number of messages 'rendered', the 'bytes' and
+    'seconds' it took, 'messagesPerSecond', the 'output' path, and 'failed',
+    the report of each mail item that couldn't be rendered with its 'index',
+    'error' and an 'outcome' of 'invalid'.
+
+    Parameters
+    -------
+        mailList - List of mail dicts or MailItems, as for AsyncThreads/AsyncMP
+        outputDir - Directory to write to, created if it doesn't exist
+        outputFormat - 'eml' or 'mbox'
+        maxProcesses - Processes to render with, None for one per CPU, 1 to render in this process
+        chunkSize - Mail items rendered by each process task
+    """
+
+    if not isinstance(mailList, list):
+        raise TypeError("mailList not in list format")
+    if not isinstance(outputDir, str):
+        raise TypeError("outputDir not in string format")
+    if not isinstance(outputFormat, str):
+        raise TypeError("outputFormat not in string format")
+    if outputFormat not in _OUTPUT_FORMATS:
+        raise ValueError(f"outputFormat must be one of {', '.join(_OUTPUT_FORMATS)}")
+    if maxProcesses is not None and (
+        not isinstance(maxProcesses, int) or isinstance(maxProcesses, bool)
+    ):
+        raise TypeError("maxProcesses not in integer format")
+    if maxProcesses is not None and maxProcesses < 1:
+        raise ValueError("maxProcesses must be at least 1")
+    if not isinstance(chunkSize, int) or isinstance(chunkSize, bool):
+        raise TypeError("chunkSize not in integer format")
+    if chunkSize < 1:
+        raise ValueError("chunkSize must be at least 1")
+
+    os.makedirs(outputDir, exist_ok=True)
+    processes = maxProcesses or os.cpu_count() or 1
+    width = max(len(str(len(mailList) - 1)), 4)
+    indexed = list(enumerate(mailList))
+    # contiguous chunks, so mbox parts join in mail list order
+    chunks = []
+    for first in range(0, len(indexed), chunkSize):
+        last = first + chunkSize
+        chunks.append(indexed[first:last])
+    output = (
+        os.path.join(outputDir, _MBOX_NAME) if outputFormat == "mbox" else outputDir
+    )
+
+    started = time.perf_counter()
+    rendered = written = 0
+    errors: List[Tuple[int, str]] = []
+    mboxFile: Any = open(output, "wb") if outputFormat == "mbox" else None
+    try:
+        for chunkRendered, chunkWritten, chunkErrors, partPath in _renderChunks(
+            chunks, outputDir, outputFormat, width, processes
+        ):
+            rendered += chunkRendered
+            written += chunkWritten
+            errors.extend(chunkErrors)
+            if partPath is not None:
+                with open(partPath, "rb") as part:
+                    shutil.copyfileobj(part, mboxFile)
+                os.remove(partPath)
+    finally:
+        if mboxFile is not None:
+            mboxFile.close()
+    seconds = time.perf_counter() - started
+
+    failed = []
+    for index, error in errors:
+        mailItem = mailList[index]
+        itemReport = (
+            _helperMailReport(mailItem)
+            if isinstance(mailItem, (dict, MailItem))
+            else {}
+        )
+        itemReport.update(index=index, error=error, outcome="invalid")
+        failed.append(itemReport)
+
+    return {
+        "rendered": rendered,
+        "bytes": written,
+        "seconds": round(seconds, 4),
+        "messagesPerSecond": round(rendered / seconds, 1) if seconds else 0.0,
+        "output": output,
+        "failed": failed,
+    }
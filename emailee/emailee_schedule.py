@@ -0,0 +1,165 @@
+import collections
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .emailee_mx import _recipientDomain
+
+
+def _mailDomains(mailItem: Any) -> List[str]:
+    # every recipient domain of a mail item, in recipient order
+    domains: List[str] = []
+    addresses = (
+        mailItem.get("to", []) + mailItem.get("cc", []) + mailItem.get("bcc", [])
+    )
+    for address in addresses:
+        domain = _recipientDomain(address)
+        if domain not in domains:
+            domains.append(domain)
+    return domains or [""]
+
+
+# seconds a priority level waits, passed over for higher ones, to move up a level
+_PRIORITY_AGING: float = 10.0
+
+
+def _mailPriority(mailItem: Any) -> int:
+    # a mail item's priority, higher is sent first, raising TypeError if invalid
+    priority = mailItem.get("priority", 0)
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        raise TypeError("priority is not valid int")
+    return priority
+
+
+class _DomainScheduler:
+    """
+    Queues mail items by priority and recipient domain. Items are handed
+    out from the highest priority level that has one that can start, and
+    within a level round robin across domains, so a slow or throttled
+    domain can't hold up the others. A level that's passed over moves up
+    one level for every aging seconds since it was last handed an item, so
+    a steady stream of urgent mail still lets the rest through. An item is
+    only handed out while every one of its recipient domains is under its
+    concurrency limit and rate. Items are queued under their first
+    recipient's domain and keep their order within it and their level.
+
+    Parameters
+    -------
+        domainConcurrency - Dict of domain to max sends in progress, 'default' for all others
+        domainRate - Dict of domain to max sends started per second, 'default' for all others
+        aging - Seconds a passed over priority level takes to move up one level
+    """
+
+    def __init__(
+        self,
+        domainConcurrency: Dict[str, int],
+        domainRate: Dict[str, Union[int, float]],
+        aging: Union[int, float] = _PRIORITY_AGING,
+    ) -> None:
+        self._concurrency: Dict[str, int] = domainConcurrency
+        self._rate: Dict[str, Union[int, float]] = domainRate
+        self._aging: Union[int, float] = aging
+        # priority to the level's queue per domain, in round robin order
+        self._levels: Dict[int, Any] = {}
+        # when each level was last handed an item, or first queued to
+        self._servedAt: Dict[int, float] = {}
+        self._active: Dict[str, int] = {}
+        self._nextStart: Dict[str, float] = {}
+        self._length: int = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def push(
+        self, task: Any, domains: List[str], front: bool = False, priority: int = 0
+    ) -> None:
+        """
+        Queue a task for the given recipient domains at a priority, front
+        puts it first in line for its domain, e.g. when it's being retried
+        """
+
+        if priority not in self._levels:
+            self._levels[priority] = collections.OrderedDict()
+            self._servedAt[priority] = time.monotonic()
+        domainQueue = self._levels[priority].setdefault(domains[0], collections.deque())
+        if front:
+            domainQueue.appendleft((task, domains))
+        else:
+            domainQueue.append((task, domains))
+        self._length += 1
+
+    def _underLimit(self, domains: List[str]) -> bool:
+        for domain in domains:
+            limit = self._concurrency.get(domain, self._concurrency.get("default"))
+            if limit is not None and self._active.get(domain, 0) >= limit:
+                return False
+        return True
+
+    def _startsAt(self, domains: List[str]) -> float:
+        return max(self._nextStart.get(domain, 0.0) for domain in domains)
+
+    def _order(self, now: float) -> List[int]:
+        # priority levels highest first, counting the levels they've moved up
+        def effective(priority: int) -> Tuple[float, int]:
+            waited = now - self._servedAt[priority]
+            return priority + waited / self._aging, priority
+
+        return sorted(self._levels, key=effective, reverse=True)
+
+    def pop(self) -> Optional[Tuple[Any, List[str]]]:
+        """
+        Return the next (task, domains) that can start now, counting it
+        as in progress until release(), or None if nothing can start
+        """
+
+        now = time.monotonic()
+        for priority in self._order(now):
+            level = self._levels[priority]
+            for domain, domainQueue in level.items():
+                task, domains = domainQueue[0]
+                if not self._underLimit(domains) or self._startsAt(domains) > now:
+                    continue
+
+                domainQueue.popleft()
+                if domainQueue:
+                    # move the domain to the back so the others get a turn
+                    level.move_to_end(domain)
+                else:
+                    del level[domain]
+                if level:
+                    self._servedAt[priority] = now
+                else:
+                    del self._levels[priority], self._servedAt[priority]
+                self._length -= 1
+
+                for itemDomain in domains:
+                    self._active[itemDomain] = self._active.get(itemDomain, 0) + 1
+                    rate = self._rate.get(itemDomain, self._rate.get("default"))
+                    if rate:
+                        self._nextStart[itemDomain] = now + 1 / rate
+                return task, domains
+        return None
+
+    def release(self, domains: List[str]) -> None:
+        """
+        Record that a task handed out by pop() has finished
+        """
+
+        for domain in domains:
+            self._active[domain] -= 1
+
+    def wait(self) -> Optional[float]:
+        """
+        Seconds until a task held back only by its domain rate can start,
+        None if no task is waiting on a rate
+        """
+
+        now = time.monotonic()
+        waits = []
+        for level in self._levels.values():
+            for domainQueue in level.values():
+                _, domains = domainQueue[0]
+                startsAt = self._startsAt(domains)
+                # tasks that could start now are waiting on a worker instead
+                if startsAt > now and self._underLimit(domains):
+                    waits.append(startsAt - now)
+        return min(waits) if waits else None
@@ -0,0 +1,262 @@
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None  # type: ignore
+
+# bodies and attachments smaller than this are cheaper to copy to each process
+_SHARED_MIN_SIZE: int = 4096
+# decoded bodies and attachments each worker keeps, least recently used dropped first
+_READER_CACHE_SIZE: int = 32
+# bytes of blocks no task is using kept for reuse, least recently used unlinked first
+_IDLE_MAX_SIZE: int = 64 * 1024 * 1024
+
+
+def _sharedBodies() -> Optional["_SharedBodies"]:
+    # shared memory needs Python 3.8+, older versions copy bodies to each task
+    return _SharedBodies() if shared_memory is not None else None
+
+
+class _SharedRef:
+    """
+    Placeholder for a body or attachment placed in shared memory,
+    small enough to pickle into every task in its place
+    """
+
+    __slots__ = ("name", "size")
+
+    def __init__(self, name: str, size: int) -> None:
+        self.name = name
+        self.size = size
+
+    def __getstate__(self) -> Tuple[str, int]:
+        return self.name, self.size
+
+    def __setstate__(self, state: Tuple[str, int]) -> None:
+        self.name, self.size = state
+
+
+class _SharedBodies:
+    """
+    Parent side of the AsyncMP shared memory store. Message bodies and
+    attachment files used by more than one mail item are copied into shared
+    memory the second time they're dispatched, and each task after that
+    carries a _SharedRef in their place, so campaigns sharing a large body
+    don't copy it to the workers once per email. Bodies only used once are
+    left in the task. Once the last task using a block is released it's
+    kept for the next task with the same body, up to maxIdleSize bytes of
+    such blocks before the least recently used are unlinked, so a body sent
+    one task at a time isn't copied into a new block for each.
+    close() must be called once the workers are done.
+
+    Parameters
+    -------
+        minSize - Bodies and attachments smaller than this many bytes stay in the task
+        maxIdleSize - Bytes of blocks no task is using that are kept for reuse
+    """
+
+    def __init__(
+        self, minSize: int = _SHARED_MIN_SIZE, maxIdleSize: int = _IDLE_MAX_SIZE
+    ) -> None:
+        if os.name == "posix":
+            # start the resource tracker before any workers, so they share it
+            #  rather than each starting their own that reports the blocks
+            #  they attach to as leaked
+            from multiprocessing import resource_tracker
+
+            resource_tracker.ensure_running()
+
+        self._minSize: int = minSize
+        self._maxIdleSize: int = maxIdleSize
+        # hashes of large bodies and paths of attachments dispatched once
+        self._seenBodies: Set[int] = set()
+        self._seenFiles: Set[str] = set()
+        self._bodies: Dict[str, _SharedRef] = {}
+        self._files: Dict[str, Optional[_SharedRef]] = {}
+        # blocks by name, with the body or attachment path they hold and
+        #  the number of tasks dispatched with them that aren't released
+        self._blocks: Dict[str, Tuple[Any, str, bool]] = {}
+        self._users: Dict[str, int] = {}
+        # sizes of blocks no task is using, least recently released first
+        self._idle: "OrderedDict[str, int]" = OrderedDict()
+        self._idleSize: int = 0
+
+    def _store(self, data: bytes, key: str, isFile: bool) -> _SharedRef:
+        size = len(data)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        block.buf[:size] = data  # type: ignore
+        self._blocks[block.name] = (block, key, isFile)
+        self._users[block.name] = 0
+        return _SharedRef(block.name, size)
+
+    def _use(self, ref: _SharedRef) -> _SharedRef:
+        if ref.name in self._idle:
+            self._idleSize -= self._idle.pop(ref.name)
+        self._users[ref.name] += 1
+        return ref
+
+    def _unlink(self, name: str) -> None:
+        del self._users[name]
+        block, key, isFile = self._blocks.pop(name)
+        del (self._files if isFile else self._bodies)[key]
+        block.close()
+        block.unlink()
+
+    def _body(self, body: str) -> Any:
+        if len(body) < self._minSize:
+            return body
+        ref = self._bodies.get(body)
+        if ref is None:
+            if hash(body) not in self._seenBodies:
+                self._seenBodies.add(hash(body))
+                return body
+            ref = self._bodies[body] = self._store(
+                body.encode("utf-8", "surrogatepass"), body, False
+            )
+        return self._use(ref)
+
+    def _file(self, path: str) -> Optional[_SharedRef]:
+        # None leaves the file to be read by the worker
+        if path not in self._files:
+            if path not in self._seenFiles:
+                self._seenFiles.add(path)
+                return None
+            with open(path, "rb") as file:
+                data = file.read()
+            self._files[path] = (
+                self._store(data, path, True) if len(data) >= self._minSize else None
+            )
+        ref = self._files[path]
+        return None if ref is None else self._use(ref)
+
+    def intern(self, mailItem: Any) -> Dict[str, Any]:
+        """
+        Return the mail item as a dict, with large bodies and attachments
+        already dispatched in an earlier task swapped for _SharedRef
+        placeholders. Pass the task to release() once its worker is done.
+        """
+
+        task: Dict[str, Any] = {
+            key: mailItem.get(key)
+            for key in (
+                "sender",
+                "replyTo",
+                "subject",
+                "to",
+                "cc",
+                "bcc",
+                "ignoreErrors",
+                "attachmentFiles",
+                "splitOversized",
+                "_mergeFields",
+            )
+            if mailItem.get(key) is not None
+        }
+        task["_shared"] = True
+        task["msgText"] = self._body(mailItem.get("msgText") or "")
+        task["msgHTML"] = self._body(mailItem.get("msgHTML") or "")
+
+        attachmentData = {}
+        for path in mailItem.get("attachmentFiles") or []:
+            try:
+                ref = self._file(path)
+            except (OSError, TypeError):
+                # left for the worker to report, as it would without sharing
+                continue
+            if ref is not None:
+                attachmentData[path] = ref
+        if attachmentData:
+            task["_attachmentData"] = attachmentData
+        return task
+
+    def release(self, task: Dict[str, Any]) -> None:
+        """
+        Called once the worker given a task from intern() has finished with
+        it, keeping blocks no other unfinished task uses for reuse until
+        there are more than maxIdleSize bytes of them
+        """
+
+        refs = [task["msgText"], task["msgHTML"]]
+        refs += list(task.get("_attachmentData", {}).values())
+        for ref in refs:
+            if not isinstance(ref, _SharedRef) or ref.name not in self._users:
+                continue
+            self._users[ref.name] -= 1
+            if self._users[ref.name] == 0:
+                self._idle[ref.name] = ref.size
+                self._idleSize += ref.size
+        while self._idleSize > self._maxIdleSize:
+            name, size = self._idle.popitem(last=False)
+            self._idleSize -= size
+            self._unlink(name)
+
+    def close(self) -> None:
+        for block, _, _ in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks = {}
+        self._users = {}
+        self._idle = OrderedDict()
+        self._idleSize = 0
+        self._bodies = {}
+        self._files = {}
+
+
+class _SharedReader:
+    """
+    Worker side of the AsyncMP shared memory store, resolving _SharedRef
+    placeholders back into bodies and attachment bytes. Each block is
+    copied out and detached as soon as it's read, with the most recently
+    used values kept so they're decoded once per worker while in use.
+
+    Parameters
+    -------
+        cacheSize - Number of bodies and attachments to keep decoded
+    """
+
+    def __init__(self, cacheSize: int = _READER_CACHE_SIZE) -> None:
+        self._cacheSize: int = cacheSize
+        self._values: "OrderedDict[Tuple[str, bool], Any]" = OrderedDict()
+
+    def _read(self, ref: _SharedRef, text: bool) -> Any:
+        key = (ref.name, text)
+        value = self._values.get(key)
+        if value is not None:
+            self._values.move_to_end(key)
+            return value
+        block = shared_memory.SharedMemory(name=ref.name)
+        try:
+            data = bytes(block.buf[: ref.size])  # type: ignore
+        finally:
+            block.close()
+        value = data.decode("utf-8", "surrogatepass") if text else data
+        self._values[key] = value
+        if len(self._values) > self._cacheSize:
+            self._values.popitem(last=False)
+        return value
+
+    def resolve(self, mailItem: Any) -> Any:
+        """
+        Return a mail item from _SharedBodies.intern() with its placeholders
+        filled back in, any other mail item is returned as it is
+        """
+
+        if not mailItem.get("_shared"):
+            return mailItem
+        resolved = dict(mailItem)
+        del resolved["_shared"]
+        for key in ("msgText", "msgHTML"):
+            if isinstance(resolved[key], _SharedRef):
+                resolved[key] = self._read(resolved[key], True)
+        if "_attachmentData" in resolved:
+            resolved["_attachmentData"] = {
+                path: self._read(ref, False)
+                for path, ref in resolved["_attachmentData"].items()
+            }
+        return resolved
+
+    def close(self) -> None:
+        self._values = OrderedDict()
@@ -0,0 +1,127 @@
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+from .emailee_types import MailItem
+
+
+def _drainDeadline(drainTimeout: Optional[float]) -> Optional[float]:
+    return None if drainTimeout is None else time.monotonic() + drainTimeout
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    # seconds left until deadline for queue gets and joins, None to wait forever
+    return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+
+# seconds a terminated worker process is given to exit before it's killed
+_TERMINATE_WAIT: float = 2.0
+
+
+def _workerSignals() -> None:
+    """
+    Called first by worker targets. A worker process forked while the
+    sender's SIGTERM handler is set would inherit it, and drain itself
+    rather than stop when terminated, so it's given the default back.
+    Worker threads share the parent's handlers and are left alone.
+    """
+
+    if (
+        multiprocessing.current_process().name != "MainProcess"
+        and threading.current_thread() is threading.main_thread()
+    ):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _stopWorkers(workers: List[Any], deadline: Optional[float]) -> None:
+    """
+    Wait until deadline for workers to finish, terminating any process still
+    running after it, and killing it if it hasn't exited _TERMINATE_WAIT
+    seconds later. Threads can't be stopped, they're left to exit after
+    their current send, which the server timeout keeps bounded.
+    """
+
+    for worker in workers:
+        worker.join(_remaining(deadline))
+        if worker.is_alive() and hasattr(worker, "terminate"):
+            worker.terminate()
+            worker.join(_TERMINATE_WAIT)
+            # kill() is only available from Python 3.7
+            if worker.is_alive() and hasattr(worker, "kill"):
+                worker.kill()
+                worker.join()
+
+
+def _writeRemainder(path: str, mailList: Iterable[Any]) -> None:
+    # one mail item per line, written to a temporary file then moved into
+    #  place, so a kill part way through never leaves half a remainder
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        for mailItem in mailList:
+            if isinstance(mailItem, MailItem):
+                mailItem = mailItem.asDict()
+            file.write(json.dumps(mailItem) + "\n")
+    os.replace(temporary, path)
+
+
+def readRemainder(path: str) -> List[Any]:
+    """
+    Read a remainderFile written when AsyncThreads/AsyncMP stopped early,
+    returning the unsent mail items as a mailList of dicts
+
+    Parameters
+    -------
+        path - remainderFile path
+    """
+
+    if not isinstance(path, str):
+        raise TypeError("remainderFile path not in string format")
+
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class _SigtermDrain:
+    """
+    SIGTERM handler that gracefully shuts down a sender rather than
+    killing the process, while the sender is running. Signal handlers can
+    only be set from the main thread, if restore() is called from another
+    thread the previous handler is put back when the next SIGTERM arrives,
+    and that signal passed on to it.
+
+    Parameters
+    -------
+        shutdown - Function starting the sender's graceful shutdown
+    """
+
+    def __init__(self, shutdown: Callable[[], None]) -> None:
+        self._shutdown = shutdown
+        # None if the handler wasn't set from Python, treated as the default
+        self._previous: Any = signal.getsignal(signal.SIGTERM) or signal.SIG_DFL
+        self._finished: bool = False
+        signal.signal(signal.SIGTERM, self._handle)
+
+    def _handle(self, signum: int, frame: Any) -> None:
+        if self._finished:
+            self._restore()
+            if callable(self._previous):
+                self._previous(signum, frame)
+            elif self._previous != signal.SIG_IGN:
+                os.kill(os.getpid(), signum)
+            return
+        # the interrupted code may hold locks shutdown needs, so it
+        #  runs in its own thread rather than in the handler
+        threading.Thread(target=self._shutdown).start()
+
+    def _restore(self) -> None:
+        if signal.getsignal(signal.SIGTERM) == self._handle:
+            signal.signal(signal.SIGTERM, self._previous)
+
+    def restore(self) -> None:
+        self._finished = True
+        if threading.current_thread() is threading.main_thread():
+            self._restore()
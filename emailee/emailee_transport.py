@@ -0,0 +1,615 @@
+import abc
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Tuple, Union
+
+from .emailee_render import _CountingWriter, _writeMessage
+from .emailee_types import _CHUNK_SIZE
+
+# recipients refused on delivery by address, as smtplib's sendmail() returns
+_Refused = Dict[str, Tuple[int, bytes]]
+
+_FILE_FORMATS = ("mbox", "maildir")
+
+# sendmail's exit status for a temporary failure, from sysexits.h
+_EX_TEMPFAIL: int = 75
+
+
+class Transport(abc.ABC):
+    """
+    How an Emailee's email is delivered. Set one with Emailee.transport() or
+    the async classes' transport option to send somewhere other than the
+    SMTP server, e.g. to time generation and dispatch without network cost.
+    Subclasses implement deliver(), and close() if they hold anything open.
+    """
+
+    # False if the transport only works in the process it was made in, and
+    #  so can't be used with AsyncMP
+    _processSafe: bool = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # locks can't be pickled, AsyncMP's processes each get their own
+        state = self.__dict__.copy()
+        state.pop("_lock", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def deliver(self, mail: Any, rcpts: List[str]) -> _Refused:
+        """
+        Deliver an email to its recipients, returning any that were refused
+        by address, with their reply code and message
+
+        Parameters
+        -------
+            mail - Emailee to deliver
+            rcpts - Every to, cc and bcc address
+        """
+
+    def close(self) -> None:
+        """
+        Release anything the transport holds open
+        """
+
+    def _closeWorker(self) -> None:
+        # called by each async worker thread or process as it stops, to
+        #  release anything held open for that worker
+        pass
+
+
+class SMTPTransport(Transport):
+    """
+    Sends each email to the SMTP server set with Emailee.server(), over a
+    connection of its own. Emailee.send() uses this when no transport is set.
+    """
+
+    def deliver(self, mail: Any, rcpts: List[str]) -> _Refused:
+        # imported on first send as it loads smtplib and ssl
+        from .emailee import _EncType
+        from .emailee_connect import _SMTP, _SMTP_SSL
+
+        try:
+            smtp: object
+
+            if mail._SSLTLS == _EncType.SSL:
+                try:
+                    smtp = _SMTP_SSL(
+                        mail._smtpServer, mail._port, timeout=mail._timeout
+                    )
+                except Exception as error:
+                    raise ValueError(error)
+            else:
+                try:
+                    smtp = _SMTP(mail._smtpServer, mail._port, timeout=mail._timeout)
+                except Exception as error:
+                    raise ValueError(error)
+
+            smtp.ehlo()
+
+            if mail._SSLTLS == _EncType.TLS:
+                smtp.starttls()
+                smtp.ehlo()
+        except Exception as error:
+            raise error
+        if mail._authUsername and mail._authPassword:
+            try:
+                smtp.login(mail._authUsername, mail._authPassword)
+            except Exception as error:
+                raise ValueError(error)
+
+        try:
+            # generated once connected, as the server's SIZE limit and
+            #  8BITMIME support decide how, or whether, it's sent
+            refused = mail._transmit(smtp, rcpts)
+        except Exception as error:
+            smtp.close()
+            raise ValueError(error)
+
+        # QUIT so the server sees the session end cleanly
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+        return refused
+
+
+class MemoryTransport(Transport):
+    """
+    Keeps each email in messages, a list of dicts of its 'sender', 'rcpts'
+    and 'data', the message bytes as they'd be sent. Only for emails sent
+    in this process, so not for AsyncMP.
+    """
+
+    _processSafe = False
+
+    def __init__(self) -> None:
+        Transport.__init__(self)
+        self.messages: List[Dict[str, Any]] = []
+
+    def deliver(self, mail: Any, rcpts: List[str]) -> _Refused:
+        from .emailee_connect import _wireBytes
+
+        data = _wireBytes(mail._deliveryMessage())
+        with self._lock:
+            self.messages.append(
+                {"sender": mail._sender, "rcpts": list(rcpts), "data": data}
+            )
+        return {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self.messages = []
+
+
+class NullTransport(Transport):
+    """
+    Generates each email as it would be sent and discards it, counting the
+    messages and bytes delivered in this process in messages and bytes.
+    """
+
+    def __init__(self) -> None:
+        Transport.__init__(self)
+        self.messages: int = 0
+        self.bytes: int = 0
+
+    def deliver(self, mail: Any, rcpts: List[str]) -> _Refused:
+        counter = _CountingWriter(None)
+        _writeMessage(mail._deliveryMessage(), counter, "eml")
+        with self._lock:
+            self.messages += 1
+            self.bytes += counter.written
+        return {}
+
+
+class FileTransport(Transport):
+    """
+    Writes each email to an mbox file, or as a file of its own in a
+    Maildir's new directory, creating either if it doesn't exist.
+    Maildir can be written to by AsyncMP's processes, mbox can't.
+
+    Parameters
+    -------
+        path - mbox file or Maildir directory path
+        fileFormat - 'mbox' (default) or 'maildir'
+    """
+
+    def __init__(self, path: str, fileFormat: str = "mbox") -> None:
+        if not isinstance(path, str):
+            raise TypeError("transport path not in string format")
+
+        if not isinstance(fileFormat, str):
+            raise TypeError("fileFormat not in string format")
+
+        if fileFormat not in _FILE_FORMATS:
+            raise ValueError("fileFormat must be 'mbox' or 'maildir'")
+
+        Transport.__init__(self)
+        self._path = path
+        self._fileFormat = fileFormat
+        self._processSafe = fileFormat == "maildir"
+        if fileFormat == "maildir":
+            for folder in ("tmp", "new", "cur"):
+                os.makedirs(os.path.join(path, folder), exist_ok=True)
+        else:
+            parent = os.path.dirname(os.path.abspath(path))
+            os.makedirs(parent, exist_ok=True)
+
+    def deliver(self, mail: Any, rcpts: List[str]) -> _Refused:
+        message = mail._deliveryMessage()
+        if self._fileFormat == "mbox":
+            with self._lock, open(self._path, "ab") as file:
+                _writeMessage(message, file, "mbox")
+            return {}
+
+        # written to tmp then moved into new, so readers never see half a message
+        name = f"{int(time.time())}.{uuid.uuid4().hex}.{socket.gethostname()}"
+        temporary = os.path.join(self._path, "tmp", name)
+        with open(temporary, "wb") as file:
+            _writeMessage(message, file, "maildir")
+        os.replace(temporary, os.path.join(self._path, "new", name))
+        return {}
+
+
+class _SessionTransport(Transport):
+    """
+    Base for transports keeping a connection open in each thread, reused for
+    every email the thread sends. A connection idle for _IDLE_CHECK seconds
+    is checked with NOOP before it's reused, and one left in an unknown
+    state by a failed send is closed, the next email opening another.
+    Subclasses implement _connect().
+    """
+
+    # seconds a connection can sit unused before it's checked with NOOP
+    _IDLE_CHECK: float = 5.0
+
+    def __init__(self, timeout: int) -> None:
+        if not isinstance(timeout, int) or isinstance(timeout, bool):
+            raise TypeError("timeout server option not in integer format")
+
+        if timeout <= 0:
+            raise ValueError("Server timeout period is an invalid number")
+
+        Transport.__init__(self)
+        self._timeout = timeout
+        self._local = threading.local()
+        self._sessions: List[Any] = []
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = Transport.__getstate__(self)
+        state.pop("_local", None)
+        state.pop("_sessions", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        Transport.__setstate__(self, state)
+        self._local = threading.local()
+        self._sessions = []
+
+    @abc.abstractmethod
+    def _connect(self) -> Any:
+        """
+        Open a connection for this thread, greeted and ready to send
+        """
+
+    def _session(self) -> Any:
+        # this thread's connection, opened or replaced if it's gone stale
+        smtp = getattr(self._local, "smtp", None)
+        if smtp is not None and time.monotonic() - self._local.used > self._IDLE_CHECK:
+            try:
+                if smtp.noop()[0] != 250:
+                    raise OSError("NOOP refused")
+            except Exception:
+                self._drop(smtp)
+                smtp = None
+        if smtp is None:
+            try:
+                smtp = self._connect()
+            except Exception as error:
+                raise ValueError(error)
+            self._local.smtp = smtp
+            with self._lock:
+                self._sessions.append(smtp)
+        return smtp
+
+    def _drop(self, smtp: Any, quit: bool = False) -> None:
+        if getattr(self._local, "smtp", None) is smtp:
+            self._local.smtp = None
+        with self._lock:
+            if smtp in self._sessions:
+                self._sessions.remove(smtp)
+        try:
+            if quit:
+                smtp.quit()
+            else:
+                smtp.close()
+        except Exception:
+            smtp.close()
+
+    def deliver(self, mail: Any, rcpts: List[str]) -> _Refused:
+        import smtplib
+
+        smtp = self._session()
+        try:
+            refused = mail._transmit(smtp, rcpts)
+        except Exception as error:
+            # refused senders, recipients and content leave the session
+            #  ready for the next email, anything else may not have
+            if smtp.sock is None or not isinstance(
+                error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+            ):
+                self._drop(smtp)
+            raise ValueError(error)
+        finally:
+            self._local.used = time.monotonic()
+        return refused
+
+    def close(self) -> None:
+        """
+        QUIT every connection the transport has open in this process
+        """
+
+        with self._lock:
+            sessions = list(self._sessions)
+        for smtp in sessions:
+            self._drop(smtp, quit=True)
+
+    def _closeWorker(self) -> None:
+        smtp = getattr(self._local, "smtp", None)
+        if smtp is not None:
+            self._drop(smtp, quit=True)
+
+
+class LMTPTransport(_SessionTransport):
+    """
+    Delivers over LMTP to a local delivery agent, such as Dovecot, on a Unix
+    domain socket or a TCP port. Each recipient gets its own reply after the
+    message is sent, so some can be accepted and others refused, as with
+    partial outcomes over SMTP. Each thread keeps its connection open for
+    the emails it sends, close() ends them.
+
+    Parameters
+    -------
+        socketPath - Unix domain socket path, e.g. /var/run/dovecot/lmtp
+        host - Host to connect to over TCP, if there's no socketPath
+        port - TCP port, default 24
+        timeout - Connection and reply timeout in seconds, default 30
+    """
+
+    def __init__(
+        self, socketPath: str = "", host: str = "", port: int = 24, timeout: int = 30
+    ) -> None:
+        if not isinstance(socketPath, str) or not isinstance(host, str):
+            raise TypeError("LMTP socketPath and host not in string format")
+
+        if not isinstance(port, int) or isinstance(port, bool):
+            raise TypeError("LMTP port not in integer format")
+
+        if bool(socketPath) == bool(host):
+            raise ValueError("LMTP needs one of a socketPath or host")
+
+        if port <= 0 or port > 65535:
+            raise ValueError("Port is an invalid number")
+
+        _SessionTransport.__init__(self, timeout)
+        self._socketPath = os.path.abspath(socketPath) if socketPath else ""
+        self._host = host
+        self._port = port
+
+    def _connect(self) -> Any:
+        from .emailee_connect import _LMTP
+
+        smtp = _LMTP(timeout=self._timeout)
+        if self._socketPath:
+            smtp.connect(self._socketPath)
+        else:
+            smtp.connect(self._host, self._port)
+        smtp.ehlo()
+        return smtp
+
+
+class UnixSMTPTransport(_SessionTransport):
+    """
+    Sends over SMTP to a local MTA listening on a Unix domain socket, without
+    STARTTLS or AUTH. Each thread keeps its connection open for the emails
+    it sends, close() ends them.
+
+    Parameters
+    -------
+        socketPath - Unix domain socket path
+        timeout - Connection and reply timeout in seconds, default 30
+        chunkSize - Bytes per BDAT chunk if the MTA advertises CHUNKING, 0 for DATA
+    """
+
+    def __init__(
+        self, socketPath: str, timeout: int = 30, chunkSize: int = _CHUNK_SIZE
+    ) -> None:
+        if not isinstance(socketPath, str):
+            raise TypeError("socketPath not in string format")
+
+        if not socketPath:
+            raise ValueError("socketPath is empty")
+
+        if not isinstance(chunkSize, int) or isinstance(chunkSize, bool):
+            raise TypeError("chunkSize server option not in integer format")
+
+        if chunkSize < 0:
+            raise ValueError("chunkSize cannot be a negative number")
+
+        _SessionTransport.__init__(self, timeout)
+        self._socketPath = os.path.abspath(socketPath)
+        self._chunkSize = chunkSize
+
+    def _connect(self) -> Any:
+        from .emailee_connect import _UnixSMTP
+
+        smtp = _UnixSMTP(timeout=self._timeout)
+        smtp.connect(self._socketPath)
+        smtp.ehlo()
+        return smtp
+
+    def deliver(self, mail: Any, rcpts: List[str]) -> _Refused:
+        mail._chunkSize = self._chunkSize
+        return _SessionTransport.deliver(self, mail, rcpts)
+
+
+class SendmailTransport(Transport):
+    """
+    Pipes each email to a sendmail compatible binary, e.g. where mail can
+    only leave a host through the local MTA. The envelope sender and
+    recipients are passed as arguments (-f and after --), so bcc recipients
+    get the email with no Bcc header, and the message is written to
+    sendmail's stdin a part at a time as it's generated. A non-zero exit
+    status fails the email, as transient for EX_TEMPFAIL (75) and permanent
+    otherwise.
+
+    With batch, sendmail is instead run in SMTP mode (-bs) and each process
+    kept to carry many emails, with per recipient replies. Each message is
+    then sent over that session as it's sent to an SMTP server. At most
+    maxProcesses sendmail processes run at once, in this process.
+
+    Parameters
+    -------
+        command - sendmail binary, or a list of it and any arguments, default /usr/sbin/sendmail
+        batch - True to keep sendmail running in SMTP mode across emails, default False
+        maxProcesses - Most sendmail processes running at once, default 4
+        timeout - Seconds to wait for sendmail, default 30
+    """
+
+    def __init__(
+        self,
+        command: Union[str, List[str]] = "/usr/sbin/sendmail",
+        batch: bool = False,
+        maxProcesses: int = 4,
+        timeout: int = 30,
+    ) -> None:
+        if isinstance(command, str):
+            command = [command]
+
+        if not isinstance(command, list) or not all(
+            isinstance(argument, str) for argument in command
+        ):
+            raise TypeError("sendmail command not a string or list of strings")
+
+        if not command or not command[0]:
+            raise ValueError("sendmail command is empty")
+
+        if not isinstance(batch, bool):
+            raise TypeError("batch is not a bool")
+
+        if not isinstance(maxProcesses, int) or isinstance(maxProcesses, bool):
+            raise TypeError("maxProcesses is not valid int")
+
+        if maxProcesses <= 0:
+            raise ValueError("maxProcesses must be a number greater than 0")
+
+        if not isinstance(timeout, int) or isinstance(timeout, bool):
+            raise TypeError("timeout server option not in integer format")
+
+        if timeout <= 0:
+            raise ValueError("Server timeout period is an invalid number")
+
+        Transport.__init__(self)
+        self._command = command
+        self._batch = batch
+        self._maxProcesses = maxProcesses
+        self._timeout = timeout
+        self._reset()
+
+    def _reset(self) -> None:
+        # sendmail processes running and batch sessions waiting to be reused
+        self._slots = threading.Condition(self._lock)
+        self._running: int = 0
+        self._idle: List[Any] = []
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = Transport.__getstate__(self)
+        for name in ("_slots", "_running", "_idle"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        Transport.__setstate__(self, state)
+        self._reset()
+
+    def _acquire(self) -> Any:
+        # an idle batch session, or None once there's a free process slot
+        with self._slots:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._running < self._maxProcesses:
+                    self._running += 1
+                    return None
+                self._slots.wait()
+
+    def _release(self, smtp: Any = None, reuse: bool = False) -> None:
+        with self._slots:
+            if reuse:
+                self._idle.append(smtp)
+            else:
+                self._running -= 1
+            self._slots.notify()
+
+    def deliver(self, mail: Any, rcpts: List[str]) -> _Refused:
+        if self._batch:
+            return self._deliverBatch(mail, rcpts)
+
+        import subprocess
+        import tempfile
+
+        message = mail._deliveryMessage()
+        self._acquire()
+        try:
+            # stderr goes to a file so sendmail can't block on a full pipe
+            with tempfile.TemporaryFile() as errors:
+                try:
+                    process = subprocess.Popen(
+                        self._command + ["-i", "-f", mail._sender, "--"] + rcpts,
+                        stdin=subprocess.PIPE,
+                        stdout=subprocess.DEVNULL,
+                        stderr=errors,
+                    )
+                except OSError as error:
+                    raise ValueError(error)
+                try:
+                    # LF line endings, as for Maildir, sendmail expects local text
+                    stdin: Any = process.stdin
+                    _writeMessage(message, stdin, "maildir")
+                    stdin.close()
+                except BrokenPipeError:
+                    # sendmail stopped reading, its exit status says why
+                    pass
+                try:
+                    status = process.wait(self._timeout)
+                except subprocess.TimeoutExpired as error:
+                    process.kill()
+                    process.wait()
+                    raise ValueError(error)
+                errors.seek(0)
+                output = errors.read().decode("utf-8", "replace").strip()
+        finally:
+            self._release()
+
+        if status != 0:
+            import smtplib
+
+            code = 451 if status == _EX_TEMPFAIL else 554
+            reply = f"sendmail exited with status {status}: {output}"
+            failure = smtplib.SMTPDataError(code, reply.encode())
+            raise ValueError(failure) from failure
+        return {}
+
+    def _deliverBatch(self, mail: Any, rcpts: List[str]) -> _Refused:
+        import smtplib
+
+        from .emailee_connect import _SendmailSMTP
+
+        smtp = self._acquire()
+        if smtp is None:
+            try:
+                smtp = _SendmailSMTP(self._command, self._timeout)
+                smtp.ehlo()
+            except Exception as error:
+                self._release()
+                raise ValueError(error)
+        try:
+            refused = mail._transmit(smtp, rcpts)
+        except Exception as error:
+            # as for _SessionTransport, only refusals leave the session usable
+            reuse = smtp.sock is not None and isinstance(
+                error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+            )
+            if not reuse:
+                smtp.close()
+            self._release(smtp, reuse)
+            raise ValueError(error)
+        self._release(smtp, reuse=True)
+        return refused
+
+    def close(self) -> None:
+        """
+        QUIT every idle batch session, ending its sendmail process
+        """
+
+        with self._slots:
+            idle, self._idle = self._idle, []
+            self._running -= len(idle)
+            self._slots.notify_all()
+        for smtp in idle:
+            try:
+                smtp.quit()
+            except Exception:
+                smtp.close()
+
+    def _closeWorker(self) -> None:
+        # a worker's session is idle once its last email is sent
+        self.close()
@@ -0,0 +1,268 @@
+from typing import Any, Dict, List, Tuple
+
+# largest BDAT chunk sent to servers advertising CHUNKING, 0 always sends with DATA
+_CHUNK_SIZE: int = 1024 * 1024
+
+# attachments this size or over are compressed when compression is on,
+#  whatever their type unless already compressed
+_COMPRESS_MIN_SIZE: int = 1024 * 1024
+
+_COMPRESS_FORMATS: Tuple[str, ...] = ("gzip", "zip")
+
+
+class _SlottedRecord:
+    """
+    Base for the read-only, slotted mail item and server settings types.
+    Values are validated once when created, there's no per instance __dict__,
+    and they pickle as a plain tuple of values, keeping large mail lists
+    small in memory and cheap to hand to worker processes. get() and item
+    access by key mean they can be used anywhere the equivalent dict is.
+    """
+
+    __slots__: Tuple[str, ...] = ()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def _set(self, **values: Any) -> None:
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        self._set(**dict(zip(self.__slots__, state)))
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.__getstate__() == other.__getstate__()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.asDict()})"
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def asDict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def fromDict(cls, values: Dict[str, Any]) -> Any:
+        if not isinstance(values, dict):
+            raise TypeError(f"{cls.__name__} values not in dict format")
+        unknown = set(values) - set(cls.__slots__)
+        if unknown:
+            raise ValueError(f"Unknown {cls.__name__} keys - {sorted(unknown)}")
+        return cls(**values)
+
+
+def _checkStrList(values: Any, name: str) -> None:
+    if not isinstance(values, list):
+        raise TypeError(f"{name} not in list format")
+    for value in values:
+        if not isinstance(value, str):
+            raise TypeError(f"{name} item not a string - {value}")
+
+
+class MailItem(_SlottedRecord):
+    """
+    A single email for AsyncThreads/AsyncMP, taking the same keys as a mailList
+    dict. Types are checked once here, addresses and attachments are checked
+    when the email is sent, as with dicts.
+
+    Parameters
+    -------
+        sender - sender email
+        replyTo - reply to email, optional
+        subject - email subject, optional
+        msgText - raw text message, optional
+        msgHTML - HTML formatted message, optional
+        to - list of to emails, optional
+        cc - list of cc emails, optional
+        bcc - list of bcc emails, optional
+        ignoreErrors - will continue to send the email, skipping invalid to/cc/bcc items, optional
+        attachmentFiles - list of attachment file paths, optional
+        splitOversized - split attachments across several emails if over the server's SIZE limit, optional
+        priority - higher is sent sooner by the async classes, optional, default 0
+
+    Example
+    -------
+    import emailee
+
+    emails = [emailee.MailItem("john.smith@fakeemail.com", to=["jill.smith@fakeemail.com"])]
+    """
+
+    __slots__ = (
+        "sender",
+        "replyTo",
+        "subject",
+        "msgText",
+        "msgHTML",
+        "to",
+        "cc",
+        "bcc",
+        "ignoreErrors",
+        "attachmentFiles",
+        "splitOversized",
+        "priority",
+    )
+
+    def __init__(
+        self,
+        sender: str = "",
+        replyTo: str = "",
+        subject: str = "",
+        msgText: str = "",
+        msgHTML: str = "",
+        to: List[str] = [],
+        cc: List[str] = [],
+        bcc: List[str] = [],
+        ignoreErrors: bool = False,
+        attachmentFiles: List[str] = [],
+        splitOversized: bool = False,
+        priority: int = 0,
+    ) -> None:
+        for name, value in (
+            ("sender", sender),
+            ("replyTo", replyTo),
+            ("subject", subject),
+            ("msgText", msgText),
+            ("msgHTML", msgHTML),
+        ):
+            if not isinstance(value, str):
+                raise TypeError(f"{name} not a string")
+
+        for name, values in (
+            ("to", to),
+            ("cc", cc),
+            ("bcc", bcc),
+            ("attachmentFiles", attachmentFiles),
+        ):
+            _checkStrList(values, name)
+
+        if not isinstance(ignoreErrors, bool):
+            raise TypeError("ignoreErrors is not a bool")
+
+        if not isinstance(splitOversized, bool):
+            raise TypeError("splitOversized is not a bool")
+
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            raise TypeError("priority is not valid int")
+
+        self._set(
+            sender=sender,
+            replyTo=replyTo,
+            subject=subject,
+            msgText=msgText,
+            msgHTML=msgHTML,
+            # copies, so changing the caller's lists can't change the record
+            #  or get values past the checks above
+            to=list(to),
+            cc=list(cc),
+            bcc=list(bcc),
+            ignoreErrors=ignoreErrors,
+            attachmentFiles=list(attachmentFiles),
+            splitOversized=splitOversized,
+            priority=priority,
+        )
+
+
+class ServerConfig(_SlottedRecord):
+    """
+    SMTP server settings for AsyncThreads/AsyncMP, taking the same keys as a
+    serverDict dict, or one relay in a list of relays
+
+    Parameters
+    -------
+        smtpServer - SMTP server
+        port - port number, optional
+        SSLTLS - 'SSL' or 'TLS' encryption, optional
+        authUsername - authenticated username, optional
+        authPassword - authenticated password, optional
+        timeout - server connection timeout in seconds, default 30
+        chunkSize - bytes per BDAT chunk for servers advertising CHUNKING, default 1MiB, 0 for DATA
+        weight - relay weight when in a list of relays, default 1
+        name - relay name for reporting, optional
+    """
+
+    __slots__ = (
+        "smtpServer",
+        "port",
+        "SSLTLS",
+        "authUsername",
+        "authPassword",
+        "timeout",
+        "chunkSize",
+        "weight",
+        "name",
+    )
+
+    def __init__(
+        self,
+        smtpServer: str = "",
+        port: int = 0,
+        SSLTLS: str = "",
+        authUsername: str = "",
+        authPassword: str = "",
+        timeout: int = 30,
+        chunkSize: int = _CHUNK_SIZE,
+        weight: int = 1,
+        name: str = "",
+    ) -> None:
+        for fieldName, value in (
+            ("smtpServer", smtpServer),
+            ("SSLTLS", SSLTLS),
+            ("authUsername", authUsername),
+            ("authPassword", authPassword),
+            ("name", name),
+        ):
+            if not isinstance(value, str):
+                raise TypeError(f"{fieldName} not in string format")
+
+        for fieldName, number in (
+            ("port", port),
+            ("timeout", timeout),
+            ("chunkSize", chunkSize),
+            ("weight", weight),
+        ):
+            if not isinstance(number, int) or isinstance(number, bool):
+                raise TypeError(f"{fieldName} not in integer format")
+
+        if port < 0 or port > 65535:
+            raise ValueError("Port is an invalid number")
+
+        if SSLTLS not in ("", "SSL", "TLS"):
+            raise ValueError("SSLTLS option is invalid")
+
+        if timeout <= 0:
+            raise ValueError("Server timeout period is an invalid number")
+
+        if chunkSize < 0:
+            raise ValueError("chunkSize cannot be a negative number")
+
+        if weight <= 0:
+            raise ValueError("relay weight must be a number greater than 0")
+
+        self._set(
+            smtpServer=smtpServer,
+            port=port,
+            SSLTLS=SSLTLS,
+            authUsername=authUsername,
+            authPassword=authPassword,
+            timeout=timeout,
+            chunkSize=chunkSize,
+            weight=weight,
+            name=name,
+        )
@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from .emailee import _helperEmaileeFromDict, _helperMailReport
+from .emailee_schedule import _mailPriority
+from .emailee_types import MailItem
+
+# mail lists shorter than this are validated in the calling thread, as
+#  starting processes would take longer than checking the items
+_PARALLEL_MIN_ITEMS: int = 2000
+
+
+def _itemError(mailItem: Any, maxAttachmentSize: Optional[int]) -> str:
+    # why a mail item can't be sent, or "" if it's valid. Checked by building
+    #  the Emailee it would be sent as, so the rules match a real send.
+    try:
+        if not isinstance(mailItem, (dict, MailItem)):
+            raise TypeError("Email item not valid type")
+        _mailPriority(mailItem)
+        mail = _helperEmaileeFromDict(mailItem)
+        for path in mail._attachmentFiles:
+            size = os.stat(path).st_size
+            if maxAttachmentSize is not None and size > maxAttachmentSize:
+                raise ValueError(
+                    f"Attachment is over {maxAttachmentSize} bytes - {path}"
+                )
+    except Exception as error:
+        return str(error) or type(error).__name__
+    return ""
+
+
+def _validateChunk(
+    chunk: List[Tuple[int, Any]], maxAttachmentSize: Optional[int]
+) -> List[Tuple[int, str]]:
+    # process pool task, the (index, error) of each invalid item in chunk
+    errors = []
+    for index, mailItem in chunk:
+        error = _itemError(mailItem, maxAttachmentSize)
+        if error:
+            errors.append((index, error))
+    return errors
+
+
+def _validateMailList(
+    mailList: List[Any],
+    processes: int = 1,
+    maxAttachmentSize: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Check every mail item can be sent, without sending any, returning a
+    report of each invalid item with its index and error. Large lists are
+    split across processes.
+
+    Parameters
+    -------
+        mailList - List of mail dicts or MailItems
+        processes - Maximum number of processes to check a large list with
+        maxAttachmentSize - Largest attachment file allowed in bytes, None for any size
+    """
+
+    indexed = list(enumerate(mailList))
+    if processes > 1 and len(indexed) >= _PARALLEL_MIN_ITEMS:
+        # a few chunks per process, so one slow chunk doesn't hold up the rest
+        count = processes * 4
+        chunks = [indexed[chunk::count] for chunk in range(count)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = executor.map(_validateChunk, chunks, [maxAttachmentSize] * count)
+            errors = sorted(error for result in results for error in result)
+    else:
+        errors = _validateChunk(indexed, maxAttachmentSize)
+
+    report = []
+    for index, error in errors:
+        mailItem = mailList[index]
+        itemReport = (
+            _helperMailReport(mailItem)
+            if isinstance(mailItem, (dict, MailItem))
+            else {}
+        )
+        itemReport.update(index=index, error=error, outcome="invalid")
+        report.append(itemReport)
+    return report
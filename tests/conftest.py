@@ -43,6 +43,16 @@ def file_setup():
         ).unlink()
 
 
+# relay probe results are cached by server settings, and test servers
+#  reuse ports, so each test probes afresh
+@pytest.fixture(autouse=True)
+def probe_cache():
+    yield
+    from emailee.emailee_relay import _probeCache
+
+    _probeCache.clear()
+
+
 # delete all environment variables at end of testing
 @pytest.fixture(scope="session", autouse=True)
 def teardown():
@@ -0,0 +1,95 @@
+# sendmail stand-in for the SendmailTransport tests, run as
+#  python sendmail_stub.py --record DIR [--status N] [--sleep S] <sendmail args>
+# Each run writes a JSON record to DIR with its arguments, the messages it
+#  got and when it started and ended. With -bs it speaks SMTP on stdin/stdout.
+
+import json
+import os
+import sys
+import time
+import uuid
+
+
+def _smtp(stdin, stdout, messages):
+    def reply(line):
+        stdout.write(line.encode() + b"\r\n")
+        stdout.flush()
+
+    reply("220 localhost sendmail stub")
+    sender, rcpts = None, []
+    while True:
+        line = stdin.readline()
+        if not line:
+            return
+        command = line.decode("utf-8", "replace").rstrip("\r\n")
+        verb = command.split(" ", 1)[0].upper()
+        if verb in ("EHLO", "HELO"):
+            reply("250-localhost")
+            reply("250 8BITMIME")
+        elif verb == "MAIL":
+            sender, rcpts = command[10:].split(">", 1)[0].lstrip("<"), []
+            reply("250 OK")
+        elif verb == "RCPT":
+            rcpt = command[8:].split(">", 1)[0].lstrip("<")
+            if rcpt.startswith("refused"):
+                reply("550 No such user")
+            else:
+                rcpts.append(rcpt)
+                reply("250 OK")
+        elif verb == "DATA":
+            reply("354 End data with <CR><LF>.<CR><LF>")
+            data = []
+            while True:
+                dataLine = stdin.readline()
+                if dataLine in (b".\r\n", b""):
+                    break
+                data.append(dataLine[1:] if dataLine.startswith(b".") else dataLine)
+            messages.append(
+                {"sender": sender, "rcpts": rcpts, "data": b"".join(data).decode()}
+            )
+            reply("250 OK")
+        elif verb == "QUIT":
+            reply("221 Bye")
+            return
+        else:
+            reply("250 OK")
+
+
+def main():
+    args = sys.argv[1:]
+    record, status, sleep = args[1], 0, 0.0
+    args = args[2:]
+    while args[0] in ("--status", "--sleep"):
+        if args[0] == "--status":
+            status = int(args[1])
+        else:
+            sleep = float(args[1])
+        args = args[2:]
+
+    started = time.time()
+    messages = []
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    if "-bs" in args:
+        _smtp(stdin, stdout, messages)
+    else:
+        messages.append({"data": stdin.read().decode()})
+    time.sleep(sleep)
+    if status:
+        sys.stderr.write("stub failure\n")
+
+    name = os.path.join(record, f"{os.getpid()}-{uuid.uuid4().hex}.json")
+    with open(name, "w") as file:
+        json.dump(
+            {
+                "args": args,
+                "messages": messages,
+                "started": started,
+                "ended": time.time(),
+            },
+            file,
+        )
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
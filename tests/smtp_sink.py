@@ -0,0 +1,208 @@
+# local SMTP server stand-in, so delivery paths can be tested without a relay
+
+import socket
+import socketserver
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self) -> None:
+        sink: "SMTPSink" = self.server.sink  # type: ignore
+        sink.connections += 1
+        self._reply("220 localhost emailee test sink")
+        sender: Optional[str] = None
+        rcpts: List[str] = []
+        chunks: List[bytes] = []
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").rstrip("\r\n")
+            verb = command.split(" ", 1)[0].upper()
+            sink.commands.append(command)
+
+            if verb in ("EHLO", "HELO", "LHLO") and (verb == "LHLO") != sink.lmtp:
+                # LMTP servers only accept LHLO, and SMTP servers don't
+                self._reply("500 Command not recognised")
+            elif verb in ("EHLO", "HELO", "LHLO"):
+                extensions = ["localhost"] + sink.extensions
+                for extension in extensions[:-1]:
+                    self._reply("250-" + extension)
+                self._reply("250 " + extensions[-1])
+            elif verb == "MAIL":
+                sender = command[10:].split(">", 1)[0].lstrip("<")
+                rcpts = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                rcpt = command[8:].split(">", 1)[0].lstrip("<")
+                if rcpt in sink.refuse:
+                    self._reply(sink.refuse[rcpt])
+                else:
+                    rcpts.append(rcpt)
+                    self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    dataLine = self.rfile.readline()
+                    if dataLine in (b".\r\n", b""):
+                        break
+                    if dataLine.startswith(b"."):
+                        dataLine = dataLine[1:]
+                    data.append(dataLine)
+                sink.messages.append(
+                    {"sender": sender, "rcpts": rcpts, "data": b"".join(data)}
+                )
+                if sink.lmtp:
+                    # a reply for each recipient accepted by RCPT
+                    for rcpt in rcpts:
+                        self._reply(sink.refuseAfterData.get(rcpt, "250 OK delivered"))
+                else:
+                    self._reply("250 OK queued")
+            elif verb == "BDAT":
+                # BDAT <size> [LAST], the chunk follows the command line
+                fields = command.split()
+                chunks.append(self.rfile.read(int(fields[1])))
+                if fields[-1].upper() == "LAST":
+                    sink.messages.append(
+                        {"sender": sender, "rcpts": rcpts, "data": b"".join(chunks)}
+                    )
+                    chunks = []
+                    self._reply("250 OK queued")
+                else:
+                    self._reply("250 OK chunk received")
+            elif verb == "RSET":
+                sender, rcpts, chunks = None, [], []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _SinkServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _SinkServerV6(_SinkServer):
+    address_family = socket.AF_INET6
+
+
+class _SinkServerUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class SMTPSink:
+    """
+    Threaded SMTP or LMTP server listening on localhost, or on a Unix
+    domain socket, that records every command and message it receives
+
+    Parameters
+    -------
+        host - Address to listen on, 127.0.0.1 or ::1
+        extensions - EHLO extensions to advertise
+        refuse - Dict of recipient address to the reply used to refuse it
+        socketPath - Unix domain socket path to listen on in place of host
+        lmtp - Speak LMTP, with LHLO and a reply per recipient after DATA
+        refuseAfterData - LMTP only, dict of recipient address to its reply after DATA
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        extensions: Optional[List[str]] = None,
+        refuse: Optional[Dict[str, str]] = None,
+        socketPath: Optional[str] = None,
+        lmtp: bool = False,
+        refuseAfterData: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.extensions: List[str] = extensions or ["8BITMIME", "PIPELINING"]
+        self.refuse: Dict[str, str] = refuse or {}
+        self.lmtp: bool = lmtp
+        self.refuseAfterData: Dict[str, str] = refuseAfterData or {}
+        self.commands: List[str] = []
+        self.messages: List[Dict[str, Any]] = []
+        self.connections: int = 0
+
+        self._server: Any
+        if socketPath is not None:
+            self._server = _SinkServerUnix(socketPath, _SinkHandler)
+            self.host: str = socketPath
+            self.port: int = 0
+        else:
+            serverClass = _SinkServerV6 if ":" in host else _SinkServer
+            self._server = serverClass((host, 0), _SinkHandler)
+            self.host = host
+            self.port = self._server.server_address[1]
+        self._server.sink = self
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+
+    def __enter__(self) -> "SMTPSink":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def ipv6Available() -> bool:
+    if not socket.has_ipv6:
+        return False
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_STREAM) as sock:
+            sock.bind(("::1", 0))
+        return True
+    except OSError:
+        return False
+
+
+def closedPort() -> int:
+    # bind then close a socket so the port is known to refuse connections
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def sinkServer(port: int, **settings: Any) -> Dict[str, Any]:
+    # server settings for a local sink, as a serverDict or one relay in a list
+    server: Dict[str, Any] = {
+        "smtpServer": "127.0.0.1",
+        "port": port,
+        "SSLTLS": "",
+        "timeout": 5,
+    }
+    server.update(settings)
+    return server
+
+
+def fakeMailItem(to: Optional[List[str]] = None, **fields: Any) -> Dict[str, Any]:
+    # a valid mail item dict, any fields given replace the defaults
+    mailItem: Dict[str, Any] = {
+        "sender": "fake.sender@fakeemail.com",
+        "subject": "Emailee test",
+        "msgText": "Raw text email for testing emailee",
+        "to": ["fake.receiver@fakeemail.com"] if to is None else to,
+    }
+    mailItem.update(fields)
+    return mailItem
+
+
+def fakeMailList(
+    count: int, first: int = 0, receiver: str = "receiver"
+) -> List[Dict[str, Any]]:
+    # mail items each to their own numbered receiver, e.g. receiver0@fakeemail.com
+    return [
+        fakeMailItem([f"{receiver}{i}@fakeemail.com"], subject=f"Emailee test {i}")
+        for i in range(first, first + count)
+    ]
@@ -0,0 +1,211 @@
+from concurrent.futures import Future
+
+import pytest
+
+import emailee
+from tests.smtp_sink import SMTPSink, closedPort, fakeMailList, sinkServer
+
+
+def helper_sender(mailList, port, tmp_path, senderClass=None, **kwargs):
+    return (senderClass or emailee.AsyncThreads)(
+        mailList,
+        sinkServer(port),
+        outputFile=str(tmp_path / "output.txt"),
+        autoRun=False,
+        **kwargs,
+    )
+
+
+def test_campaign_start(tmp_path):
+    with SMTPSink(refuse={"receiver2@fakeemail.com": "550 No such user"}) as sink:
+        sender = helper_sender(fakeMailList(4), sink.port, tmp_path)
+        campaign = sender.start()
+        assert isinstance(campaign, emailee.Campaign)
+        assert campaign.wait(timeout=10)
+    assert campaign.done()
+    assert all(isinstance(future, Future) for future in campaign.futures)
+    assert campaign.futures[3].result()["index"] == 3
+    assert campaign.futures[3].result()["status"] == "sent"
+    with pytest.raises(ValueError):
+        campaign.futures[2].result()
+    assert campaign.progress() == {
+        "submitted": 4,
+        "sent": 3,
+        "failed": 1,
+        "cancelled": 0,
+        "pending": 0,
+    }
+    assert len(sender.emailReport) == 3 and len(sender.failedReport) == 1
+
+
+def test_campaign_submit_keep_open(tmp_path):
+    with SMTPSink() as sink:
+        campaign = helper_sender([], sink.port, tmp_path).start(keepOpen=True)
+        first = campaign.submit(fakeMailList(1, first=0)[0])
+        assert first.result(timeout=10)["index"] == 0
+        # still running with nothing to send
+        assert not campaign.wait(timeout=0.1)
+        more = [
+            campaign.submit(emailee.MailItem(**item))
+            for item in fakeMailList(3, first=1)
+        ]
+        campaign.close()
+        assert campaign.wait(timeout=10)
+    assert sorted(future.result()["index"] for future in more) == [1, 2, 3]
+    assert len(sink.messages) == 4
+    with pytest.raises(RuntimeError):
+        campaign.submit(fakeMailList(1, first=4)[0])
+
+
+def test_campaign_submit_after_finish(tmp_path):
+    with SMTPSink() as sink:
+        campaign = helper_sender(
+            [fakeMailList(1, first=0)[0]], sink.port, tmp_path
+        ).start()
+        campaign.wait(timeout=10)
+    with pytest.raises(RuntimeError):
+        campaign.submit(fakeMailList(1, first=1)[0])
+    assert campaign.progress()["submitted"] == 1
+
+
+def test_campaign_cancel(tmp_path):
+    campaigns = []
+    with SMTPSink() as sink:
+        sender = helper_sender(
+            fakeMailList(6),
+            sink.port,
+            tmp_path,
+            maxThreads=1,
+            onResult=lambda result: campaigns[0].cancel(),
+        )
+        campaigns.append(sender.start())
+        assert campaigns[0].wait(timeout=10)
+    # cancelled as soon as the first item was sent, before the pool started
+    assert len(sink.messages) == 1
+    assert campaigns[0].progress()["cancelled"] == 5
+    assert all(future.cancelled() for future in campaigns[0].futures[1:])
+
+
+def test_campaign_cancel_one_item(tmp_path):
+    campaigns = []
+    with SMTPSink() as sink:
+        sender = helper_sender(
+            fakeMailList(4),
+            sink.port,
+            tmp_path,
+            maxThreads=1,
+            onResult=lambda result: campaigns[0].futures[2].cancel(),
+        )
+        campaigns.append(sender.start())
+        assert campaigns[0].wait(timeout=10)
+    assert sorted(message["rcpts"][0] for message in sink.messages) == [
+        "receiver0@fakeemail.com",
+        "receiver1@fakeemail.com",
+        "receiver3@fakeemail.com",
+    ]
+    assert campaigns[0].futures[2].cancelled()
+
+
+def test_campaign_server_error(tmp_path):
+    campaign = helper_sender(fakeMailList(3), closedPort(), tmp_path).start()
+    with pytest.raises(ValueError):
+        campaign.wait(timeout=10)
+    # the relay is probed before any mail is sent
+    assert all(future.cancelled() for future in campaign.futures)
+
+
+def test_campaign_only_once(tmp_path):
+    with SMTPSink() as sink:
+        sender = helper_sender([fakeMailList(1, first=0)[0]], sink.port, tmp_path)
+        sender.run()
+    with pytest.raises(RuntimeError):
+        sender.start()
+
+
+@pytest.mark.parametrize("bad_item", ["email", None, [fakeMailList(1, first=0)[0]]])
+def test_campaign_submit_invalid_type(bad_item, tmp_path):
+    with SMTPSink() as sink:
+        campaign = helper_sender([], sink.port, tmp_path).start(keepOpen=True)
+        with pytest.raises(TypeError):
+            campaign.submit(bad_item)
+        campaign.close()
+        assert campaign.wait(timeout=10)
+
+
+def test_campaign_keep_open_invalid_type(tmp_path):
+    sender = helper_sender([], 25, tmp_path)
+    with pytest.raises(TypeError):
+        sender.start(keepOpen="yes")
+
+
+def test_campaign_multiprocessing(tmp_path):
+    with SMTPSink() as sink:
+        sender = helper_sender(
+            fakeMailList(2),
+            sink.port,
+            tmp_path,
+            senderClass=emailee.AsyncMP,
+            maxProcesses=2,
+        )
+        campaign = sender.start(keepOpen=True)
+        submitted = campaign.submit(fakeMailList(1, first=2)[0])
+        assert submitted.result(timeout=30)["index"] == 2
+        campaign.close()
+        assert campaign.wait(timeout=30)
+    assert len(sink.messages) == 3
+    assert campaign.progress()["sent"] == 3
+
+
+def test_campaign_direct_mx(tmp_path):
+    with SMTPSink() as sink:
+        sender = emailee.AsyncThreads(
+            fakeMailList(2),
+            {"port": sink.port, "timeout": 5},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=lambda domain: [(10, "127.0.0.1")],
+            autoRun=False,
+        )
+        campaign = sender.start(keepOpen=True)
+        submitted = [
+            campaign.submit(item) for item in fakeMailList(3, receiver="later")
+        ]
+        campaign.close()
+        assert campaign.wait(timeout=10)
+    assert [future.result()["index"] for future in submitted] == [2, 3, 4]
+    assert len(sink.messages) == 5
+    assert all(
+        future.result()["domain"] == "fakeemail.com" for future in campaign.futures
+    )
+
+
+def test_campaign_direct_mx_multiple_domains(tmp_path):
+    # an item is claimed once, and settled once all its domains are done
+    mailList = [
+        {"sender": "fake.sender@fakeemail.com", "to": ["a@good.com", "b@bad.com"]},
+        {"sender": "fake.sender@fakeemail.com", "to": ["c@good.com", "d@other.com"]},
+    ]
+    with SMTPSink(refuse={"b@bad.com": "550 No such user"}) as sink:
+        sender = emailee.AsyncThreads(
+            mailList,
+            {"port": sink.port, "timeout": 5},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=lambda domain: [(10, "127.0.0.1")],
+            autoRun=False,
+        )
+        campaign = sender.start()
+        assert campaign.wait(timeout=10)
+    with pytest.raises(ValueError, match="No such user"):
+        campaign.futures[0].result()
+    assert campaign.futures[1].result()["status"] == "sent"
+    assert campaign.progress() == {
+        "submitted": 2,
+        "sent": 1,
+        "failed": 1,
+        "cancelled": 0,
+        "pending": 0,
+    }
+    # each domain is still reported
+    assert len(sender.emailReport) == 3 and len(sender.failedReport) == 1
+    assert sender.unsentReport == []
@@ -0,0 +1,223 @@
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+
+import emailee
+from emailee.emailee_async import _SOURCE_AHEAD
+from emailee.emailee_cli import main
+from tests.smtp_sink import SMTPSink, fakeMailItem, fakeMailList
+
+
+@pytest.fixture()
+def sink():
+    with SMTPSink() as sink:
+        yield sink
+
+
+def helper_server(tmp_path, sink, relays=False):
+    path = tmp_path / "server.toml"
+    if relays:
+        table = "[[relays]]\nname = 'one'\n"
+    else:
+        table = "[server]\n"
+    path.write_text(f"{table}smtpServer = '{sink.host}'\nport = {sink.port}\n")
+    return str(path)
+
+
+def helper_jsonl(tmp_path, mailList, extra=""):
+    path = tmp_path / "mail.jsonl"
+    path.write_text("".join(json.dumps(item) + "\n" for item in mailList) + extra)
+    return str(path)
+
+
+def helper_log(path):
+    return [json.loads(line) for line in open(path)]
+
+
+# --- command line tests --- #
+
+
+@pytest.mark.parametrize("relays", [False, True])
+def test_cli_jsonl(relays, sink, tmp_path):
+    mailList = fakeMailList(30)
+    server = helper_server(tmp_path, sink, relays)
+    log = str(tmp_path / "log.jsonl")
+    args = [helper_jsonl(tmp_path, mailList), "--server", server, "--log", log]
+    assert main(args + ["--concurrency", "4", "--rate", "1000"]) == 0
+    assert len(sink.messages) == 30
+    entries = helper_log(log)
+    assert sorted(entry["line"] for entry in entries) == list(range(1, 31))
+    assert all(entry["status"] == "sent" for entry in entries)
+    [entry] = [entry for entry in entries if entry["line"] == 7]
+    assert entry["to"] == mailList[6]["to"]
+
+
+def test_cli_csv(sink, tmp_path):
+    path = tmp_path / "mail.csv"
+    path.write_text(
+        "sender,subject,msgText,to,bcc,ignoreErrors,region\n"
+        "fake.sender@fakeemail.com,First,Hello,one@fakeemail.com;two@fakeemail.com,,yes,eu\n"
+        'fake.sender@fakeemail.com,"Second, with a comma","Line one\n'
+        'line two",three@fakeemail.com,hidden@fakeemail.com,,us\n'
+    )
+    log = str(tmp_path / "log.jsonl")
+    server = helper_server(tmp_path, sink)
+    assert main([str(path), "--server", server, "--log", log, "--quiet"]) == 0
+    rcpts = sorted(message["rcpts"] for message in sink.messages)
+    assert rcpts == [
+        ["one@fakeemail.com", "two@fakeemail.com"],
+        ["three@fakeemail.com", "hidden@fakeemail.com"],
+    ]
+    # lines are where each row ends, the second spans two
+    assert sorted(entry["line"] for entry in helper_log(log)) == [2, 4]
+
+
+def test_cli_stdin_and_invalid_lines(sink, tmp_path, monkeypatch, capsys):
+    data = json.dumps(fakeMailItem()) + "\n\nnot json\n[1, 2]\n"
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(data.encode())))
+    log = str(tmp_path / "log.jsonl")
+    server = helper_server(tmp_path, sink)
+    assert main(["--server", server, "--log", log]) == 1
+    entries = sorted(helper_log(log), key=lambda entry: entry["line"])
+    assert [(e["line"], e["outcome"]) for e in entries] == [
+        (1, "sent"),
+        (3, "invalid"),
+        (4, "invalid"),
+    ]
+    # no total from stdin, so no ETA
+    progress = capsys.readouterr().err
+    assert "3 done, 1 sent, 2 failed" in progress and "ETA" not in progress
+
+
+def test_cli_resume(sink, tmp_path):
+    mailList = fakeMailList(10)
+    log = tmp_path / "log.jsonl"
+    # lines 1-3 sent, 4 failed transiently and 5 permanently, and a line cut short
+    settled = [{"line": n, "status": "sent", "outcome": "sent"} for n in (1, 2, 3)]
+    settled.append({"line": 4, "status": "failed", "outcome": "transient"})
+    settled.append({"line": 5, "status": "failed", "outcome": "permanent"})
+    log.write_text("".join(json.dumps(e) + "\n" for e in settled) + '{"line": 6, "st')
+    args = [helper_jsonl(tmp_path, mailList), "--server", helper_server(tmp_path, sink)]
+    assert main(args + ["--log", str(log)]) == 2
+    assert main(args + ["--log", str(log), "--resume", "--quiet"]) == 0
+    sent = sorted(int(m["rcpts"][0][8:].split("@")[0]) for m in sink.messages)
+    assert sent == [3, 5, 6, 7, 8, 9]
+    lines = log.read_text().splitlines()
+    assert lines[5] == '{"line": 6, "st' and len(lines) == 12
+
+
+def test_cli_dry_run(tmp_path, capsys):
+    log = str(tmp_path / "log.jsonl")
+    path = helper_jsonl(tmp_path, fakeMailList(5))
+    assert main([path, "--dry-run", "--log", log, "--quiet"]) == 0
+    assert json.loads(capsys.readouterr().out)["messages"] == 5
+    # a dry run's log can't be resumed from
+    assert all(entry["dryRun"] for entry in helper_log(log))
+    from emailee.emailee_cli import _settledLines
+
+    assert not any(_settledLines(log))
+
+
+def test_cli_processes_subprocess(sink, tmp_path):
+    path = helper_jsonl(tmp_path, fakeMailList(8))
+    result = subprocess.run(
+        [sys.executable, "-m", "emailee", path, "--workers", "processes"]
+        + ["--concurrency", "2", "--server", helper_server(tmp_path, sink)],
+        stderr=subprocess.PIPE,
+    )
+    assert result.returncode == 0, result.stderr
+    assert len(sink.messages) == 8
+    assert b"8/8 done, 8 sent, 0 failed" in result.stderr
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["mail.jsonl"],
+        ["mail.jsonl", "--dry-run", "--resume"],
+        ["mail.jsonl", "--dry-run", "--concurrency", "0"],
+        ["mail.jsonl", "--dry-run", "--rate", "-1"],
+        ["mail.jsonl", "--format", "xml"],
+    ],
+)
+def test_cli_invalid_args(args):
+    with pytest.raises(SystemExit) as error:
+        main(args)
+    assert error.value.code == 2
+
+
+def test_cli_invalid_settings(tmp_path):
+    server = tmp_path / "server.toml"
+    server.write_text("smtpServer = 'localhost'\n")
+    path = helper_jsonl(tmp_path, [fakeMailItem()])
+    assert main([path, "--server", str(server)]) == 2
+    assert main([str(tmp_path / "missing.jsonl"), "--dry-run"]) == 2
+
+
+# --- streaming mail list tests --- #
+
+
+def test_async_iterator_mail_list_reads_lazily(tmp_path):
+    read = []
+    sent = []
+
+    def mailItems():
+        for n in range(3000):
+            # never more than the read ahead waiting, and the workers' items
+            assert len(read) - len(sent) <= _SOURCE_AHEAD + 4
+            read.append(n)
+            yield fakeMailItem([f"receiver{n}@fakeemail.com"])
+        yield "not a mail item"
+
+    emails = emailee.AsyncThreads(
+        mailItems(),
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        maxThreads=4,
+        transport=emailee.NullTransport(),
+        onResult=sent.append,
+        keepReports=False,
+    )
+    assert len(sent) == 3001 and emails.emailReport == [] == emails.failedReport
+    assert sorted(result["index"] for result in sent) == list(range(3001))
+    [invalid] = [result for result in sent if result["status"] == "failed"]
+    assert invalid["index"] == 3000 and invalid["outcome"] == "invalid"
+
+
+def test_async_iterator_remainder(tmp_path):
+    remainder = str(tmp_path / "remainder.jsonl")
+    emails = emailee.AsyncThreads(
+        iter(fakeMailList(3000)),
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        transport=emailee.NullTransport(),
+        remainderFile=remainder,
+        autoRun=False,
+    )
+    results = emails.iterResults()
+    for _ in range(10):
+        next(results)
+    emails.shutdown()
+    for _ in results:
+        pass
+    # everything unsent, read or not, is in the remainder
+    sent = {report["to"][0] for report in emails.emailReport}
+    unsent = {item["to"][0] for item in emailee.readRemainder(remainder)}
+    assert len(sent) + len(unsent) == 3000 and not sent & unsent
+    assert len(emails.unsentReport) <= _SOURCE_AHEAD
+
+
+def test_async_iterator_mail_list_invalid(tmp_path):
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            iter([]), {}, outputFile=str(tmp_path / "o.txt"), preflight=True
+        )
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            iter([]), {}, outputFile=str(tmp_path / "o.txt"), deliveryMode="mx"
+        )
+    with pytest.raises(TypeError):
+        emailee.AsyncThreads((fakeMailItem(),), {}, outputFile=str(tmp_path / "o.txt"))
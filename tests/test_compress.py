@@ -0,0 +1,173 @@
+import email
+import gzip
+import io
+import os
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import emailee
+from emailee.emailee_compress import (
+    _CompressionCache,
+    _compressionCache,
+    _shouldCompress,
+)
+from tests.smtp_sink import SMTPSink, fakeMailItem, sinkServer
+
+KITTEN = str(Path(__file__).parent / "test_attachments" / "kitten_pic.jpg")
+CSV_ROWS = "".join(f"{i},receiver{i}@fakeemail.com,subscribed\n" for i in range(5000))
+
+
+@pytest.fixture()
+def csv_file(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text(CSV_ROWS)
+    _compressionCache.clear()
+    yield str(path)
+    _compressionCache.clear()
+
+
+def helper_send(sink, attachments, compressFormat="gzip", minSize=1024):
+    mail = emailee.Emailee()
+    mail.sender("fake.sender@fakeemail.com")
+    mail.sendTo(["fake.receiver@fakeemail.com"])
+    mail.attachmentFiles(attachments)
+    mail.compressAttachments(minSize, compressFormat)
+    mail.server(sink.host, port=sink.port, timeout=5)
+    assert mail.send()
+    return mail
+
+
+def helper_attachments(data):
+    message = email.message_from_bytes(data)
+    return [part for part in message.walk() if part.get_filename()]
+
+
+# --- compression tests --- #
+
+
+@pytest.mark.parametrize(
+    "path, size, expected",
+    [
+        ("export.csv", 10, True),
+        ("data.json", 10, True),
+        ("photo.jpg", 10**9, False),
+        ("archive.zip", 10**9, False),
+        ("backup.tar.gz", 10**9, False),
+        ("report.docx", 10**9, False),
+        ("blob.bin", 10, False),
+        ("blob.bin", 2048, True),
+    ],
+)
+def test_should_compress(path, size, expected):
+    assert _shouldCompress(path, size, 1024) is expected
+
+
+def test_cache_reuses_compression(csv_file):
+    cache = _CompressionCache()
+    first, report = cache.compress(csv_file, "gzip")
+    second, cachedReport = cache.compress(csv_file, "gzip")
+    assert gzip.decompress(first).decode() == CSV_ROWS
+    assert first is second
+    assert report["cached"] is False and cachedReport["cached"] is True
+    assert report["ratio"] == cachedReport["ratio"] < 0.5
+    assert report["size"] == len(CSV_ROWS)
+
+    # a changed file is a different file
+    Path(csv_file).write_text(CSV_ROWS * 2)
+    third, report = cache.compress(csv_file, "gzip")
+    assert report["cached"] is False
+    assert gzip.decompress(third).decode() == CSV_ROWS * 2
+
+
+def test_cache_size_limit(csv_file, tmp_path):
+    other = tmp_path / "other.csv"
+    other.write_text(CSV_ROWS[::-1])
+    compressed, _ = _CompressionCache().compress(csv_file, "gzip")
+    cache = _CompressionCache(maxBytes=len(compressed) + 10)
+    cache.compress(csv_file, "gzip")
+    cache.compress(str(other), "gzip")
+    assert cache.compress(str(other), "gzip")[1]["cached"] is True
+    assert cache.compress(csv_file, "gzip")[1]["cached"] is False
+
+
+@pytest.mark.parametrize(
+    "bad_args, error",
+    [(("1",), TypeError), ((-1,), ValueError), ((0, "bz2"), ValueError)],
+)
+def test_compress_attachments_invalid(bad_args, error):
+    with pytest.raises(error):
+        emailee.Emailee().compressAttachments(*bad_args)
+
+
+# --- send tests --- #
+
+
+@pytest.mark.parametrize("compressFormat", ["gzip", "zip"])
+def test_send_compressed_attachment(compressFormat, csv_file):
+    with SMTPSink() as sink:
+        mail = helper_send(sink, [csv_file, KITTEN], compressFormat)
+    csvPart, kittenPart = helper_attachments(sink.messages[0]["data"])
+    content = csvPart.get_payload(decode=True)
+    if compressFormat == "gzip":
+        assert csvPart.get_content_type() == "application/gzip"
+        assert csvPart.get_filename() == "export.csv.gz"
+        assert gzip.decompress(content).decode() == CSV_ROWS
+    else:
+        assert csvPart.get_content_type() == "application/zip"
+        assert csvPart.get_filename() == "export.zip"
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            assert archive.read("export.csv").decode() == CSV_ROWS
+    # already compressed images are sent as they are
+    assert kittenPart.get_content_type() == "image/jpeg"
+    assert len(kittenPart.get_payload(decode=True)) == os.stat(KITTEN).st_size
+    [report] = mail._compressionReport
+    assert report["file"] == csv_file and report["ratio"] < 0.5
+
+
+def test_async_compression_reported(csv_file, tmp_path):
+    mailList = [fakeMailItem(attachmentFiles=[csv_file]) for _ in range(3)]
+    with SMTPSink() as sink:
+        emails = emailee.AsyncThreads(
+            mailList,
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            maxThreads=1,
+            compressAttachments=0,
+        )
+    assert len(sink.messages) == 3
+    reports = [report["compressed"][0] for report in emails.emailReport]
+    assert sorted(report["cached"] for report in reports) == [False, True, True]
+
+
+def test_async_mp_compression(csv_file, tmp_path):
+    mailList = [fakeMailItem(attachmentFiles=[csv_file]) for _ in range(2)]
+    with SMTPSink() as sink:
+        emails = emailee.AsyncMP(
+            mailList,
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            compressAttachments=0,
+            compressFormat="zip",
+        )
+    for message in sink.messages:
+        [part] = helper_attachments(message["data"])
+        assert part.get_filename() == "export.zip"
+    assert all(report["compressed"] for report in emails.emailReport)
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs, error",
+    [
+        ({"compressAttachments": "1"}, TypeError),
+        ({"compressAttachments": -1}, ValueError),
+        ({"compressFormat": 1}, TypeError),
+        ({"compressFormat": "rar"}, ValueError),
+    ],
+)
+def test_async_compression_invalid(bad_kwargs, error, tmp_path):
+    with pytest.raises(error):
+        emailee.AsyncThreads(
+            [fakeMailItem()], {}, outputFile=str(tmp_path / "output.txt"), **bad_kwargs
+        )
@@ -0,0 +1,269 @@
+import io
+import re
+import socket
+import time
+from pathlib import Path
+
+import pytest
+
+import emailee
+import emailee.emailee_connect as emailee_connect
+from tests.smtp_sink import SMTPSink, closedPort, ipv6Available
+
+
+def helper_addrinfo(host: str, port: int):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    address = (host, port, 0, 0) if ":" in host else (host, port)
+    return (family, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", address)
+
+
+@pytest.fixture()
+def listener():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(5)
+        yield sock.getsockname()[1]
+
+
+# --- resolver cache tests --- #
+
+
+def test_resolver_cache_reuses_lookup(monkeypatch):
+    calls = []
+    realGetaddrinfo = socket.getaddrinfo
+
+    def counting_getaddrinfo(*args, **kwargs):
+        calls.append(args)
+        return realGetaddrinfo(*args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", counting_getaddrinfo)
+    cache = emailee_connect._ResolverCache(ttl=60)
+    first = cache.resolve("localhost", 25)
+    second = cache.resolve("localhost", 25)
+    assert first == second
+    assert len(calls) == 1
+
+
+def test_resolver_cache_expires(monkeypatch):
+    calls = []
+    realGetaddrinfo = socket.getaddrinfo
+
+    def counting_getaddrinfo(*args, **kwargs):
+        calls.append(args)
+        return realGetaddrinfo(*args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", counting_getaddrinfo)
+    cache = emailee_connect._ResolverCache(ttl=0)
+    cache.resolve("localhost", 25)
+    cache.resolve("localhost", 25)
+    assert len(calls) == 2
+
+
+def test_resolver_cache_does_not_cache_failures(monkeypatch):
+    def failing_getaddrinfo(*args, **kwargs):
+        raise socket.gaierror("lookup failed")
+
+    monkeypatch.setattr(socket, "getaddrinfo", failing_getaddrinfo)
+    cache = emailee_connect._ResolverCache(ttl=60)
+    with pytest.raises(socket.gaierror):
+        cache.resolve("asdasd.fakeemail.com", 25)
+    assert not cache._cache and not cache._pending
+
+
+# --- happy eyeballs tests --- #
+
+
+def test_interleave_families():
+    v4a = helper_addrinfo("127.0.0.1", 1)
+    v4b = helper_addrinfo("127.0.0.2", 1)
+    v6a = helper_addrinfo("::1", 1)
+    v6b = helper_addrinfo("::2", 1)
+    assert emailee_connect._interleaveFamilies([v6a, v6b, v4a, v4b]) == [
+        v6a,
+        v4a,
+        v6b,
+        v4b,
+    ]
+
+
+def test_happy_eyeballs_skips_refused_address(listener):
+    addrInfos = [
+        helper_addrinfo("127.0.0.1", closedPort()),
+        helper_addrinfo("127.0.0.1", listener),
+    ]
+    sock = emailee_connect._happyEyeballs(addrInfos, timeout=5)
+    assert sock.getpeername()[1] == listener
+    assert sock.gettimeout() == 5
+    sock.close()
+
+
+def test_happy_eyeballs_dead_address_does_not_cost_timeout(listener):
+    # 192.0.2.0/24 is reserved for documentation so never answers
+    addrInfos = [
+        helper_addrinfo("192.0.2.1", 25),
+        helper_addrinfo("127.0.0.1", listener),
+    ]
+    started = time.monotonic()
+    sock = emailee_connect._happyEyeballs(addrInfos, timeout=10)
+    assert time.monotonic() - started < 2
+    assert sock.getpeername()[1] == listener
+    sock.close()
+
+
+def test_happy_eyeballs_all_refused():
+    addrInfos = [
+        helper_addrinfo("127.0.0.1", closedPort()),
+        helper_addrinfo("127.0.0.1", closedPort()),
+    ]
+    with pytest.raises(OSError):
+        emailee_connect._happyEyeballs(addrInfos, timeout=5)
+
+
+def test_happy_eyeballs_empty():
+    with pytest.raises(OSError):
+        emailee_connect._happyEyeballs([], timeout=5)
+
+
+@pytest.mark.skipif(not ipv6Available(), reason="IPv6 loopback not available")
+def test_happy_eyeballs_falls_back_to_ipv4(listener):
+    addrInfos = [
+        helper_addrinfo("::1", closedPort()),
+        helper_addrinfo("127.0.0.1", listener),
+    ]
+    sock = emailee_connect._happyEyeballs(addrInfos, timeout=5)
+    assert sock.family == socket.AF_INET
+    sock.close()
+
+
+# --- Emailee send through the connector --- #
+
+
+def test_send_email_local_sink():
+    with SMTPSink() as sink:
+        email = emailee.Emailee()
+        email.sender("fake.sender@fakeemail.com")
+        email.subject("Test email")
+        email.msgContent("Raw text email for testing emailee")
+        email.sendTo(["fake.receiver@fakeemail.com"])
+        email.server(smtpServer=sink.host, port=sink.port, timeout=5)
+        assert email.send()
+    assert sink.messages[0]["rcpts"] == ["fake.receiver@fakeemail.com"]
+
+
+def test_send_email_local_sink_resolves_once(monkeypatch):
+    calls = []
+    realGetaddrinfo = socket.getaddrinfo
+
+    def counting_getaddrinfo(*args, **kwargs):
+        calls.append(args)
+        return realGetaddrinfo(*args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", counting_getaddrinfo)
+    monkeypatch.setattr(
+        emailee_connect, "_resolverCache", emailee_connect._ResolverCache()
+    )
+    with SMTPSink() as sink:
+        for _ in range(3):
+            email = emailee.Emailee()
+            email.sender("fake.sender@fakeemail.com")
+            email.sendTo(["fake.receiver@fakeemail.com"])
+            email.server(smtpServer="localhost", port=sink.port, timeout=5)
+            email.send()
+    assert len(sink.messages) == 3
+    assert len([call for call in calls if call[0] == "localhost"]) == 1
+
+
+# --- BDAT/CHUNKING tests --- #
+
+ATTACHMENT = str(Path(__file__).parent / "test_attachments" / "kitten_pic.jpg")
+
+
+def helper_chunking_send(sink, msgText, chunkSize=4096, **server):
+    email = emailee.Emailee()
+    email.sender("fake.sender@fakeemail.com")
+    email.msgContent(msgText)
+    email.sendTo(["fake.receiver@fakeemail.com"])
+    email.attachmentFiles([ATTACHMENT])
+    email.server(smtpServer=sink.host, port=sink.port, timeout=5, chunkSize=chunkSize)
+    assert email.send()
+    return email
+
+
+def helper_comparable(data):
+    # the message without the parts that change on every send
+    data = re.sub(rb"=+\d+==", b"boundary", data)
+    return [line for line in data.split(b"\r\n") if not line.startswith(b"date:")]
+
+
+def test_bdat_sends_chunks():
+    msgText = "first line\n.starts with a dot\nlast line"
+    with SMTPSink(extensions=["CHUNKING"]) as chunkSink:
+        helper_chunking_send(chunkSink, msgText)
+    with SMTPSink() as dataSink:
+        helper_chunking_send(dataSink, msgText)
+
+    bdat = [c for c in chunkSink.commands if c.startswith("BDAT")]
+    assert len(bdat) > 1 and "data" not in chunkSink.commands
+    assert all(c == "BDAT 4096" for c in bdat[:-1]) and bdat[-1].endswith(" LAST")
+    # sent without dot stuffing, and the same message DATA delivers
+    data = chunkSink.messages[0]["data"]
+    assert b"\r\n.starts with a dot\r\n" in data
+    assert helper_comparable(data) == helper_comparable(dataSink.messages[0]["data"])
+
+
+def test_wire_generated_a_part_at_a_time():
+    from email.generator import BytesGenerator
+    from email.mime.application import MIMEApplication
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    message = MIMEMultipart("mixed")
+    message.attach(MIMEText("From the start\nlast line"))
+    for _ in range(3):
+        message.attach(MIMEApplication(b"\0" * 100000))
+    writes = []
+
+    class Target:
+        def write(self, data):
+            writes.append(data)
+
+    emailee_connect._writeWire(message, Target())
+    # no write holds more than one attachment, and the bytes are the same as
+    #  BytesGenerator's once the boundary is chosen
+    assert max(len(data) for data in writes) < 150000
+    output = io.BytesIO()
+    BytesGenerator(
+        output, mangle_from_=False, maxheaderlen=0, policy=emailee_connect._WIRE_POLICY
+    ).flatten(message)
+    assert b"".join(writes) == output.getvalue()
+
+
+def test_bdat_disabled_by_chunk_size_zero():
+    with SMTPSink(extensions=["CHUNKING"]) as sink:
+        helper_chunking_send(sink, "Raw text", chunkSize=0)
+    verbs = [command.split(" ", 1)[0].upper() for command in sink.commands]
+    assert "DATA" in verbs and "BDAT" not in verbs
+
+
+def test_bdat_refused_recipients():
+    refuse = {"refused@fakeemail.com": "550 No such user"}
+    with SMTPSink(extensions=["CHUNKING"], refuse=refuse) as sink:
+        email = emailee.Emailee()
+        email.sender("fake.sender@fakeemail.com")
+        email.sendTo(["fake.receiver@fakeemail.com", "refused@fakeemail.com"])
+        email.server(smtpServer=sink.host, port=sink.port, timeout=5)
+        assert email.send()
+        assert email._refused == {"refused@fakeemail.com": (550, b"No such user")}
+
+        email.sendTo(["refused@fakeemail.com"])
+        with pytest.raises(ValueError, match="No such user"):
+            email.send()
+    assert len(sink.messages) == 1
+    assert sink.commands[-1].upper() == "RSET"
+
+
+@pytest.mark.parametrize("chunkSize, error", [("1", TypeError), (-1, ValueError)])
+def test_chunk_size_invalid(chunkSize, error):
+    email = emailee.Emailee()
+    with pytest.raises(error):
+        email.server("smtp.fakeemail.com", chunkSize=chunkSize)
@@ -0,0 +1,99 @@
+import pytest
+
+import emailee
+from tests.smtp_sink import SMTPSink, fakeMailItem, fakeMailList, sinkServer
+
+HTML = "<p>Grüße aus Köln, wir freuen uns auf Ihren Besuch.</p>\n" * 20
+
+
+def helper_mail():
+    mail = emailee.Emailee()
+    mail.sender("fake.sender@fakeemail.com")
+    mail.subject("Dry run test")
+    mail.msgContent(msgHTML=HTML)
+    mail.sendTo(["fake.receiver@fakeemail.com"], bcc=["fake.bcc@fakeemail.com"])
+    return mail
+
+
+def test_emailee_dry_run(tmp_path):
+    output = tmp_path / "output.txt"
+    mail = helper_mail()
+    # no server is needed, and nothing is delivered or written to outputFile
+    assert mail.send(str(output), dryRun=True)
+    assert not output.exists() or output.read_text() == ""
+    report = mail.dryRunReport
+    assert set(report) == {"bytes", "cpuTime", "peakRSS", "elapsed"}
+    assert report["cpuTime"] >= 0 and report["elapsed"] >= 0
+    assert report["peakRSS"] is None or report["peakRSS"] > 1024 * 1024
+
+    memory = emailee.MemoryTransport()
+    mail.transport(memory)
+    mail.send()
+    # dates can differ in length by a character across days
+    assert abs(report["bytes"] - len(memory.messages[0]["data"])) < 5
+
+
+def test_emailee_dry_run_invalid():
+    mail = emailee.Emailee()
+    mail.sender("fake.sender@fakeemail.com")
+    with pytest.raises(ValueError):
+        mail.send(dryRun=True)
+    with pytest.raises(TypeError):
+        helper_mail().send(dryRun="yes")
+
+
+@pytest.mark.parametrize("asyncClass", [emailee.AsyncThreads, emailee.AsyncMP])
+def test_async_dry_run(asyncClass, tmp_path):
+    output = tmp_path / "output.txt"
+    mailList = fakeMailList(10) + [fakeMailItem(attachmentFiles=["missing.txt"])]
+    with SMTPSink() as sink:
+        emails = asyncClass(
+            mailList, sinkServer(sink.port), outputFile=str(output), dryRun=True
+        )
+    # relays aren't probed and nothing is sent
+    assert sink.connections == 0
+    assert output.read_text() == ""
+    assert len(emails.emailReport) == 10
+    assert all(report["bytes"] > 0 for report in emails.emailReport)
+    [failed] = emails.failedReport
+    assert failed["outcome"] == "invalid"
+
+    report = emails.dryRunReport
+    assert report["messages"] == 10
+    assert report["bytes"] == sum(r["bytes"] for r in emails.emailReport)
+    assert report["bytesPerMessage"] == round(report["bytes"] / 10)
+    assert report["cpuPerMessage"] > 0
+    assert report["projectedTime"] == report["elapsed"]
+
+
+def test_async_dry_run_projects_rate_limits(tmp_path):
+    mailList = [fakeMailItem([f"user{n}@slow.com"]) for n in range(11)]
+    mailList += [fakeMailItem([f"user{n}@fast.com"]) for n in range(4)]
+    emails = emailee.AsyncThreads(
+        mailList,
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        waitTime=0.1,
+        domainRate={"slow.com": 2},
+        dryRun=True,
+    )
+    report = emails.dryRunReport
+    # rate limits are projected rather than waited on
+    assert report["elapsed"] < 1.5
+    # 5 seconds for slow.com's 10 sends after its first, over 1.5 of waitTime
+    assert report["projectedTime"] == 5.0
+
+
+def test_async_dry_run_invalid(tmp_path):
+    with pytest.raises(TypeError):
+        emailee.AsyncThreads(
+            [fakeMailItem()], {}, outputFile=str(tmp_path / "o.txt"), dryRun=1
+        )
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            [fakeMailItem()],
+            {},
+            outputFile=str(tmp_path / "o.txt"),
+            deliveryMode="mx",
+            dryRun=True,
+        )
@@ -0,0 +1,119 @@
+import email
+import quopri
+
+import pytest
+
+import emailee
+from emailee.emailee_encoding import _cheapestEncoding, _textPart, _wireSavings
+from tests.smtp_sink import SMTPSink, fakeMailItem, sinkServer
+
+LATIN_HTML = (
+    "<p>Grüße aus Köln, wir freuen uns auf Ihren Besuch im neuen Laden.</p>\n" * 200
+)
+CJK_TEXT = "東京の天気は晴れです。\n" * 200
+
+
+def helper_send(sink, msgText="", msgHTML="", **server):
+    mail = emailee.Emailee()
+    mail.sender("fake.sender@fakeemail.com")
+    mail.msgContent(msgText=msgText, msgHTML=msgHTML)
+    mail.sendTo(["fake.receiver@fakeemail.com"])
+    mail.server(sink.host, port=sink.port, timeout=5, **server)
+    assert mail.send()
+    return mail
+
+
+def helper_text_parts(data):
+    message = email.message_from_bytes(data)
+    return [part for part in message.walk() if part.get_content_maintype() == "text"]
+
+
+# --- encoding choice tests --- #
+
+
+@pytest.mark.parametrize(
+    "text, eightBit, encoding",
+    [
+        ("Plain ASCII text\n", False, "7bit"),
+        (LATIN_HTML, True, "8bit"),
+        (LATIN_HTML, False, "quoted-printable"),
+        (CJK_TEXT, False, "base64"),
+        ("x" * 2000, True, "quoted-printable"),
+        ("nul\0byte", True, "quoted-printable"),
+    ],
+)
+def test_cheapest_encoding(text, eightBit, encoding):
+    assert _cheapestEncoding(text.encode("utf-8"), eightBit)[0] == encoding
+
+
+@pytest.mark.parametrize("text", [LATIN_HTML, CJK_TEXT])
+def test_cheapest_encoding_size_estimate(text):
+    encoding, size = _cheapestEncoding(text.encode("utf-8"), False)
+    part = _textPart(text, "html", eightBit=False)
+    assert part["Content-Transfer-Encoding"] == encoding
+    assert abs(size - len(part.get_payload())) <= len(part.get_payload()) * 0.02
+
+
+def test_text_part_round_trip():
+    for eightBit in (True, False):
+        part = _textPart(LATIN_HTML, "html", eightBit=eightBit)
+        assert part.get_payload(decode=True).decode("utf-8") == LATIN_HTML
+    assert _textPart("ASCII", "plain")["Content-Transfer-Encoding"] == "7bit"
+
+
+def test_wire_savings():
+    assert _wireSavings(_textPart("ASCII only", "plain")) == 0
+    # 8bit saves about a third on text MIMEText would base64 encode
+    saved = _wireSavings(_textPart(LATIN_HTML, "html"))
+    assert saved > len(LATIN_HTML.encode("utf-8")) * 0.3
+
+
+# --- send tests --- #
+
+
+def test_send_8bit_to_8bitmime_server():
+    with SMTPSink(extensions=["8BITMIME"]) as sink:
+        mail = helper_send(sink, msgHTML=LATIN_HTML)
+    assert "BODY=8BITMIME" in sink.commands[1]
+    [part] = helper_text_parts(sink.messages[0]["data"])
+    assert part["Content-Transfer-Encoding"] == "8bit"
+    assert LATIN_HTML.replace("\n", "\r\n").encode("utf-8") in sink.messages[0]["data"]
+    assert mail._wireSaved > 0
+
+
+def test_send_8bit_downgraded_without_8bitmime():
+    with SMTPSink(extensions=["PIPELINING"]) as sink:
+        mail = helper_send(sink, msgText=CJK_TEXT, msgHTML=LATIN_HTML)
+    assert "BODY=" not in sink.commands[1]
+    data = sink.messages[0]["data"]
+    assert max(data) < 128
+    plain, html = helper_text_parts(data)
+    assert plain["Content-Transfer-Encoding"] == "base64"
+    assert html["Content-Transfer-Encoding"] == "quoted-printable"
+    assert (
+        quopri.decodestring(html.get_payload()).decode("utf-8").replace("\r\n", "\n")
+        == LATIN_HTML
+    )
+    assert mail._wireSaved > 0
+
+
+def test_send_8bit_with_chunking():
+    with SMTPSink(extensions=["8BITMIME", "CHUNKING"]) as sink:
+        helper_send(sink, msgHTML=LATIN_HTML, chunkSize=1024)
+    assert "BODY=8BITMIME" in sink.commands[1]
+    assert [c for c in sink.commands if c.startswith("BDAT")][-1].endswith("LAST")
+    [part] = helper_text_parts(sink.messages[0]["data"])
+    assert (
+        part.get_payload(decode=True).decode("utf-8").replace("\r\n", "\n")
+        == LATIN_HTML
+    )
+
+
+def test_async_reports_bytes_saved(tmp_path):
+    mailList = [fakeMailItem(msgText="ASCII"), fakeMailItem(msgHTML=LATIN_HTML)]
+    with SMTPSink(extensions=["8BITMIME"]) as sink:
+        emails = emailee.AsyncThreads(
+            mailList, sinkServer(sink.port), outputFile=str(tmp_path / "output.txt")
+        )
+    saved = sorted(report["bytesSaved"] for report in emails.emailReport)
+    assert saved[0] == 0 and saved[1] > 0
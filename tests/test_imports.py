@@ -0,0 +1,60 @@
+import subprocess
+import sys
+
+import pytest
+
+# stdlib modules that importing emailee shouldn't load until they're used
+HEAVY_MODULES = [
+    "smtplib",
+    "ssl",
+    "socket",
+    "email.mime.multipart",
+    "email.utils",
+    "mimetypes",
+    "multiprocessing",
+    "threading",
+    "queue",
+]
+
+
+def helper_loaded_modules(code):
+    # run in a fresh interpreter, the test session has already imported everything
+    script = (
+        f"import sys\n{code}\n"
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], stdout=subprocess.PIPE, check=True
+    )
+    return result.stdout.decode().split()
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="lazy loading needs PEP 562")
+def test_import_is_lazy():
+    assert helper_loaded_modules("import emailee") == []
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="lazy loading needs PEP 562")
+def test_generate_doesnt_load_smtp():
+    loaded = helper_loaded_modules(
+        "import emailee\n"
+        "mail = emailee.Emailee()\n"
+        "mail.sender('fake.sender@fakeemail.com')\n"
+        "mail.msgContent('Raw text email for testing emailee')\n"
+        "mail._generate()"
+    )
+    assert "email.mime.multipart" in loaded
+    assert "smtplib" not in loaded and "multiprocessing" not in loaded
+
+
+def test_async_classes_load_on_use():
+    loaded = helper_loaded_modules("import emailee\nemailee.AsyncThreads")
+    assert "multiprocessing" in loaded and "threading" in loaded
+
+
+def test_unknown_attribute():
+    import emailee
+
+    with pytest.raises(AttributeError):
+        emailee.AsyncSomething
+    assert {"Emailee", "AsyncThreads", "AsyncMP"} <= set(dir(emailee))
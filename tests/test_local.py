@@ -0,0 +1,171 @@
+import email
+import smtplib
+
+import pytest
+
+import emailee
+from emailee.emailee_outcome import _rootCause
+from emailee.emailee_transport import _SessionTransport
+from tests.smtp_sink import SMTPSink, fakeMailItem, fakeMailList
+
+RECEIVERS = ["one@fakeemail.com", "two@fakeemail.com", "three@fakeemail.com"]
+
+
+@pytest.fixture()
+def socket_path(tmp_path):
+    # Unix socket paths are limited to about 100 characters
+    return str(tmp_path / "s")
+
+
+def helper_mail(transport, to=RECEIVERS, **content):
+    mail = emailee.Emailee()
+    mail.sender("fake.sender@fakeemail.com")
+    mail.subject("Local delivery test")
+    mail.msgContent(**(content or {"msgText": "Raw text email for testing"}))
+    mail.sendTo(to)
+    mail.transport(transport)
+    return mail
+
+
+def helper_verbs(sink):
+    return [command.split()[0].upper() for command in sink.commands]
+
+
+# --- LMTP tests --- #
+
+
+def test_lmtp_unix_socket_per_recipient_replies(socket_path):
+    with SMTPSink(
+        socketPath=socket_path,
+        lmtp=True,
+        refuse={"three@fakeemail.com": "550 No such user"},
+        refuseAfterData={"two@fakeemail.com": "452 Mailbox full"},
+    ) as sink:
+        transport = emailee.LMTPTransport(socketPath=socket_path)
+        mail = helper_mail(transport)
+        for _ in range(3):
+            assert mail.send()
+        transport.close()
+    assert mail._refused == {
+        "two@fakeemail.com": (452, b"Mailbox full"),
+        "three@fakeemail.com": (550, b"No such user"),
+    }
+    # one connection for every email, ended with QUIT
+    assert sink.connections == 1
+    verbs = helper_verbs(sink)
+    assert verbs[0] == "LHLO" and verbs[-1] == "QUIT" and verbs.count("DATA") == 3
+    assert len(sink.messages) == 3
+
+
+def test_lmtp_all_refused_after_data(socket_path):
+    refused = {rcpt: "550 No such user" for rcpt in RECEIVERS}
+    with SMTPSink(socketPath=socket_path, lmtp=True, refuseAfterData=refused):
+        transport = emailee.LMTPTransport(socketPath=socket_path)
+        with pytest.raises(ValueError) as error:
+            helper_mail(transport).send()
+        assert isinstance(_rootCause(error.value), smtplib.SMTPRecipientsRefused)
+        # the session is still usable after refused recipients
+        assert helper_mail(transport, to=["other@fakeemail.com"]).send()
+        transport.close()
+
+
+def test_lmtp_tcp():
+    with SMTPSink(lmtp=True) as sink:
+        transport = emailee.LMTPTransport(host=sink.host, port=sink.port)
+        assert helper_mail(transport, msgHTML="<p>Grüße</p>").send()
+        transport.close()
+    [message] = sink.messages
+    assert message["rcpts"] == RECEIVERS
+    assert "BODY=8BITMIME" in sink.commands[1]
+    assert email.message_from_bytes(message["data"])["subject"] == "Local delivery test"
+
+
+def test_lmtp_checks_idle_connection(socket_path, monkeypatch):
+    monkeypatch.setattr(_SessionTransport, "_IDLE_CHECK", 0)
+    with SMTPSink(socketPath=socket_path, lmtp=True) as sink:
+        transport = emailee.LMTPTransport(socketPath=socket_path)
+        mail = helper_mail(transport)
+        mail.send()
+        mail.send()
+        transport.close()
+    assert helper_verbs(sink).count("NOOP") == 1 and sink.connections == 1
+
+
+# --- SMTP over Unix socket tests --- #
+
+
+@pytest.mark.parametrize("extensions", [["8BITMIME"], ["8BITMIME", "CHUNKING"]])
+def test_unix_smtp(extensions, socket_path):
+    with SMTPSink(socketPath=socket_path, extensions=extensions) as sink:
+        transport = emailee.UnixSMTPTransport(socket_path, chunkSize=1024)
+        mail = helper_mail(transport, msgHTML="<p>Grüße</p>\n" * 200)
+        assert mail.send() and mail.send()
+        transport.close()
+    verbs = helper_verbs(sink)
+    assert verbs[0] == "EHLO" and "STARTTLS" not in verbs
+    assert ("BDAT" in verbs) == ("CHUNKING" in extensions)
+    assert sink.connections == 1 and len(sink.messages) == 2
+
+
+def test_unix_smtp_connection_refused(socket_path):
+    transport = emailee.UnixSMTPTransport(socket_path)
+    with pytest.raises(ValueError):
+        helper_mail(transport).send()
+
+
+# --- async tests --- #
+
+
+def test_async_threads_lmtp(socket_path, tmp_path):
+    mailList = fakeMailList(20) + [fakeMailItem(["refused@fakeemail.com"])]
+    with SMTPSink(
+        socketPath=socket_path,
+        lmtp=True,
+        refuseAfterData={"refused@fakeemail.com": "550 No such user"},
+    ) as sink:
+        emails = emailee.AsyncThreads(
+            mailList,
+            {},
+            outputFile=str(tmp_path / "output.txt"),
+            maxThreads=4,
+            transport=emailee.LMTPTransport(socketPath=socket_path),
+        )
+    assert len(emails.emailReport) == 20
+    [failed] = emails.failedReport
+    assert failed["outcome"] == "permanent"
+    assert failed["refused"] == {"refused@fakeemail.com": [550, "No such user"]}
+    # connections are kept by each worker thread and ended as it stops
+    assert sink.connections <= 4
+    assert helper_verbs(sink).count("QUIT") == sink.connections
+
+
+def test_async_mp_unix_smtp(socket_path, tmp_path):
+    with SMTPSink(socketPath=socket_path) as sink:
+        emails = emailee.AsyncMP(
+            fakeMailList(10),
+            {},
+            outputFile=str(tmp_path / "output.txt"),
+            maxProcesses=2,
+            transport=emailee.UnixSMTPTransport(socket_path),
+        )
+    assert len(emails.emailReport) == 10 and len(sink.messages) == 10
+    assert sink.connections <= 2
+    assert helper_verbs(sink).count("QUIT") == sink.connections
+
+
+@pytest.mark.parametrize(
+    "build, error",
+    [
+        (lambda: emailee.LMTPTransport(), ValueError),
+        (lambda: emailee.LMTPTransport(socketPath="/s", host="localhost"), ValueError),
+        (lambda: emailee.LMTPTransport(host="localhost", port=0), ValueError),
+        (lambda: emailee.LMTPTransport(host=1), TypeError),
+        (lambda: emailee.LMTPTransport(host="localhost", timeout=0), ValueError),
+        (lambda: emailee.UnixSMTPTransport(""), ValueError),
+        (lambda: emailee.UnixSMTPTransport(1), TypeError),
+        (lambda: emailee.UnixSMTPTransport("/s", chunkSize=-1), ValueError),
+    ],
+)
+def test_local_transport_invalid(build, error):
+    with pytest.raises(error):
+        build()
@@ -0,0 +1,162 @@
+import io
+import mailbox
+import tracemalloc
+
+import pytest
+
+import emailee
+from emailee.emailee_merge import _Column
+from emailee.emailee_shm import _SharedBodies, _SharedRef, shared_memory
+
+CSV = (
+    "email,name,company,plan\n"
+    "one@fakeemail.com,Ann,A & B <Ltd>,gold\n"
+    'two@fakeemail.com;three@fakeemail.com,"Bo, Jr",Cee,silver\n'
+    'four@fakeemail.com,Dee,"Multi\nline",bronze\n'
+)
+HTML = "<p>Dear ${name} of $company, 100% $$5 off.</p>\n" * 200
+
+
+def helper_merge(csvText=CSV, **kwargs):
+    options = {
+        "subject": "Hello $name",
+        "msgText": "Dear $name, you're on $plan",
+        "msgHTML": HTML,
+    }
+    options.update(kwargs)
+    return emailee.MailMerge(
+        io.StringIO(csvText, newline=""), "fake.sender@fakeemail.com", **options
+    )
+
+
+def test_merge_mail_items():
+    merge = helper_merge()
+    assert len(merge) == 3
+    first, second, third = merge.mailItems()
+    assert first["subject"] == "Hello Ann" and second["subject"] == "Hello Bo, Jr"
+    assert second["to"] == ["two@fakeemail.com", "three@fakeemail.com"]
+    # bodies stay as the one shared template, with just the fields per item
+    assert first["msgHTML"] is third["msgHTML"] is merge.mailItem(1)["msgHTML"]
+    assert third["_mergeFields"] == {
+        "name": "Dee",
+        "plan": "bronze",
+        "company": "Multi\nline",
+    }
+    assert [item["to"] for item in merge.mailItems(start=2)] == [third["to"]]
+    with pytest.raises(IndexError):
+        merge.mailItem(3)
+
+
+def test_merge_reads_only_used_columns_in_chunks():
+    rows = "".join(f"r{n}@fakeemail.com,N{n},Co{n},{n}\n" for n in range(25))
+    merge = helper_merge("email,name,company,plan\n" + rows, msgText="", chunkSize=4)
+    assert len(merge) == 25
+    assert "plan" not in merge._columns
+    assert merge.mailItem(24)["_mergeFields"] == {"name": "N24", "company": "Co24"}
+    # a short row leaves its missing columns empty
+    merge = helper_merge("email,name,company,plan\nx@fakeemail.com\n")
+    assert merge.mailItem(0)["_mergeFields"]["name"] == ""
+
+
+def test_column_compact():
+    values = [f"receiver{n}@fakeemail.com" for n in range(10000)] + ["Grüße", ""]
+    tracemalloc.start()
+    column = _Column()
+    column.extend(values)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(column) == len(values)
+    assert [column[n] for n in (0, 9999, 10000, 10001)] == [
+        values[0],
+        values[9999],
+        "Grüße",
+        "",
+    ]
+    # about the text and an offset a row, well under a str object per value
+    assert used < sum(len(value) + 8 for value in values) * 1.5
+
+
+def test_merge_threads_renders_bodies(tmp_path):
+    transport = emailee.MemoryTransport()
+    merge = helper_merge()
+    emails = emailee.AsyncThreads(
+        merge.mailItems(),
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        transport=transport,
+    )
+    assert len(emails.emailReport) == 3
+    [message] = [m for m in transport.messages if m["rcpts"] == ["one@fakeemail.com"]]
+    data = message["data"].decode()
+    assert "subject: Hello Ann" in data
+    assert "Dear Ann, you're on gold" in data
+    # values are escaped in the HTML body only, and $$ is a $
+    assert "of A &amp; B &lt;Ltd&gt;, 100% $5 off." in data
+
+
+def test_merge_processes_share_template(tmp_path):
+    path = str(tmp_path / "Maildir")
+    rows = "".join(f"r{n}@fakeemail.com,N{n},Co{n},{n}\n" for n in range(6))
+    emails = emailee.AsyncMP(
+        helper_merge("email,name,company,plan\n" + rows).mailItems(),
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        maxProcesses=2,
+        transport=emailee.FileTransport(path, fileFormat="maildir"),
+    )
+    assert len(emails.emailReport) == 6
+    bodies = {
+        message["To"]: part.get_payload(decode=True).decode()
+        for message in mailbox.Maildir(path)
+        for part in message.walk()
+        if part.get_content_type() == "text/html"
+    }
+    assert len(bodies) == 6 and "Dear N4 of Co4" in bodies["r4@fakeemail.com"]
+
+
+@pytest.mark.skipif(shared_memory is None, reason="needs Python 3.8+")
+def test_merge_intern_shares_template():
+    merge = helper_merge()
+    shared = _SharedBodies()
+    try:
+        shared.intern(merge.mailItem(0))
+        task = shared.intern(merge.mailItem(1))
+        assert isinstance(task["msgHTML"], _SharedRef)
+        assert task["_mergeFields"]["name"] == "Bo, Jr"
+    finally:
+        shared.close()
+
+
+def test_merge_byte_order_mark_and_attachment_lists(tmp_path):
+    path = tmp_path / "list.csv"
+    path.write_text(CSV, encoding="utf-8-sig")
+    attachments = ["a.pdf"]
+    merge = emailee.MailMerge(
+        str(path), "fake.sender@fakeemail.com", attachmentFiles=attachments
+    )
+    assert merge.mailItem(0)["to"] == ["one@fakeemail.com"]
+    # a text file opened without utf-8-sig
+    merge = helper_merge("\ufeff" + CSV, attachmentFiles=attachments)
+    first, second = merge.mailItem(0), merge.mailItem(1)
+    assert first["to"] == ["one@fakeemail.com"]
+    # each item has its own list, changing one leaves the rest alone
+    first["attachmentFiles"].append("b.pdf")
+    assert second["attachmentFiles"] == attachments == ["a.pdf"]
+
+
+def test_merge_invalid(tmp_path):
+    path = tmp_path / "list.csv"
+    path.write_text(CSV)
+    assert len(emailee.MailMerge(str(path), "fake.sender@fakeemail.com")) == 3
+    with pytest.raises(ValueError, match="unknown"):
+        helper_merge(msgHTML="Hi $unknown")
+    with pytest.raises(ValueError):
+        helper_merge(toColumn="to")
+    with pytest.raises(ValueError):
+        helper_merge(msgText="Only $5")
+    with pytest.raises(ValueError):
+        helper_merge(chunkSize=0)
+    with pytest.raises(TypeError):
+        helper_merge(subject=1)
+    with pytest.raises(TypeError):
+        emailee.MailMerge(1, "fake.sender@fakeemail.com")
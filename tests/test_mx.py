@@ -0,0 +1,345 @@
+import smtplib
+import struct
+
+import pytest
+
+import emailee
+import emailee.emailee_mx as emailee_mx
+from tests.smtp_sink import SMTPSink, fakeMailItem
+
+
+def helper_local_resolver(domain):
+    # stand-in MX resolver, every domain is served by the local sink
+    if domain == "nomx.fakeemail.com":
+        raise ValueError(f"Domain does not exist - {domain}")
+    return [(10, "127.0.0.1")]
+
+
+def helper_dns_name(name):
+    labels = [label for label in name.split(".") if label]
+    return b"".join(bytes([len(label)]) + label.encode() for label in labels) + b"\x00"
+
+
+def helper_mx_response(domain, records, rcode=0):
+    header = struct.pack("!HHHHHH", 1, 0x8180 | rcode, 1, len(records), 0, 0)
+    question = helper_dns_name(domain) + struct.pack("!HH", 15, 1)
+    answers = b""
+    for preference, exchange in records:
+        if isinstance(exchange, str):
+            exchange = helper_dns_name(exchange)
+        rdata = struct.pack("!H", preference) + exchange
+        # owner name is a compression pointer back to the question at offset 12
+        answers += b"\xc0\x0c" + struct.pack("!HHIH", 15, 1, 300, len(rdata)) + rdata
+    return header + question + answers
+
+
+# --- MX lookup tests --- #
+
+
+def test_parse_mx_response_sorted():
+    response = helper_mx_response(
+        "fakeemail.com", [(20, "mx2.fakeemail.com"), (10, "mx1.fakeemail.com")]
+    )
+    assert emailee_mx._parseMXResponse(response, "fakeemail.com") == [
+        (10, "mx1.fakeemail.com"),
+        (20, "mx2.fakeemail.com"),
+    ]
+
+
+def test_parse_mx_response_compressed_exchange():
+    # exchange is 'mx' followed by a pointer to the question's fakeemail.com
+    response = helper_mx_response("fakeemail.com", [(10, b"\x02mx\xc0\x0c")])
+    assert emailee_mx._parseMXResponse(response, "fakeemail.com") == [
+        (10, "mx.fakeemail.com")
+    ]
+
+
+def test_parse_mx_response_compression_loop():
+    response = helper_mx_response("fakeemail.com", [(10, b"\xc0\x0c")])
+    response = response[:-2] + struct.pack("!H", 0xC000 | (len(response) - 2))
+    with pytest.raises(ValueError):
+        emailee_mx._parseMXResponse(response, "fakeemail.com")
+
+
+def test_parse_mx_response_implicit_mx():
+    response = helper_mx_response("fakeemail.com", [])
+    assert emailee_mx._parseMXResponse(response, "fakeemail.com") == [
+        (0, "fakeemail.com")
+    ]
+
+
+def test_parse_mx_response_null_mx():
+    response = helper_mx_response("fakeemail.com", [(0, "")])
+    with pytest.raises(ValueError):
+        emailee_mx._parseMXResponse(response, "fakeemail.com")
+
+
+def test_parse_mx_response_nxdomain():
+    response = helper_mx_response("fakeemail.com", [], rcode=3)
+    with pytest.raises(ValueError):
+        emailee_mx._parseMXResponse(response, "fakeemail.com")
+
+
+def test_parse_mx_response_malformed():
+    response = helper_mx_response("fakeemail.com", [(10, "mx1.fakeemail.com")])
+    with pytest.raises(ValueError):
+        emailee_mx._parseMXResponse(response[:-5], "fakeemail.com")
+
+
+# --- domain planning tests --- #
+
+
+def test_plan_groups_by_domain():
+    mailList = [
+        fakeMailItem(["a@one.com", "b@one.com"], cc=["c@two.com"]),
+        fakeMailItem(["d@two.com"]),
+        fakeMailItem(["e@ONE.com"]),
+    ]
+    jobs = emailee_mx._planDomainJobs(mailList, {"default": 1}, "list")
+    assert [(domain, [index for index, _ in items]) for domain, items in jobs] == [
+        ("one.com", [0, 2]),
+        ("two.com", [0, 1]),
+    ]
+
+
+def test_plan_order_size():
+    mailList = [
+        fakeMailItem(["a@one.com"]),
+        fakeMailItem(["b@two.com"]),
+        fakeMailItem(["c@two.com"]),
+    ]
+    jobs = emailee_mx._planDomainJobs(mailList, {"default": 1}, "size")
+    assert [domain for domain, _ in jobs] == ["two.com", "one.com"]
+
+
+def test_plan_order_explicit():
+    mailList = [
+        fakeMailItem(["a@one.com"]),
+        fakeMailItem(["b@two.com"]),
+        fakeMailItem(["c@two.com"]),
+        fakeMailItem(["d@three.com"]),
+    ]
+    jobs = emailee_mx._planDomainJobs(mailList, {"default": 1}, ["Three.com"])
+    assert [domain for domain, _ in jobs] == ["three.com", "two.com", "one.com"]
+
+
+def test_plan_domain_concurrency():
+    mailList = [fakeMailItem([f"user{i}@one.com"]) for i in range(5)]
+    mailList.append(fakeMailItem(["a@two.com"]))
+    jobs = emailee_mx._planDomainJobs(mailList, {"default": 1, "one.com": 2}, "size")
+    assert [(domain, [index for index, _ in items]) for domain, items in jobs] == [
+        ("one.com", [0, 2, 4]),
+        ("one.com", [1, 3]),
+        ("two.com", [5]),
+    ]
+
+
+# --- AsyncThreads/AsyncMP direct to MX tests --- #
+
+
+@pytest.mark.parametrize("bad_data", ["", "MX", "direct"])
+def test_delivery_mode_invalid_value(bad_data, tmp_path):
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            [fakeMailItem(["a@one.com"])],
+            {},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode=bad_data,
+        )
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs",
+    [
+        {"deliveryMode": None},
+        {"mxResolver": "localhost"},
+        {"domainConcurrency": 1},
+        {"domainConcurrency": {"default": "1"}},
+        {"domainOrder": None},
+    ],
+)
+def test_delivery_mx_invalid_type(bad_kwargs, tmp_path):
+    with pytest.raises(TypeError):
+        emailee.AsyncThreads(
+            [fakeMailItem(["a@one.com"])],
+            {},
+            outputFile=str(tmp_path / "output.txt"),
+            **bad_kwargs,
+        )
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs",
+    [
+        {"domainConcurrency": {"default": 0}},
+        {"domainOrder": "random"},
+    ],
+)
+def test_delivery_mx_invalid_value(bad_kwargs, tmp_path):
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            [fakeMailItem(["a@one.com"])],
+            {},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            **bad_kwargs,
+        )
+
+
+def test_delivery_mx_threaded(tmp_path):
+    mailList = [
+        fakeMailItem(["a@one.com", "b@one.com"], cc=["c@two.com"], subject="1"),
+        fakeMailItem(["d@two.com"], subject="2"),
+        fakeMailItem(["e@one.com"], subject="3"),
+    ]
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            mailList,
+            {"port": sink.port, "timeout": 5},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=helper_local_resolver,
+        )
+
+    # one transaction per item and domain, one reused connection per domain
+    assert sorted(message["rcpts"] for message in sink.messages) == [
+        ["a@one.com", "b@one.com"],
+        ["c@two.com"],
+        ["d@two.com"],
+        ["e@one.com"],
+    ]
+    assert sink.connections == 2
+    assert sorted((i["subject"], i["domain"]) for i in email.emailReport) == [
+        ("1", "one.com"),
+        ("1", "two.com"),
+        ("2", "two.com"),
+        ("3", "one.com"),
+    ]
+    assert email.failedReport == []
+    assert len((tmp_path / "output.txt").read_text().splitlines()) == 4
+
+
+def test_delivery_mx_multiprocessing(tmp_path):
+    mailList = [fakeMailItem([f"user{i}@one.com"]) for i in range(3)]
+    mailList.append(fakeMailItem(["a@two.com"]))
+    with SMTPSink() as sink:
+        email = emailee.AsyncMP(
+            mailList,
+            {"port": sink.port, "timeout": 5},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=helper_local_resolver,
+            maxProcesses=2,
+        )
+    assert len(sink.messages) == 4
+    assert len(email.emailReport) == 4
+
+
+def test_delivery_mx_chunking(tmp_path):
+    mailList = [fakeMailItem([f"user{i}@one.com"]) for i in range(2)]
+    with SMTPSink(extensions=["CHUNKING"]) as sink:
+        email = emailee.AsyncThreads(
+            mailList,
+            {"port": sink.port, "timeout": 5, "chunkSize": 256},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=helper_local_resolver,
+        )
+    assert len(email.emailReport) == 2
+    assert [message["rcpts"] for message in sink.messages] == [
+        ["user0@one.com"],
+        ["user1@one.com"],
+    ]
+    assert "BDAT 256" in sink.commands
+
+
+def test_delivery_mx_domain_failure_reported(tmp_path):
+    mailList = [
+        fakeMailItem(["a@nomx.fakeemail.com"]),
+        fakeMailItem(["b@nomx.fakeemail.com"]),
+        fakeMailItem(["c@one.com"]),
+    ]
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            mailList,
+            {"port": sink.port, "timeout": 5},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=helper_local_resolver,
+        )
+    assert [message["rcpts"] for message in sink.messages] == [["c@one.com"]]
+    assert len(email.emailReport) == 1
+    assert [i["domain"] for i in email.failedReport] == [
+        "nomx.fakeemail.com",
+        "nomx.fakeemail.com",
+    ]
+    assert "Domain does not exist" in email.failedReport[0]["error"]
+
+
+def test_delivery_mx_refused_recipient_reported(tmp_path):
+    mailList = [
+        fakeMailItem(["a@one.com"], subject="1"),
+        fakeMailItem(["b@one.com"], subject="2"),
+    ]
+    with SMTPSink(refuse={"a@one.com": "550 No such user"}) as sink:
+        email = emailee.AsyncThreads(
+            mailList,
+            {"port": sink.port, "timeout": 5},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=helper_local_resolver,
+        )
+    # the connection is reset and reused for the next item after a refusal
+    assert sink.connections == 1
+    assert [i["subject"] for i in email.emailReport] == ["2"]
+    assert [i["subject"] for i in email.failedReport] == ["1"]
+
+
+def test_delivery_mx_starttls_failure_falls_back(tmp_path):
+    # STARTTLS is advertised but refused, so it's retried in plaintext
+    with SMTPSink(extensions=["STARTTLS"]) as sink:
+        email = emailee.AsyncThreads(
+            [fakeMailItem(["a@one.com"])],
+            {"port": sink.port, "timeout": 5},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=helper_local_resolver,
+        )
+    assert sink.connections == 2
+    assert [message["rcpts"] for message in sink.messages] == [["a@one.com"]]
+    assert email.failedReport == []
+
+
+def test_delivery_mx_starttls_required_failure(tmp_path):
+    with SMTPSink(extensions=["STARTTLS"]) as sink:
+        email = emailee.AsyncThreads(
+            [fakeMailItem(["a@one.com"])],
+            {"port": sink.port, "timeout": 5, "SSLTLS": "TLS"},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=helper_local_resolver,
+        )
+    assert sink.connections == 1
+    assert sink.messages == []
+    assert len(email.failedReport) == 1
+
+
+def test_connect_mx_closes_failed_connection(monkeypatch):
+    closed = []
+
+    class FailingSMTP:
+        def __init__(self, host, port, timeout):
+            self.host = host
+
+        def ehlo(self):
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+        def close(self):
+            closed.append(self.host)
+
+    monkeypatch.setattr(emailee_mx, "_SMTP", FailingSMTP)
+    with pytest.raises(ConnectionError):
+        emailee_mx._connectMX(
+            "one.com", {}, lambda domain: [(10, "mx1.one.com"), (20, "mx2.one.com")]
+        )
+    assert closed == ["mx1.one.com", "mx2.one.com"]
@@ -0,0 +1,140 @@
+import smtplib
+
+import pytest
+
+import emailee
+from emailee.emailee_outcome import _failureDetails, _sentDetails
+from tests.smtp_sink import SMTPSink, closedPort, fakeMailItem, sinkServer
+
+
+def helper_wrapped(error):
+    # an error as it comes out of _sendMailFunc, wrapped twice
+    try:
+        try:
+            raise error
+        except Exception as cause:
+            raise ValueError(cause)
+    except ValueError as wrapped:
+        try:
+            raise ValueError(wrapped) from wrapped
+        except ValueError as outer:
+            return outer
+
+
+# --- outcome tests --- #
+
+
+def test_sent_details():
+    assert _sentDetails({}) == {"outcome": "sent"}
+    assert _sentDetails({"a@fakeemail.com": (550, b"No such user")}) == {
+        "outcome": "partial",
+        "refused": {"a@fakeemail.com": [550, "No such user"]},
+    }
+
+
+@pytest.mark.parametrize(
+    "error, outcome",
+    [
+        (smtplib.SMTPRecipientsRefused({"a@fakeemail.com": (550, b"No")}), "permanent"),
+        (
+            smtplib.SMTPRecipientsRefused(
+                {"a@fakeemail.com": (550, b"No"), "b@fakeemail.com": (452, b"Full")}
+            ),
+            "transient",
+        ),
+        (smtplib.SMTPSenderRefused(553, b"Bad sender", "a@fakeemail.com"), "permanent"),
+        (smtplib.SMTPDataError(451, b"Try later"), "transient"),
+        (smtplib.SMTPServerDisconnected("Connection unexpectedly closed"), "transient"),
+        (ConnectionRefusedError(111, "Connection refused"), "transient"),
+        (ValueError("Sender email address not valid"), "invalid"),
+        (FileNotFoundError(2, "No such file", "missing.txt"), "invalid"),
+    ],
+)
+def test_failure_details(error, outcome):
+    details = _failureDetails(helper_wrapped(error))
+    assert details["outcome"] == outcome
+    assert details["error"]
+
+
+def test_failure_details_codes():
+    refused = smtplib.SMTPRecipientsRefused({"a@fakeemail.com": (550, b"No")})
+    assert _failureDetails(helper_wrapped(refused))["refused"] == {
+        "a@fakeemail.com": [550, "No"]
+    }
+    rejected = smtplib.SMTPDataError(554, b"Rejected")
+    assert _failureDetails(helper_wrapped(rejected))["code"] == 554
+
+
+# --- AsyncThreads/AsyncMP outcome tests --- #
+
+
+@pytest.mark.parametrize("senderClass", [emailee.AsyncThreads, emailee.AsyncMP])
+def test_outcomes_reported(senderClass, tmp_path):
+    refuse = {
+        "partial@fakeemail.com": "550 No such user",
+        "refused@fakeemail.com": "550 No such user",
+        "full@fakeemail.com": "452 Mailbox full",
+    }
+    mailList = [
+        fakeMailItem(["refused@fakeemail.com"], subject="permanent"),
+        fakeMailItem(["ok@fakeemail.com", "partial@fakeemail.com"], subject="partial"),
+        fakeMailItem(["full@fakeemail.com"], subject="transient"),
+        fakeMailItem(attachmentFiles=["missing-attachment.txt"], subject="invalid"),
+        fakeMailItem(subject="sent"),
+    ]
+    with SMTPSink(refuse=refuse) as sink:
+        emails = senderClass(
+            mailList, sinkServer(sink.port), outputFile=str(tmp_path / "output.txt")
+        )
+    # a failing first item is recorded rather than stopping the run
+    assert len(sink.messages) == 2
+    outcomes = {
+        report["subject"]: report["outcome"]
+        for report in emails.emailReport + emails.failedReport
+    }
+    assert outcomes == {
+        "permanent": "permanent",
+        "partial": "partial",
+        "transient": "transient",
+        "invalid": "invalid",
+        "sent": "sent",
+    }
+    [partial] = [i for i in emails.emailReport if i["subject"] == "partial"]
+    assert partial["refused"] == {"partial@fakeemail.com": [550, "No such user"]}
+    [permanent] = [i for i in emails.failedReport if i["subject"] == "permanent"]
+    assert permanent["refused"] == {"refused@fakeemail.com": [550, "No such user"]}
+
+
+def test_outcomes_direct_mx(tmp_path):
+    mailList = [
+        fakeMailItem(["a@one.com", "b@one.com"], subject="partial"),
+        fakeMailItem(["c@nomx.fakeemail.com"], subject="nomx"),
+    ]
+
+    def resolver(domain):
+        if domain == "nomx.fakeemail.com":
+            raise ValueError(f"Domain does not exist - {domain}")
+        return [(10, "127.0.0.1")]
+
+    with SMTPSink(refuse={"b@one.com": "550 No such user"}) as sink:
+        emails = emailee.AsyncThreads(
+            mailList,
+            {"port": sink.port, "timeout": 5},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=resolver,
+        )
+    [sent] = emails.emailReport
+    assert sent["outcome"] == "partial"
+    assert sent["refused"] == {"b@one.com": [550, "No such user"]}
+    [failed] = emails.failedReport
+    assert failed["outcome"] == "permanent"
+
+
+def test_broken_server_still_raises(tmp_path):
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            [fakeMailItem()],
+            sinkServer(closedPort()),
+            outputFile=str(tmp_path / "output.txt"),
+        )
@@ -0,0 +1,366 @@
+import smtplib
+import threading
+import time
+
+import pytest
+
+import emailee
+from emailee.emailee_async import _sendMailFunc
+from emailee.emailee_relay import (
+    _isRelayFailure,
+    _probeRelay,
+    _probeServer,
+    _RelayPool,
+    _serverKey,
+)
+from tests.smtp_sink import SMTPSink, closedPort, fakeMailItem, fakeMailList, sinkServer
+
+
+def helper_join_probes(pool):
+    for thread in pool._probeThreads:
+        thread.join(timeout=10)
+
+
+# --- relay pool tests --- #
+
+
+def test_pool_weighted_round_robin():
+    pool = _RelayPool([{"name": "a", "weight": 3}, {"name": "b", "weight": 1}])
+    picks = []
+    for _ in range(8):
+        relay = pool.choose()
+        picks.append(relay.name)
+        pool.release(relay, True, False)
+    assert picks.count("a") == 6 and picks.count("b") == 2
+    # smooth round robin never gives the heavy relay more than 3 in a row
+    assert "aaaa" not in "".join(picks)
+
+
+def test_pool_least_outstanding():
+    pool = _RelayPool(
+        [{"name": "a"}, {"name": "b", "weight": 2}], strategy="leastoutstanding"
+    )
+    # b takes two sends to every one of a's as it has twice the weight
+    assert [pool.choose().name for _ in range(3)] == ["b", "a", "b"]
+
+
+def test_pool_exclude():
+    pool = _RelayPool([{"name": "a"}, {"name": "b"}])
+    first = pool.choose()
+    assert pool.choose(exclude=[first]).name != first.name
+    assert pool.choose(exclude=pool.relays) is None
+
+
+def test_pool_unhealthy_relay_out_of_rotation():
+    pool = _RelayPool(
+        [{"name": "a"}, {"name": "b"}],
+        maxFailures=2,
+        retryAfter=60,
+        probe=lambda serverDict: True,
+    )
+    a = pool.relays[0]
+    for _ in range(2):
+        pool.choose()
+        pool.release(a, False, True)
+    assert not a.healthy
+    assert {pool.choose().name for _ in range(4)} == {"b"}
+
+
+def test_pool_readmits_after_probe():
+    probed = []
+
+    def probe(serverDict):
+        probed.append(serverDict["name"])
+        return len(probed) > 1
+
+    pool = _RelayPool(
+        [{"name": "a"}, {"name": "b"}], maxFailures=1, retryAfter=0, probe=probe
+    )
+    a = pool.relays[0]
+    pool.choose()
+    pool.release(a, False, True)
+    assert not a.healthy
+
+    pool.choose()
+    helper_join_probes(pool)
+    assert not a.healthy
+    pool.choose()
+    helper_join_probes(pool)
+    assert a.healthy
+    assert probed == ["a", "a"]
+    assert pool.stats()[0]["probes"] == 2
+
+
+def test_pool_probe_doesnt_block_choose():
+    started = threading.Event()
+    release = threading.Event()
+
+    def probe(serverDict):
+        started.set()
+        release.wait(timeout=10)
+        return True
+
+    pool = _RelayPool(
+        [{"name": "a"}, {"name": "b"}], maxFailures=1, retryAfter=0, probe=probe
+    )
+    a = pool.relays[0]
+    pool.choose()
+    pool.release(a, False, True)
+    assert pool.choose().name == "b"
+    assert started.wait(timeout=10)
+    # the probe is still running, choose() goes on without it
+    start = time.monotonic()
+    assert {pool.choose().name for _ in range(3)} == {"b"}
+    assert time.monotonic() - start < 1
+    assert pool.stats()[0]["probes"] == 1
+    release.set()
+    helper_join_probes(pool)
+    assert a.healthy
+
+
+def test_pool_non_relay_failures_dont_count():
+    pool = _RelayPool([{"name": "a"}, {"name": "b"}], maxFailures=1)
+    a = pool.relays[0]
+    pool.choose()
+    pool.release(a, False, False)
+    assert a.healthy
+    assert pool.stats()[0]["failed"] == 1
+
+
+def test_pool_single_relay_stays_in_rotation():
+    pool = _RelayPool([{"name": "a"}], maxFailures=1)
+    for _ in range(3):
+        pool.release(pool.choose(), False, True)
+    assert pool.relays[0].healthy
+
+
+def test_is_relay_failure():
+    refused = smtplib.SMTPRecipientsRefused({"a@fakeemail.com": (550, b"No")})
+    try:
+        raise ValueError(refused) from refused
+    except ValueError as error:
+        assert not _isRelayFailure(error)
+    assert not _isRelayFailure(smtplib.SMTPDataError(554, b"Rejected"))
+    assert _isRelayFailure(smtplib.SMTPDataError(451, b"Try later"))
+    assert _isRelayFailure(ConnectionRefusedError())
+    # wrapped without "from", as Emailee.send does
+    try:
+        try:
+            raise smtplib.SMTPSenderRefused(553, b"Bad sender", "a@fakeemail.com")
+        except smtplib.SMTPSenderRefused as error:
+            raise ValueError(error)
+    except ValueError as error:
+        assert not _isRelayFailure(error)
+    assert not _isRelayFailure(FileNotFoundError(2, "No such file", "missing.txt"))
+    assert _isRelayFailure(TimeoutError())
+
+
+@pytest.mark.parametrize(
+    "mailItem, relayFailure",
+    [
+        (fakeMailItem(["refused@fakeemail.com"]), False),
+        (fakeMailItem(attachmentFiles=["missing-attachment.txt"]), False),
+        (fakeMailItem(sender="not an address"), False),
+        (fakeMailItem(), None),
+    ],
+)
+def test_is_relay_failure_send(mailItem, relayFailure, tmp_path):
+    refuse = {"refused@fakeemail.com": "550 No such user"}
+    with SMTPSink(refuse=refuse) as sink:
+        serverDict = sinkServer(sink.port)
+        if relayFailure is None:
+            # a relay that's down
+            serverDict = sinkServer(closedPort())
+        with pytest.raises(Exception) as error:
+            _sendMailFunc(mailItem, serverDict, str(tmp_path / "output.txt"), False)
+    assert _isRelayFailure(error.value) is (relayFailure is None)
+
+
+def test_probe_relay():
+    with SMTPSink() as sink:
+        assert _probeRelay(sinkServer(sink.port))
+    assert not _probeRelay(sinkServer(closedPort()))
+
+
+def test_probe_server_extensions():
+    extensions = ["SIZE 1000000", "PIPELINING", "8BITMIME", "CHUNKING", "DSN"]
+    with SMTPSink(extensions=extensions) as sink:
+        assert _probeServer(*_serverKey(sinkServer(sink.port))) == {
+            "size": "1000000",
+            "pipelining": "",
+            "8bitmime": "",
+            "chunking": "",
+        }
+    # nothing is sent
+    assert [command.split()[0].upper() for command in sink.commands] == [
+        "EHLO",
+        "NOOP",
+        "QUIT",
+    ]
+
+
+def test_probe_server_auth():
+    with SMTPSink(extensions=["AUTH PLAIN"]) as sink:
+        serverDict = sinkServer(
+            sink.port, authUsername="fake.sender@fakeemail.com", authPassword="x"
+        )
+        # the sink doesn't implement AUTH, so the probe fails on it
+        with pytest.raises(smtplib.SMTPException):
+            _probeServer(*_serverKey(serverDict))
+    assert sink.commands[1].upper().startswith("AUTH")
+
+
+def test_server_key_defaults():
+    assert _serverKey({"smtpServer": "smtp.fakeemail.com", "port": 465}) == (
+        "smtp.fakeemail.com",
+        465,
+        "SSL",
+        "",
+        "",
+        30,
+    )
+    assert _serverKey({"SSLTLS": "TLS"})[1:3] == (587, "TLS")
+
+
+# --- AsyncThreads/AsyncMP relay tests --- #
+
+
+@pytest.mark.parametrize("bad_data", [["a"], [{}, None], [{"weight": "2"}]])
+def test_relays_invalid_type(bad_data, tmp_path):
+    with pytest.raises(TypeError):
+        emailee.AsyncThreads(
+            fakeMailList(1), bad_data, outputFile=str(tmp_path / "output.txt")
+        )
+
+
+@pytest.mark.parametrize("bad_data", [[{"weight": 0}], [{"weight": -1}]])
+def test_relays_invalid_weight(bad_data, tmp_path):
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            fakeMailList(1), bad_data, outputFile=str(tmp_path / "output.txt")
+        )
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs",
+    [
+        {"relayStrategy": "random"},
+        {"relayMaxFailures": 0},
+        {"relayRetryAfter": -1},
+    ],
+)
+def test_relays_invalid_options(bad_kwargs, tmp_path):
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            fakeMailList(1),
+            [sinkServer(25)],
+            outputFile=str(tmp_path / "output.txt"),
+            **bad_kwargs,
+        )
+
+
+def test_relays_weighted_threaded(tmp_path):
+    with SMTPSink() as sinkA, SMTPSink() as sinkB:
+        email = emailee.AsyncThreads(
+            fakeMailList(8),
+            [
+                sinkServer(sinkA.port, name="a", weight=3),
+                sinkServer(sinkB.port, name="b"),
+            ],
+            outputFile=str(tmp_path / "output.txt"),
+        )
+    assert len(sinkA.messages) == 6 and len(sinkB.messages) == 2
+    assert sorted(i["relay"] for i in email.emailReport) == ["a"] * 6 + ["b"] * 2
+    assert [(i["relay"], i["sent"]) for i in email.relayReport] == [
+        ("a", 6),
+        ("b", 2),
+    ]
+
+
+def test_relays_failover_threaded(tmp_path):
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            fakeMailList(10),
+            [sinkServer(closedPort(), name="down"), sinkServer(sink.port)],
+            outputFile=str(tmp_path / "output.txt"),
+            maxThreads=2,
+            relayMaxFailures=2,
+            relayRetryAfter=60,
+        )
+    assert len(sink.messages) == 10
+    assert len(email.emailReport) == 10
+    assert email.failedReport == []
+    down = email.relayReport[0]
+    assert not down["healthy"] and down["sent"] == 0 and down["failed"] >= 2
+
+
+def test_relays_all_down_reported(tmp_path):
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            fakeMailList(2),
+            [sinkServer(closedPort()), sinkServer(closedPort())],
+            outputFile=str(tmp_path / "output.txt"),
+        )
+
+
+def test_relays_multiprocessing(tmp_path):
+    with SMTPSink() as sinkA, SMTPSink() as sinkB:
+        email = emailee.AsyncMP(
+            fakeMailList(6),
+            [sinkServer(sinkA.port), sinkServer(sinkB.port)],
+            outputFile=str(tmp_path / "output.txt"),
+            maxProcesses=2,
+        )
+    assert len(sinkA.messages) == 3 and len(sinkB.messages) == 3
+    assert len(email.emailReport) == 6
+
+
+def test_single_server_report_unchanged(tmp_path):
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            fakeMailList(3),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+        )
+    assert len(sink.messages) == 3
+    assert all("relay" not in i for i in email.emailReport)
+    assert len((tmp_path / "output.txt").read_text().splitlines()) == 3
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs, error",
+    [({"probeTTL": "1"}, TypeError), ({"probeTTL": -1}, ValueError)],
+)
+def test_probe_ttl_invalid(bad_kwargs, error, tmp_path):
+    with pytest.raises(error):
+        emailee.AsyncThreads(
+            fakeMailList(1), {}, outputFile=str(tmp_path / "output.txt"), **bad_kwargs
+        )
+
+
+@pytest.mark.parametrize("probeTTL, connections", [(300, 5), (0, 6)])
+def test_probe_cached_between_runs(probeTTL, connections, tmp_path):
+    with SMTPSink(extensions=["SIZE 1000000"]) as sink:
+        for run in range(2):
+            email = emailee.AsyncThreads(
+                fakeMailList(2),
+                sinkServer(sink.port),
+                outputFile=str(tmp_path / f"output{run}.txt"),
+                probeTTL=probeTTL,
+            )
+            assert email.relayReport[0]["extensions"] == {"size": "1000000"}
+    # a connection per email, and one per probe
+    assert len(sink.messages) == 4
+    assert sink.connections == connections
+
+
+def test_first_item_failure_recorded(tmp_path):
+    # the relay passes its probe, so an email it refuses is just recorded
+    with SMTPSink(refuse={"receiver0@fakeemail.com": "550 No such user"}) as sink:
+        email = emailee.AsyncThreads(
+            fakeMailList(3),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+        )
+    assert [i["to"] for i in email.failedReport] == [["receiver0@fakeemail.com"]]
+    assert len(email.emailReport) == 2
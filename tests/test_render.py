@@ -0,0 +1,110 @@
+import email
+import mailbox
+import os
+
+import pytest
+
+import emailee
+from emailee.emailee_connect import _wireBytes
+from tests.smtp_sink import fakeMailItem, fakeMailList
+
+FROM_LINE_TEXT = "Raw text email\nFrom here on, lines starting From are escaped\n"
+
+
+def helper_subjects(messages):
+    return [message["subject"] for message in messages]
+
+
+# --- render tests --- #
+
+
+@pytest.mark.parametrize("maxProcesses", [1, 2])
+def test_render_eml(maxProcesses, tmp_path):
+    mailList = fakeMailList(10)
+    report = emailee.renderMailList(
+        mailList, str(tmp_path), maxProcesses=maxProcesses, chunkSize=3
+    )
+    names = sorted(os.listdir(tmp_path))
+    assert names == [f"{index:04d}.eml" for index in range(10)]
+    assert report["rendered"] == 10 and report["failed"] == []
+    assert report["bytes"] == sum(os.stat(tmp_path / name).st_size for name in names)
+    assert report["messagesPerSecond"] > 0 and report["output"] == str(tmp_path)
+
+    data = (tmp_path / "0004.eml").read_bytes()
+    assert b"\r\n" in data and b"\n" not in data.replace(b"\r\n", b"")
+    message = email.message_from_bytes(data)
+    assert message["subject"] == mailList[4]["subject"]
+    assert message["to"] == mailList[4]["to"][0]
+
+
+def test_render_eml_matches_sent(tmp_path):
+    mailItem = fakeMailItem(msgHTML="<p>Grüße</p>")
+    emailee.renderMailList([mailItem], str(tmp_path))
+    sent = _wireBytes(emailee.emailee._helperEmaileeFromDict(mailItem)._message())
+
+    def normalise(data):
+        # boundaries and dates differ between generations
+        message = email.message_from_bytes(data)
+        del message["date"]
+        return [part.get_payload(decode=True) for part in message.walk()]
+
+    assert normalise((tmp_path / "0000.eml").read_bytes()) == normalise(sent)
+
+
+@pytest.mark.parametrize("maxProcesses", [1, 2])
+def test_render_mbox(maxProcesses, tmp_path):
+    mailList = fakeMailList(7) + [fakeMailItem(msgText=FROM_LINE_TEXT)]
+    report = emailee.renderMailList(
+        mailList,
+        str(tmp_path / "archive"),
+        outputFormat="mbox",
+        maxProcesses=maxProcesses,
+        chunkSize=3,
+    )
+    output = tmp_path / "archive" / "emails.mbox"
+    assert report["output"] == str(output) and report["rendered"] == 8
+    assert os.listdir(tmp_path / "archive") == ["emails.mbox"]
+    assert report["bytes"] == os.stat(output).st_size
+
+    messages = list(mailbox.mbox(str(output)))
+    assert helper_subjects(messages) == [item["subject"] for item in mailList]
+    assert messages[0].get_from().startswith("fake.sender@fakeemail.com ")
+    [text] = [p for p in messages[-1].walk() if p.get_content_type() == "text/plain"]
+    assert b"\n>From here on" in text.get_payload(decode=True)
+
+
+def test_render_invalid_items(tmp_path):
+    mailList = [
+        fakeMailItem(),
+        fakeMailItem(attachmentFiles=["missing.txt"]),
+        "not a mail item",
+        fakeMailItem(),
+    ]
+    report = emailee.renderMailList(mailList, str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["0000.eml", "0003.eml"]
+    assert report["rendered"] == 2
+    assert [(item["index"], item["outcome"]) for item in report["failed"]] == [
+        (1, "invalid"),
+        (2, "invalid"),
+    ]
+    assert report["failed"][1]["error"] == "Email item not valid type"
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs, error",
+    [
+        ({"mailList": {}}, TypeError),
+        ({"outputDir": 1}, TypeError),
+        ({"outputFormat": 1}, TypeError),
+        ({"outputFormat": "maildir"}, ValueError),
+        ({"maxProcesses": "2"}, TypeError),
+        ({"maxProcesses": 0}, ValueError),
+        ({"chunkSize": 1.5}, TypeError),
+        ({"chunkSize": 0}, ValueError),
+    ],
+)
+def test_render_invalid_args(bad_kwargs, error, tmp_path):
+    kwargs = {"mailList": [fakeMailItem()], "outputDir": str(tmp_path)}
+    kwargs.update(bad_kwargs)
+    with pytest.raises(error):
+        emailee.renderMailList(**kwargs)
@@ -0,0 +1,145 @@
+import multiprocessing
+import threading
+
+import pytest
+
+import emailee
+from tests.smtp_sink import SMTPSink, fakeMailList, sinkServer
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs", [{"onResult": "print"}, {"autoRun": 1}, {"autoRun": None}]
+)
+def test_results_invalid_type(bad_kwargs, tmp_path):
+    with pytest.raises(TypeError):
+        emailee.AsyncThreads(
+            fakeMailList(1),
+            {},
+            outputFile=str(tmp_path / "output.txt"),
+            **bad_kwargs,
+        )
+
+
+def test_on_result_threaded(tmp_path):
+    results = []
+    with SMTPSink(refuse={"receiver2@fakeemail.com": "550 No such user"}) as sink:
+        email = emailee.AsyncThreads(
+            fakeMailList(4),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            onResult=results.append,
+        )
+    assert sorted((i["index"], i["status"]) for i in results) == [
+        (0, "sent"),
+        (1, "sent"),
+        (2, "failed"),
+        (3, "sent"),
+    ]
+    assert all(i["elapsed"] >= 0 for i in results)
+    failed = [i for i in results if i["status"] == "failed"][0]
+    assert "550" in failed["error"]
+    # the reports themselves are unchanged
+    assert len(email.emailReport) == 3
+    assert "status" not in email.emailReport[0]
+
+
+def test_iter_results_streams(tmp_path):
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            fakeMailList(4),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            maxThreads=1,
+            autoRun=False,
+        )
+        assert email.emailReport == []
+        results = email.iterResults()
+        assert next(results)["index"] == 0
+        # nothing else is sent until it's asked for
+        assert len(sink.messages) == 1
+        assert [i["index"] for i in results] == [1, 2, 3]
+    assert len(email.emailReport) == 4
+
+
+def test_iter_results_stop_early(tmp_path):
+    threadsBefore = threading.active_count()
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            fakeMailList(10),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            maxThreads=2,
+            autoRun=False,
+        )
+        for result in email.iterResults():
+            if result["index"] == 1:
+                break
+    # sends already in progress are finished and recorded, then the workers stop
+    assert len(sink.messages) < 10
+    assert len(email.emailReport) == len(sink.messages)
+    assert threading.active_count() == threadsBefore
+
+
+def test_iter_results_only_once(tmp_path):
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            fakeMailList(1),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            autoRun=False,
+        )
+        assert email.run() == email.emailReport
+    with pytest.raises(RuntimeError):
+        email.iterResults()
+
+
+def test_threaded_uses_in_process_queues(monkeypatch, tmp_path):
+    def no_queue(*args, **kwargs):
+        raise AssertionError("multiprocessing.Queue used in thread mode")
+
+    monkeypatch.setattr(multiprocessing, "Queue", no_queue)
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            fakeMailList(3),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+        )
+    assert len(email.emailReport) == 3
+
+
+def test_iter_results_direct_mx(tmp_path):
+    mailList = fakeMailList(3)
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            mailList,
+            {"port": sink.port, "timeout": 5},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=lambda domain: [(10, "127.0.0.1")],
+            autoRun=False,
+        )
+        results = list(email.iterResults())
+    assert sorted(i["index"] for i in results) == [0, 1, 2]
+    assert all(i["domain"] == "fakeemail.com" for i in results)
+
+
+def test_on_result_multiprocessing(tmp_path):
+    results = []
+    with SMTPSink() as sink:
+        emailee.AsyncMP(
+            fakeMailList(4),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            maxProcesses=2,
+            onResult=results.append,
+        )
+    assert sorted(i["index"] for i in results) == [0, 1, 2, 3]
+    assert {i["status"] for i in results} == {"sent"}
+
+
+def test_send_async_base_is_abstract(tmp_path):
+    from emailee.emailee_async import _SendAsync
+
+    # the thread or process strategy comes from the subclass
+    with pytest.raises(TypeError):
+        _SendAsync([], {}, outputFile=str(tmp_path / "output.txt"))
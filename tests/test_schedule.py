@@ -0,0 +1,278 @@
+import time
+
+import pytest
+
+import emailee
+from emailee.emailee_schedule import _DomainScheduler, _mailDomains, _mailPriority
+from tests.smtp_sink import SMTPSink, fakeMailItem, sinkServer
+
+
+def helper_pop_all(scheduler):
+    popped = []
+    while True:
+        scheduled = scheduler.pop()
+        if scheduled is None:
+            return popped
+        popped.append(scheduled[0])
+
+
+# --- scheduler tests --- #
+
+
+def test_mail_domains():
+    mailItem = fakeMailItem(["a@One.com", "b@two.com"], cc=["c@one.com"])
+    assert _mailDomains(mailItem) == ["one.com", "two.com"]
+    assert _mailDomains(fakeMailItem([])) == [""]
+
+
+def test_scheduler_interleaves_domains():
+    scheduler = _DomainScheduler({}, {})
+    for task in ["one1", "one2", "one3", "two1", "three1", "two2"]:
+        scheduler.push(task, [task[:-1] + ".com"])
+    assert helper_pop_all(scheduler) == [
+        "one1",
+        "two1",
+        "three1",
+        "one2",
+        "two2",
+        "one3",
+    ]
+    assert len(scheduler) == 0
+
+
+def test_scheduler_concurrency_limit():
+    scheduler = _DomainScheduler({"one.com": 2}, {})
+    for i in range(4):
+        scheduler.push(f"one{i}", ["one.com"])
+    scheduler.push("two0", ["two.com"])
+    assert helper_pop_all(scheduler) == ["one0", "two0", "one1"]
+
+    scheduler.release(["one.com"])
+    assert helper_pop_all(scheduler) == ["one2"]
+    assert len(scheduler) == 1
+
+
+def test_scheduler_default_concurrency_counts_every_domain():
+    scheduler = _DomainScheduler({"default": 1}, {})
+    scheduler.push("both", ["one.com", "two.com"])
+    scheduler.push("two", ["two.com"])
+    assert helper_pop_all(scheduler) == ["both"]
+    scheduler.release(["one.com", "two.com"])
+    assert helper_pop_all(scheduler) == ["two"]
+
+
+def test_scheduler_rate_limit():
+    scheduler = _DomainScheduler({}, {"one.com": 10})
+    scheduler.push("one0", ["one.com"])
+    scheduler.push("one1", ["one.com"])
+    scheduler.push("two0", ["two.com"])
+    assert helper_pop_all(scheduler) == ["one0", "two0"]
+    assert 0 < scheduler.wait() <= 0.1
+
+    time.sleep(scheduler.wait())
+    assert helper_pop_all(scheduler) == ["one1"]
+    assert scheduler.wait() is None
+
+
+def test_scheduler_push_front():
+    scheduler = _DomainScheduler({}, {})
+    scheduler.push("first", ["one.com"])
+    scheduler.push("retry", ["one.com"], front=True)
+    assert helper_pop_all(scheduler) == ["retry", "first"]
+
+
+def test_scheduler_priority():
+    scheduler = _DomainScheduler({"one.com": 1}, {})
+    scheduler.push("bulk1", ["one.com"])
+    scheduler.push("bulk2", ["two.com"])
+    scheduler.push("urgent1", ["one.com"], priority=5)
+    scheduler.push("urgent2", ["two.com"], priority=5)
+    scheduler.push("low", ["two.com"], priority=-1)
+    # higher levels first, falling through to lower ones held back by a limit
+    assert helper_pop_all(scheduler) == ["urgent1", "urgent2", "bulk2", "low"]
+    scheduler.release(["one.com"])
+    assert helper_pop_all(scheduler) == ["bulk1"]
+
+
+def test_scheduler_priority_aging():
+    scheduler = _DomainScheduler({}, {}, aging=0.01)
+    scheduler.push("bulk", ["one.com"])
+    time.sleep(0.05)
+    for i in range(3):
+        scheduler.push(f"urgent{i}", ["one.com"], priority=2)
+    # passed over long enough to move up past the urgent level
+    assert helper_pop_all(scheduler) == ["bulk", "urgent0", "urgent1", "urgent2"]
+
+
+def test_scheduler_wait_only_for_rates():
+    scheduler = _DomainScheduler({}, {})
+    scheduler.push("one0", ["one.com"])
+    # an item that can start is waiting on a worker, not a rate
+    assert scheduler.wait() is None
+
+
+def test_mail_priority():
+    assert _mailPriority(fakeMailItem()) == 0
+    assert _mailPriority(emailee.MailItem(priority=3)) == 3
+    for bad in ("1", 1.5, True):
+        with pytest.raises(TypeError):
+            _mailPriority(fakeMailItem(priority=bad))
+
+
+# --- AsyncThreads/AsyncMP domain limit tests --- #
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs",
+    [
+        {"domainRate": 1},
+        {"domainRate": {"default": "1"}},
+        {"domainRate": {1: 1}},
+    ],
+)
+def test_domain_rate_invalid_type(bad_kwargs, tmp_path):
+    with pytest.raises(TypeError):
+        emailee.AsyncThreads(
+            [fakeMailItem(["a@one.com"])],
+            {},
+            outputFile=str(tmp_path / "output.txt"),
+            **bad_kwargs,
+        )
+
+
+@pytest.mark.parametrize("bad_data", [{"default": 0}, {"one.com": -1}])
+def test_domain_rate_invalid_value(bad_data, tmp_path):
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            [fakeMailItem(["a@one.com"])],
+            {},
+            outputFile=str(tmp_path / "output.txt"),
+            domainRate=bad_data,
+        )
+
+
+def test_relay_interleaves_domains(tmp_path):
+    mailList = [fakeMailItem([f"user{i}@one.com"]) for i in range(4)]
+    mailList += [fakeMailItem([f"user{i}@two.com"]) for i in range(2)]
+    with SMTPSink() as sink:
+        emailee.AsyncThreads(
+            mailList,
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            maxThreads=1,
+        )
+    assert [message["rcpts"][0] for message in sink.messages] == [
+        "user0@one.com",
+        "user0@two.com",
+        "user1@one.com",
+        "user1@two.com",
+        "user2@one.com",
+        "user3@one.com",
+    ]
+
+
+def test_relay_priority(tmp_path):
+    mailList = [fakeMailItem([f"bulk{i}@one.com"]) for i in range(3)]
+    mailList += [fakeMailItem(["reset@two.com"], priority=10)]
+    mailList += [fakeMailItem(["bad@two.com"], priority="high")]
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            mailList,
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            maxThreads=1,
+        )
+    assert [message["rcpts"][0] for message in sink.messages] == [
+        "reset@two.com",
+        "bulk0@one.com",
+        "bulk1@one.com",
+        "bulk2@one.com",
+    ]
+    [failed] = email.failedReport
+    assert failed["outcome"] == "invalid" and failed["to"] == ["bad@two.com"]
+
+
+def test_relay_urgent_submitted_mid_campaign(tmp_path):
+    sent = []
+
+    class SlowTransport(emailee.NullTransport):
+        def deliver(self, mail, rcpts):
+            time.sleep(0.02)
+            sent.append(rcpts[0])
+            return super().deliver(mail, rcpts)
+
+    campaign = emailee.AsyncThreads(
+        [fakeMailItem([f"bulk{i}@one.com"]) for i in range(200)],
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        maxThreads=2,
+        transport=SlowTransport(),
+        autoRun=False,
+    ).start()
+    while len(sent) < 10:
+        time.sleep(0.01)
+    submitted = len(sent)
+    future = campaign.submit(fakeMailItem(["reset@two.com"], priority=10))
+    future.result(timeout=10)
+    # handed to the next free worker, after only the sends already in progress
+    assert sent.index("reset@two.com") <= submitted + 3
+    campaign.cancel()
+    campaign.wait(timeout=10)
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs, error",
+    [({"priorityAging": "1"}, TypeError), ({"priorityAging": 0}, ValueError)],
+)
+def test_priority_aging_invalid(bad_kwargs, error, tmp_path):
+    with pytest.raises(error):
+        emailee.AsyncThreads(
+            [fakeMailItem()], {}, outputFile=str(tmp_path / "output.txt"), **bad_kwargs
+        )
+
+
+def test_relay_domain_rate(tmp_path):
+    mailList = [fakeMailItem([f"user{i}@one.com"]) for i in range(4)]
+    start = time.monotonic()
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            mailList,
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            domainRate={"one.com": 20},
+        )
+    # three pooled sends started at least 1/20 seconds apart
+    assert time.monotonic() - start >= 0.1
+    assert len(sink.messages) == 4
+    assert len(email.emailReport) == 4
+
+
+def test_relay_domain_concurrency_multiprocessing(tmp_path):
+    mailList = [fakeMailItem([f"user{i}@one.com"]) for i in range(3)]
+    mailList += [fakeMailItem(["a@two.com"], cc=["b@one.com"])]
+    with SMTPSink() as sink:
+        email = emailee.AsyncMP(
+            mailList,
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            maxProcesses=2,
+            domainConcurrency={"default": 1},
+        )
+    assert len(sink.messages) == 4
+    assert len(email.emailReport) == 4
+
+
+def test_mx_domain_rate(tmp_path):
+    mailList = [fakeMailItem([f"user{i}@one.com"]) for i in range(3)]
+    start = time.monotonic()
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            mailList,
+            {"port": sink.port, "timeout": 5},
+            outputFile=str(tmp_path / "output.txt"),
+            deliveryMode="mx",
+            mxResolver=lambda domain: [(10, "127.0.0.1")],
+            domainRate={"default": 20},
+        )
+    assert time.monotonic() - start >= 0.1
+    assert len(email.emailReport) == 3
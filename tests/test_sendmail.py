@@ -0,0 +1,162 @@
+import email
+import json
+import os
+import smtplib
+import sys
+
+import pytest
+
+import emailee
+from emailee.emailee_outcome import _rootCause
+from tests.smtp_sink import fakeMailItem, fakeMailList
+
+STUB = os.path.join(os.path.dirname(__file__), "sendmail_stub.py")
+
+
+@pytest.fixture()
+def record(tmp_path):
+    path = tmp_path / "record"
+    path.mkdir()
+    return str(path)
+
+
+def helper_command(record, *options):
+    return [sys.executable, STUB, "--record", record] + list(options)
+
+
+def helper_runs(record):
+    runs = []
+    for name in os.listdir(record):
+        with open(os.path.join(record, name)) as file:
+            runs.append(json.load(file))
+    return runs
+
+
+def helper_mail(transport, to=["fake.receiver@fakeemail.com"]):
+    mail = emailee.Emailee()
+    mail.sender("fake.sender@fakeemail.com")
+    mail.subject("Sendmail test")
+    mail.msgContent(msgText="Raw text email for testing\n.\nafter a lone dot")
+    mail.sendTo(to, bcc=["fake.bcc@fakeemail.com"])
+    mail.transport(transport)
+    return mail
+
+
+# --- pipe tests --- #
+
+
+def test_sendmail_pipe(record):
+    transport = emailee.SendmailTransport(helper_command(record))
+    assert helper_mail(transport).send()
+    [run] = helper_runs(record)
+    assert run["args"] == [
+        "-i",
+        "-f",
+        "fake.sender@fakeemail.com",
+        "--",
+        "fake.receiver@fakeemail.com",
+        "fake.bcc@fakeemail.com",
+    ]
+    [message] = run["messages"]
+    assert "\r\n" not in message["data"]
+    parsed = email.message_from_string(message["data"])
+    assert parsed["subject"] == "Sendmail test" and parsed["bcc"] is None
+    [text] = [p for p in parsed.walk() if p.get_content_type() == "text/plain"]
+    assert "\n.\nafter a lone dot" in text.get_payload(decode=True).decode()
+
+
+@pytest.mark.parametrize("status, code", [(75, 451), (67, 554)])
+def test_sendmail_exit_status(status, code, record):
+    command = helper_command(record, "--status", str(status))
+    with pytest.raises(ValueError) as error:
+        helper_mail(emailee.SendmailTransport(command)).send()
+    cause = _rootCause(error.value)
+    assert isinstance(cause, smtplib.SMTPDataError) and cause.smtp_code == code
+    assert b"stub failure" in cause.smtp_error
+
+
+def test_sendmail_timeout(record):
+    command = helper_command(record, "--sleep", "5")
+    transport = emailee.SendmailTransport(command, timeout=1)
+    with pytest.raises(ValueError):
+        helper_mail(transport).send()
+
+
+def test_sendmail_missing_binary(tmp_path):
+    transport = emailee.SendmailTransport(str(tmp_path / "sendmail"))
+    with pytest.raises(ValueError):
+        helper_mail(transport).send()
+
+
+# --- batch tests --- #
+
+
+def test_sendmail_batch(record):
+    transport = emailee.SendmailTransport(helper_command(record), batch=True)
+    mail = helper_mail(transport, to=["one@fakeemail.com", "refused@fakeemail.com"])
+    for _ in range(3):
+        assert mail.send()
+    assert mail._refused == {"refused@fakeemail.com": (550, b"No such user")}
+    transport.close()
+    # one sendmail process carried every email
+    [run] = helper_runs(record)
+    assert run["args"] == ["-bs"]
+    assert len(run["messages"]) == 3
+    assert run["messages"][0]["rcpts"] == [
+        "one@fakeemail.com",
+        "fake.bcc@fakeemail.com",
+    ]
+
+
+def test_async_threads_sendmail_batch(record, tmp_path):
+    mailList = fakeMailList(20) + [fakeMailItem(["refused@fakeemail.com"])]
+    emails = emailee.AsyncThreads(
+        mailList,
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        maxThreads=4,
+        transport=emailee.SendmailTransport(
+            helper_command(record), batch=True, maxProcesses=2
+        ),
+    )
+    assert len(emails.emailReport) == 20
+    [failed] = emails.failedReport
+    assert failed["outcome"] == "permanent"
+    runs = helper_runs(record)
+    assert sum(len(run["messages"]) for run in runs) == 20
+    assert len(runs) < 20
+
+
+def test_async_threads_sendmail_max_processes(record, tmp_path):
+    command = helper_command(record, "--sleep", "0.2")
+    emails = emailee.AsyncThreads(
+        fakeMailList(6),
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        maxThreads=6,
+        transport=emailee.SendmailTransport(command, maxProcesses=2),
+    )
+    assert len(emails.emailReport) == 6
+    runs = helper_runs(record)
+    assert len(runs) == 6
+    for run in runs:
+        running = [o for o in runs if o["started"] <= run["started"] < o["ended"]]
+        assert len(running) <= 2
+
+
+@pytest.mark.parametrize(
+    "kwargs, error",
+    [
+        ({"command": ""}, ValueError),
+        ({"command": []}, ValueError),
+        ({"command": 1}, TypeError),
+        ({"command": ["sendmail", 1]}, TypeError),
+        ({"batch": "yes"}, TypeError),
+        ({"maxProcesses": 0}, ValueError),
+        ({"maxProcesses": 1.5}, TypeError),
+        ({"timeout": 0}, ValueError),
+    ],
+)
+def test_sendmail_invalid(kwargs, error):
+    with pytest.raises(error):
+        emailee.SendmailTransport(**kwargs)
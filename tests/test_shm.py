@@ -0,0 +1,266 @@
+import email
+import pickle
+from pathlib import Path
+
+import pytest
+
+import emailee
+from emailee.emailee_shm import _SharedBodies, _SharedReader, _SharedRef, shared_memory
+from tests.smtp_sink import SMTPSink, fakeMailItem, sinkServer
+
+pytestmark = pytest.mark.skipif(
+    shared_memory is None, reason="shared memory needs Python 3.8+"
+)
+
+ATTACHMENTS = Path(__file__).parent / "test_attachments"
+LARGE_HTML = (
+    "<html><body>"
+    + "<p>Campaign email for testing emailee</p>" * 200
+    + "</body></html>"
+)
+
+
+def helper_mail_item(**kwargs):
+    # a mail item with an HTML body large enough to be shared
+    return fakeMailItem(**dict({"msgHTML": LARGE_HTML}, **kwargs))
+
+
+def helper_parse_message(data):
+    # the HTML body and first attachment of a sent message
+    message = email.message_from_bytes(data)
+    html = [
+        part.get_payload(decode=True).decode()
+        for part in message.walk()
+        if part.get_content_type() == "text/html"
+    ]
+    attachment = [
+        part.get_payload(decode=True)
+        for part in message.walk()
+        if part.get_filename() or part.get("Content-Disposition")
+    ]
+    return html[0], attachment[0]
+
+
+def helper_shm_blocks():
+    # POSIX shared memory blocks created by multiprocessing.shared_memory
+    shm = Path("/dev/shm")
+    return {path.name for path in shm.glob("psm_*")} if shm.is_dir() else set()
+
+
+# --- shared bodies tests --- #
+
+
+def test_intern_shares_identical_bodies():
+    shared = _SharedBodies()
+    try:
+        tasks = [
+            shared.intern(helper_mail_item(to=[f"r{i}@fakeemail.com"]))
+            for i in range(3)
+        ]
+        # the body is only shared once it's used again
+        assert tasks[0]["msgHTML"] == LARGE_HTML
+        assert all(isinstance(task["msgHTML"], _SharedRef) for task in tasks[1:])
+        assert len({task["msgHTML"].name for task in tasks[1:]}) == 1
+        assert len(shared._blocks) == 1
+        # small bodies are cheaper to copy than to share
+        assert tasks[1]["msgText"] == "Raw text email for testing emailee"
+        assert len(pickle.dumps(tasks[1])) < len(LARGE_HTML) / 10
+    finally:
+        shared.close()
+
+
+def test_intern_leaves_unique_bodies():
+    shared = _SharedBodies()
+    try:
+        for i in range(3):
+            task = shared.intern(helper_mail_item(msgHTML=f"{i}{LARGE_HTML}"))
+            assert task["msgHTML"] == f"{i}{LARGE_HTML}"
+        assert shared._blocks == {}
+    finally:
+        shared.close()
+
+
+def test_release_keeps_blocks_for_reuse():
+    shared = _SharedBodies()
+    try:
+        tasks = [shared.intern(helper_mail_item()) for _ in range(2)]
+        ref = tasks[1]["msgHTML"]
+        for task in tasks:
+            shared.release(task)
+        # no task uses the block, it's kept for the next with the same body
+        shared_memory.SharedMemory(name=ref.name).close()
+        assert shared.intern(helper_mail_item())["msgHTML"].name == ref.name
+        assert len(shared._blocks) == 1
+    finally:
+        shared.close()
+
+
+def test_release_unlinks_least_recently_used_blocks():
+    shared = _SharedBodies(maxIdleSize=len(LARGE_HTML) + 100)
+    try:
+        refs = []
+        for i in range(2):
+            body = f"{i}{LARGE_HTML}"
+            shared.intern(helper_mail_item(msgHTML=body))
+            task = shared.intern(helper_mail_item(msgHTML=body))
+            refs.append(task["msgHTML"])
+            shared.release(task)
+        # over maxIdleSize, the first released is unlinked
+        assert list(shared._blocks) == [refs[1].name]
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=refs[0].name)
+        # used again after being unlinked, it's shared in a new block
+        task = shared.intern(helper_mail_item(msgHTML=f"0{LARGE_HTML}"))
+        assert isinstance(task["msgHTML"], _SharedRef)
+        assert task["msgHTML"].name != refs[0].name
+    finally:
+        shared.close()
+
+
+def test_reader_resolves_bodies_and_attachments():
+    shared = _SharedBodies()
+    reader = _SharedReader()
+    attachment = str(ATTACHMENTS / "sine_wave.wav")
+    mailItem = helper_mail_item(
+        attachmentFiles=[attachment, str(ATTACHMENTS / "test.txt")]
+    )
+    try:
+        shared.intern(mailItem)
+        task = shared.intern(mailItem)
+        # test.txt is under the minimum size and is read by the worker as usual
+        assert list(task["_attachmentData"]) == [attachment]
+
+        resolved = reader.resolve(pickle.loads(pickle.dumps(task)))
+        assert "_shared" not in resolved
+        assert resolved["msgHTML"] == LARGE_HTML
+        assert resolved["_attachmentData"][attachment] == Path(attachment).read_bytes()
+    finally:
+        reader.close()
+        shared.close()
+
+
+def test_reader_cache_limited():
+    shared = _SharedBodies()
+    reader = _SharedReader(cacheSize=2)
+    try:
+        bodies = [f"{i}{LARGE_HTML}" for i in range(4)]
+        for body in bodies:
+            shared.intern(helper_mail_item(msgHTML=body))
+        for body in bodies:
+            task = shared.intern(helper_mail_item(msgHTML=body))
+            assert reader.resolve(task)["msgHTML"] == body
+        assert len(reader._values) == 2
+    finally:
+        reader.close()
+        shared.close()
+
+
+def test_reader_leaves_plain_items():
+    reader = _SharedReader()
+    mailItem = helper_mail_item()
+    assert reader.resolve(mailItem) is mailItem
+    mailItem = emailee.MailItem(sender="fake.sender@fakeemail.com")
+    assert reader.resolve(mailItem) is mailItem
+
+
+def test_close_unlinks_blocks():
+    shared = _SharedBodies()
+    shared.intern(helper_mail_item())
+    ref = shared.intern(helper_mail_item())["msgHTML"]
+    shared.close()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=ref.name)
+
+
+def test_generate_with_attachment_data():
+    attachments = [str(ATTACHMENTS / "test.txt"), str(ATTACHMENTS / "test.pdf")]
+    parts = []
+    for attachmentData in ({}, {path: Path(path).read_bytes() for path in attachments}):
+        mail = emailee.Emailee()
+        mail.sender("fake.sender@fakeemail.com")
+        mail.sendTo(["fake.receiver@fakeemail.com"])
+        mail.attachmentFiles(attachments)
+        mail._attachmentData = attachmentData
+        message = email.message_from_string(mail._generate())
+        parts.append([part.get_payload() for part in message.get_payload()[1:]])
+    assert parts[0] == parts[1]
+
+
+# --- AsyncMP shared memory tests --- #
+
+
+def test_send_shared_bodies_multiprocessing(tmp_path):
+    blocksBefore = helper_shm_blocks()
+    attachment = str(ATTACHMENTS / "test_spreadsheet.xlsx")
+    mailList = [
+        helper_mail_item(subject=f"Shared {i}", attachmentFiles=[attachment])
+        for i in range(4)
+    ]
+    with SMTPSink() as sink:
+        emails = emailee.AsyncMP(
+            mailList,
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            maxProcesses=2,
+        )
+    assert len(emails.emailReport) == 4
+    assert len(sink.messages) == 4
+    for message in sink.messages:
+        parsed = helper_parse_message(message["data"])
+        assert LARGE_HTML in parsed[0]
+        assert parsed[1] == Path(attachment).read_bytes()
+    # every block is unlinked once the run is over
+    assert helper_shm_blocks() == blocksBefore
+
+
+@pytest.mark.parametrize("deliveryMode", ["relay", "mx"])
+def test_send_many_unique_bodies_multiprocessing(deliveryMode, tmp_path):
+    # unique bodies aren't put in shared memory, and shared blocks are
+    #  released as their mail is sent rather than held until the end
+    blocksBefore = helper_shm_blocks()
+    mailList = [
+        helper_mail_item(to=[f"r{i}@fakeemail.com"], msgHTML=f"{i}{LARGE_HTML}")
+        for i in range(300)
+    ]
+    mailList += [helper_mail_item(to=[f"s{i}@fakeemail.com"]) for i in range(20)]
+    peak = []
+    with SMTPSink() as sink:
+        emails = emailee.AsyncMP(
+            mailList,
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            maxProcesses=2,
+            deliveryMode=deliveryMode,
+            mxResolver=lambda domain: [(10, "127.0.0.1")],
+            onResult=lambda result: peak.append(
+                len(helper_shm_blocks() - blocksBefore)
+            ),
+        )
+    assert len(emails.emailReport) == 320
+    assert len(sink.messages) == 320
+    assert max(peak) <= 1
+    assert helper_shm_blocks() == blocksBefore
+
+
+def test_send_shared_body_one_process_reuses_block(tmp_path, monkeypatch):
+    # each task is released before the next is dispatched, the block is
+    #  still created once rather than once per task
+    stored = []
+    store = _SharedBodies._store
+
+    def countingStore(self, data, key, isFile):
+        stored.append(key)
+        return store(self, data, key, isFile)
+
+    monkeypatch.setattr(_SharedBodies, "_store", countingStore)
+    blocksBefore = helper_shm_blocks()
+    emails = emailee.AsyncMP(
+        [helper_mail_item(to=[f"r{i}@fakeemail.com"]) for i in range(10)],
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        maxProcesses=1,
+        transport=emailee.NullTransport(),
+    )
+    assert len(emails.emailReport) == 10
+    assert stored == [LARGE_HTML]
+    assert helper_shm_blocks() == blocksBefore
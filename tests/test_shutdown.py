@@ -0,0 +1,291 @@
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+import emailee
+from emailee.emailee_shutdown import _SigtermDrain, _writeRemainder
+from tests.smtp_sink import SMTPSink, fakeMailItem, fakeMailList, sinkServer
+
+
+class BlackholeServer:
+    """
+    Listening socket that never answers, connections are accepted by the
+    kernel but no SMTP greeting is sent, so sends hang until they time out
+    """
+
+    def __enter__(self) -> "BlackholeServer":
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(16)
+        self.port = self._sock.getsockname()[1]
+        return self
+
+    def __exit__(self, *args):
+        self._sock.close()
+
+
+class StallTransport(emailee.NullTransport):
+    # a delivery that stalls, standing in for a server stuck on MAIL
+    def deliver(self, mail, rcpts):
+        time.sleep(15)
+        return super().deliver(mail, rcpts)
+
+
+def helper_sender(mailList, serverDict, tmp_path, senderClass=None, **kwargs):
+    return (senderClass or emailee.AsyncThreads)(
+        mailList,
+        serverDict,
+        outputFile=str(tmp_path / "output.txt"),
+        remainderFile=str(tmp_path / "remainder.jsonl"),
+        autoRun=False,
+        **kwargs,
+    )
+
+
+# --- remainder file tests --- #
+
+
+def test_remainder_round_trip(tmp_path):
+    path = str(tmp_path / "remainder.jsonl")
+    mailList = [fakeMailItem(), emailee.MailItem(**fakeMailItem(subject="typed"))]
+    _writeRemainder(path, mailList)
+    assert emailee.readRemainder(path) == [
+        fakeMailItem(),
+        emailee.MailItem(**fakeMailItem(subject="typed")).asDict(),
+    ]
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_read_remainder_invalid_type():
+    with pytest.raises(TypeError):
+        emailee.readRemainder(1)
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs, error",
+    [
+        ({"remainderFile": 1}, TypeError),
+        ({"drainTimeout": "1"}, TypeError),
+        ({"drainTimeout": -1}, ValueError),
+        ({"handleSigterm": 1}, TypeError),
+    ],
+)
+def test_shutdown_invalid_options(bad_kwargs, error, tmp_path):
+    with pytest.raises(error):
+        emailee.AsyncThreads(
+            fakeMailList(1), {}, outputFile=str(tmp_path / "output.txt"), **bad_kwargs
+        )
+
+
+# --- shutdown tests --- #
+
+
+def test_send_quits_connection():
+    with SMTPSink() as sink:
+        mail = emailee.Emailee()
+        mail.sender("fake.sender@fakeemail.com")
+        mail.sendTo(["fake.receiver@fakeemail.com"])
+        mail.server("127.0.0.1", port=sink.port, timeout=5)
+        assert mail.send()
+    assert sink.commands[-1].upper() == "QUIT"
+
+
+def test_shutdown_persists_remainder(tmp_path):
+    mailList = fakeMailList(5)
+    senders = []
+    with SMTPSink() as sink:
+        sender = helper_sender(
+            mailList,
+            sinkServer(sink.port),
+            tmp_path,
+            maxThreads=1,
+            onResult=lambda result: senders[0].shutdown(),
+        )
+        senders.append(sender)
+        sender.run()
+        # the remainder is picked up by the next run, nothing sent twice
+        emailee.AsyncThreads(
+            emailee.readRemainder(str(tmp_path / "remainder.jsonl")),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output2.txt"),
+        )
+    assert [i["index"] for i in sender.unsentReport] == [1, 2, 3, 4]
+    assert not any(i["inProgress"] for i in sender.unsentReport)
+    assert sorted(message["rcpts"][0] for message in sink.messages) == sorted(
+        mailItem["to"][0] for mailItem in mailList
+    )
+
+
+def test_remainder_empty_when_all_sent(tmp_path):
+    with SMTPSink() as sink:
+        sender = helper_sender(fakeMailList(3), sinkServer(sink.port), tmp_path)
+        sender.run()
+    assert sender.unsentReport == []
+    assert emailee.readRemainder(str(tmp_path / "remainder.jsonl")) == []
+
+
+def test_campaign_shutdown_keeps_submitted(tmp_path):
+    with SMTPSink() as sink:
+        sender = helper_sender([], sinkServer(sink.port), tmp_path)
+        campaign = sender.start(keepOpen=True)
+        campaign.submit(fakeMailList(1)[0]).result(timeout=10)
+        campaign.shutdown()
+        assert campaign.wait(timeout=10)
+    with pytest.raises(RuntimeError):
+        campaign.submit(fakeMailList(1, first=1)[0])
+    assert sender.unsentReport == []
+    assert campaign.progress()["sent"] == 1
+
+
+def test_mx_stops_between_messages(tmp_path):
+    senders = []
+    with SMTPSink() as sink:
+        sender = helper_sender(
+            fakeMailList(4),
+            {"port": sink.port, "timeout": 5},
+            tmp_path,
+            waitTime=0.5,
+            deliveryMode="mx",
+            mxResolver=lambda domain: [(10, "127.0.0.1")],
+            onResult=lambda result: senders[0].shutdown(),
+        )
+        senders.append(sender)
+        start = time.monotonic()
+        sender.run()
+    # the job's wait between messages is cut short
+    assert time.monotonic() - start < 2
+    assert len(sink.messages) == 1
+    assert sink.commands[-1].upper() == "QUIT"
+    assert [i["index"] for i in sender.unsentReport] == [1, 2, 3]
+    assert len(emailee.readRemainder(str(tmp_path / "remainder.jsonl"))) == 3
+
+
+@pytest.mark.parametrize("senderClass", [emailee.AsyncThreads, emailee.AsyncMP])
+def test_drain_timeout(senderClass, tmp_path):
+    with BlackholeServer() as blackhole:
+        sender = helper_sender(
+            fakeMailList(2),
+            {"port": blackhole.port, "timeout": 3},
+            tmp_path,
+            senderClass=senderClass,
+            deliveryMode="mx",
+            mxResolver=lambda domain: [(10, "127.0.0.1")],
+            drainTimeout=0.2,
+        )
+        campaign = sender.start()
+        time.sleep(0.5)
+        start = time.monotonic()
+        campaign.shutdown()
+        assert campaign.wait(timeout=10)
+        assert time.monotonic() - start < 2
+    assert [(i["index"], i["inProgress"]) for i in sender.unsentReport] == [
+        (0, True),
+        (1, True),
+    ]
+    with pytest.raises(TimeoutError):
+        campaign.futures[0].result()
+
+
+# --- SIGTERM tests --- #
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs POSIX signals")
+def test_sigterm_drains(tmp_path):
+    previous = signal.getsignal(signal.SIGTERM)
+    results = []
+
+    def onResult(result):
+        results.append(result)
+        if len(results) == 1:
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    with SMTPSink() as sink:
+        sender = helper_sender(
+            fakeMailList(6),
+            sinkServer(sink.port),
+            tmp_path,
+            maxThreads=1,
+            waitTime=0.2,
+            handleSigterm=True,
+            onResult=onResult,
+        )
+        sender.run()
+    assert signal.getsignal(signal.SIGTERM) == previous
+    assert sender.unsentReport
+    assert len(sender.emailReport) + len(sender.unsentReport) == 6
+    assert len(sink.messages) == len(sender.emailReport)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs POSIX signals")
+def test_sigterm_drain_timeout_stops_processes(tmp_path):
+    # worker processes don't inherit the drain handler, so the stalled send
+    #  is stopped once drainTimeout runs out rather than waited for
+    timer = threading.Timer(1, os.kill, (os.getpid(), signal.SIGTERM))
+    started = time.monotonic()
+    timer.start()
+    try:
+        sender = helper_sender(
+            [fakeMailItem()],
+            {},
+            tmp_path,
+            senderClass=emailee.AsyncMP,
+            maxProcesses=1,
+            transport=StallTransport(),
+            handleSigterm=True,
+            drainTimeout=1,
+        )
+        sender.run()
+    finally:
+        timer.cancel()
+    assert time.monotonic() - started < 8
+    assert len(sender.unsentReport) == 1 and sender.emailReport == []
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs POSIX signals")
+def test_sigterm_handler_passed_on_after_restore():
+    received = []
+    shutdowns = []
+    previous = signal.signal(signal.SIGTERM, lambda *args: received.append(args[0]))
+    try:
+        drain = _SigtermDrain(lambda: shutdowns.append(True))
+        # restored from another thread, as when a campaign finishes
+        restorer = threading.Thread(target=drain.restore)
+        restorer.start()
+        restorer.join()
+        os.kill(os.getpid(), signal.SIGTERM)
+        time.sleep(0.1)
+        assert received == [signal.SIGTERM]
+        assert shutdowns == []
+        assert signal.getsignal(signal.SIGTERM) != drain._handle
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+
+def test_mx_shutdown_keeps_undelivered_domains(tmp_path):
+    senders = []
+    with SMTPSink() as sink:
+        sender = helper_sender(
+            [fakeMailItem(["a@one.com", "b@two.com"])],
+            {"port": sink.port, "timeout": 5},
+            tmp_path,
+            maxThreads=1,
+            deliveryMode="mx",
+            mxResolver=lambda domain: [(10, "127.0.0.1")],
+            onResult=lambda result: senders[0].shutdown(),
+        )
+        senders.append(sender)
+        campaign = sender.start()
+        assert campaign.wait(timeout=10)
+    # only the domain that wasn't delivered to is left to send
+    [sent] = [message["rcpts"] for message in sink.messages]
+    [remainder] = emailee.readRemainder(str(tmp_path / "remainder.jsonl"))
+    assert sorted(sent + remainder["to"]) == ["a@one.com", "b@two.com"]
+    assert [i["index"] for i in sender.unsentReport] == [0]
+    with pytest.raises(CancelledError):
+        campaign.futures[0].result()
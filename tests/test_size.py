@@ -0,0 +1,122 @@
+import email
+import os
+from pathlib import Path
+
+import pytest
+
+import emailee
+from emailee.emailee_connect import _wireBytes
+from tests.smtp_sink import SMTPSink, fakeMailItem, sinkServer
+
+KITTEN = str(Path(__file__).parent / "test_attachments" / "kitten_pic.jpg")
+
+
+@pytest.fixture()
+def blobs(tmp_path):
+    # two 30KB binary attachments, about 41KB each once base64 encoded
+    paths = []
+    for name in ("first.bin", "second.bin"):
+        path = tmp_path / name
+        path.write_bytes(os.urandom(30000))
+        paths.append(str(path))
+    return paths
+
+
+def helper_mail(attachments, subject="Size test", splitOversized=False, port=0):
+    mail = emailee.Emailee()
+    mail.sender("fake.sender@fakeemail.com")
+    mail.subject(subject)
+    mail.msgContent(msgText="Raw text\n" * 50, msgHTML="<p>Grüße</p>\n" * 50)
+    mail.sendTo(["fake.receiver@fakeemail.com"])
+    mail.attachmentFiles(attachments, splitOversized=splitOversized)
+    mail.server("127.0.0.1", port=port, timeout=5)
+    return mail
+
+
+def helper_mail_commands(sink):
+    return [c for c in sink.commands if c.upper().startswith("MAIL")]
+
+
+# --- size estimate tests --- #
+
+
+@pytest.mark.parametrize("eightBit", [True, False])
+def test_estimate_size(eightBit, tmp_path):
+    text = tmp_path / "notes.txt"
+    text.write_text("Grüße aus Köln\n" * 2000)
+    attachments = [KITTEN, str(text)]
+    mail = helper_mail(attachments)
+    estimate = mail._estimateSize(attachments, eightBit)
+    message = mail._message()
+    if not eightBit:
+        from emailee.emailee_encoding import _downgrade8bit
+
+        _downgrade8bit(message)
+    actual = len(_wireBytes(message))
+    assert actual <= estimate <= actual * 1.03 + 1000
+
+
+def test_attachment_files_split_invalid_type():
+    with pytest.raises(TypeError):
+        emailee.Emailee().attachmentFiles([], splitOversized=1)
+
+
+# --- SIZE limit tests --- #
+
+
+def test_oversized_fails_before_sending(blobs):
+    with SMTPSink(extensions=["SIZE 50000"]) as sink:
+        mail = helper_mail(blobs, port=sink.port)
+        with pytest.raises(ValueError, match="over the server's SIZE limit of 50000"):
+            mail.send()
+    assert helper_mail_commands(sink) == []
+    assert sink.messages == []
+
+
+@pytest.mark.parametrize("extensions", [["SIZE 100000"], ["SIZE 100000", "CHUNKING"]])
+def test_size_declared_on_mail_from(extensions, blobs):
+    with SMTPSink(extensions=extensions) as sink:
+        mail = helper_mail(blobs[:1], port=sink.port)
+        assert mail.send()
+    [command] = helper_mail_commands(sink)
+    declared = int(command.lower().split("size=")[1].split()[0])
+    actual = len(sink.messages[0]["data"])
+    assert actual <= declared <= actual * 1.03 + 1000
+
+
+def test_oversized_split_across_emails(blobs):
+    with SMTPSink(extensions=["SIZE 50000"]) as sink:
+        mail = helper_mail(blobs, splitOversized=True, port=sink.port)
+        assert mail.send()
+    assert mail._messageCount == 2
+    parts = [email.message_from_bytes(m["data"]) for m in sink.messages]
+    assert [part["subject"] for part in parts] == ["Size test (1/2)", "Size test (2/2)"]
+    assert [
+        [p.get_filename() for p in part.walk() if p.get_filename()] for part in parts
+    ] == [["first"], ["second"]]
+    assert all(len(m["data"]) <= 50000 for m in sink.messages)
+
+
+def test_split_attachment_too_large(blobs):
+    with SMTPSink(extensions=["SIZE 30000"]) as sink:
+        mail = helper_mail(blobs, splitOversized=True, port=sink.port)
+        with pytest.raises(ValueError, match="Attachment is too large"):
+            mail.send()
+    assert sink.messages == []
+
+
+def test_async_size_outcomes(blobs, tmp_path):
+    mailList = [
+        fakeMailItem(attachmentFiles=blobs, subject="refused"),
+        fakeMailItem(attachmentFiles=blobs, subject="split", splitOversized=True),
+        fakeMailItem(attachmentFiles=blobs[:1], subject="fits"),
+    ]
+    with SMTPSink(extensions=["SIZE 50000"]) as sink:
+        emails = emailee.AsyncThreads(
+            mailList, sinkServer(sink.port), outputFile=str(tmp_path / "output.txt")
+        )
+    assert len(sink.messages) == 3
+    [failed] = emails.failedReport
+    assert failed["subject"] == "refused" and failed["outcome"] == "invalid"
+    parts = {report["subject"]: report.get("parts") for report in emails.emailReport}
+    assert parts == {"split": 2, "fits": None}
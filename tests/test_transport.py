@@ -0,0 +1,172 @@
+import email
+import mailbox
+import os
+import pickle
+
+import pytest
+
+import emailee
+from tests.smtp_sink import SMTPSink, fakeMailItem, fakeMailList
+
+LATIN_HTML = "<p>Grüße aus Köln, wir freuen uns auf Ihren Besuch.</p>\n" * 20
+
+
+def helper_mail(transport=None, **content):
+    mail = emailee.Emailee()
+    mail.sender("fake.sender@fakeemail.com")
+    mail.subject("Transport test")
+    mail.msgContent(**(content or {"msgText": "Raw text email for testing"}))
+    mail.sendTo(["fake.receiver@fakeemail.com"], bcc=["fake.bcc@fakeemail.com"])
+    if transport is not None:
+        mail.transport(transport)
+    return mail
+
+
+# --- Emailee transport tests --- #
+
+
+def test_memory_transport():
+    transport = emailee.MemoryTransport()
+    mail = helper_mail(transport, msgHTML=LATIN_HTML)
+    assert mail.ready()
+    assert mail.send()
+    [captured] = transport.messages
+    assert captured["sender"] == "fake.sender@fakeemail.com"
+    assert captured["rcpts"] == [
+        "fake.receiver@fakeemail.com",
+        "fake.bcc@fakeemail.com",
+    ]
+    message = email.message_from_bytes(captured["data"])
+    assert message["subject"] == "Transport test" and message["bcc"] is None
+    assert b"\r\n" in captured["data"]
+    assert mail._refused == {} and mail._wireSaved > 0
+    transport.clear()
+    assert transport.messages == []
+
+
+def test_null_transport(tmp_path):
+    transport = emailee.NullTransport()
+    mail = helper_mail(transport)
+    for _ in range(3):
+        assert mail.send(str(tmp_path / "output.txt"))
+    memory = emailee.MemoryTransport()
+    helper_mail(memory).send()
+    assert transport.messages == 3
+    # dates can differ in length by a character across days
+    assert abs(transport.bytes / 3 - len(memory.messages[0]["data"])) < 200
+    assert len((tmp_path / "output.txt").read_text().splitlines()) == 3
+
+
+def test_file_transport_mbox(tmp_path):
+    path = str(tmp_path / "mail" / "sent.mbox")
+    transport = emailee.FileTransport(path)
+    for _ in range(2):
+        helper_mail(transport, msgText="From the start\n").send()
+    messages = list(mailbox.mbox(path))
+    assert [message["subject"] for message in messages] == ["Transport test"] * 2
+    [text] = [p for p in messages[0].walk() if p.get_content_type() == "text/plain"]
+    assert text.get_payload(decode=True) == b">From the start\n"
+
+
+def test_file_transport_maildir(tmp_path):
+    path = str(tmp_path / "Maildir")
+    transport = emailee.FileTransport(path, fileFormat="maildir")
+    for _ in range(2):
+        helper_mail(transport).send()
+    assert os.listdir(os.path.join(path, "tmp")) == []
+    messages = list(mailbox.Maildir(path))
+    assert [message["subject"] for message in messages] == ["Transport test"] * 2
+
+
+def test_smtp_transport_is_default():
+    with SMTPSink() as sink:
+        mail = helper_mail()
+        mail.server(sink.host, port=sink.port, timeout=5)
+        assert mail.send()
+        mail.transport(emailee.SMTPTransport())
+        assert mail.send()
+    assert len(sink.messages) == 2
+
+
+def test_transport_invalid():
+    with pytest.raises(TypeError):
+        emailee.Emailee().transport("memory")
+    with pytest.raises(TypeError):
+        emailee.FileTransport(1)
+    with pytest.raises(ValueError):
+        emailee.FileTransport("sent.mbox", fileFormat="mh")
+    # deliver() must be implemented, checked when the transport is made
+    with pytest.raises(TypeError):
+        emailee.Transport()
+
+    class NoDeliver(emailee.Transport):
+        pass
+
+    with pytest.raises(TypeError):
+        NoDeliver()
+
+
+def test_transport_pickles_without_lock():
+    transport = pickle.loads(pickle.dumps(emailee.NullTransport()))
+    helper_mail(transport).send()
+    assert transport.messages == 1
+
+
+# --- async transport tests --- #
+
+
+def test_async_threads_memory_transport(tmp_path):
+    transport = emailee.MemoryTransport()
+    mailList = fakeMailList(20) + [fakeMailItem(attachmentFiles=["missing.txt"])]
+    emails = emailee.AsyncThreads(
+        mailList, {}, outputFile=str(tmp_path / "output.txt"), transport=transport
+    )
+    assert len(emails.emailReport) == 20 and len(transport.messages) == 20
+    assert all(report["outcome"] == "sent" for report in emails.emailReport)
+    [failed] = emails.failedReport
+    assert failed["outcome"] == "invalid"
+    assert sorted(m["rcpts"][0] for m in transport.messages) == sorted(
+        item["to"][0] for item in mailList[:20]
+    )
+
+
+def test_async_mp_maildir_transport(tmp_path):
+    path = str(tmp_path / "Maildir")
+    emails = emailee.AsyncMP(
+        fakeMailList(6),
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        maxProcesses=2,
+        transport=emailee.FileTransport(path, fileFormat="maildir"),
+    )
+    assert len(emails.emailReport) == 6
+    assert len(list(mailbox.Maildir(path))) == 6
+
+
+@pytest.mark.parametrize("fileTransport", [False, True])
+def test_async_mp_rejects_in_process_transports(fileTransport, tmp_path):
+    transport = emailee.MemoryTransport()
+    if fileTransport:
+        transport = emailee.FileTransport(str(tmp_path / "sent.mbox"))
+    with pytest.raises(ValueError, match="can't be used across processes"):
+        emailee.AsyncMP(
+            [fakeMailItem()],
+            {},
+            outputFile=str(tmp_path / "o.txt"),
+            transport=transport,
+        )
+
+
+def test_async_transport_invalid(tmp_path):
+    with pytest.raises(TypeError):
+        emailee.AsyncThreads(
+            [fakeMailItem()], {}, outputFile=str(tmp_path / "o.txt"), transport="null"
+        )
+    with pytest.raises(ValueError):
+        emailee.AsyncThreads(
+            [fakeMailItem()],
+            {},
+            outputFile=str(tmp_path / "o.txt"),
+            deliveryMode="mx",
+            transport=emailee.NullTransport(),
+        )
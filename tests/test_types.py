@@ -0,0 +1,186 @@
+import pickle
+
+import pytest
+
+import emailee
+from tests.smtp_sink import SMTPSink, fakeMailItem
+
+
+def helper_mail_item(**kwargs):
+    return emailee.MailItem(**fakeMailItem(**kwargs))
+
+
+# --- MailItem/ServerConfig tests --- #
+
+
+def test_mail_item_defaults():
+    mailItem = emailee.MailItem("fake.sender@fakeemail.com")
+    assert mailItem.asDict() == {
+        "sender": "fake.sender@fakeemail.com",
+        "replyTo": "",
+        "subject": "",
+        "msgText": "",
+        "msgHTML": "",
+        "to": [],
+        "cc": [],
+        "bcc": [],
+        "ignoreErrors": False,
+        "attachmentFiles": [],
+        "splitOversized": False,
+        "priority": 0,
+    }
+
+
+def test_mail_item_dict_access():
+    mailItem = helper_mail_item(cc=["fake.cc@fakeemail.com"])
+    assert mailItem["cc"] == ["fake.cc@fakeemail.com"]
+    assert mailItem.get("msgHTML", "unused") == ""
+    assert mailItem.get("unknown", "default") == "default"
+    with pytest.raises(KeyError):
+        mailItem["unknown"]
+
+
+def test_mail_item_from_dict():
+    values = {"sender": "fake.sender@fakeemail.com", "to": ["a@fakeemail.com"]}
+    assert emailee.MailItem.fromDict(values) == emailee.MailItem(**values)
+    with pytest.raises(ValueError):
+        emailee.MailItem.fromDict({"sender": "fake.sender@fakeemail.com", "too": []})
+
+
+def test_mail_item_is_slotted_and_read_only():
+    mailItem = helper_mail_item()
+    assert not hasattr(mailItem, "__dict__")
+    with pytest.raises(AttributeError):
+        mailItem.subject = "changed"
+    with pytest.raises(AttributeError):
+        mailItem.extra = True
+
+
+def test_mail_item_copies_lists():
+    to = ["fake.receiver@fakeemail.com"]
+    attachmentFiles = ["file.txt"]
+    mailItem = emailee.MailItem(to=to, attachmentFiles=attachmentFiles)
+    to.append(1)
+    attachmentFiles.clear()
+    assert mailItem.to == ["fake.receiver@fakeemail.com"]
+    assert mailItem.attachmentFiles == ["file.txt"]
+
+
+def test_mail_item_pickle():
+    mailItem = helper_mail_item(bcc=["fake.bcc@fakeemail.com"], ignoreErrors=True)
+    pickled = pickle.dumps(mailItem)
+    assert pickle.loads(pickled) == mailItem
+    # stored as a tuple of values, not repeating the key names like a dict
+    assert len(pickled) < len(pickle.dumps(mailItem.asDict()))
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs",
+    [
+        {"sender": None},
+        {"subject": 1},
+        {"to": "fake.receiver@fakeemail.com"},
+        {"cc": [1]},
+        {"ignoreErrors": "True"},
+        {"attachmentFiles": ("file.txt",)},
+        {"priority": "1"},
+    ],
+)
+def test_mail_item_invalid_type(bad_kwargs):
+    with pytest.raises(TypeError):
+        helper_mail_item(**bad_kwargs)
+
+
+def test_server_config_defaults():
+    server = emailee.ServerConfig("smtp.fakeemail.com")
+    assert server["port"] == 0 and server["SSLTLS"] == "" and server["timeout"] == 30
+    assert server.get("weight") == 1
+    assert pickle.loads(pickle.dumps(server)) == server
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs",
+    [
+        {"port": "25"},
+        {"timeout": 1.5},
+        {"SSLTLS": None},
+        {"weight": True},
+        {"chunkSize": "1"},
+    ],
+)
+def test_server_config_invalid_type(bad_kwargs):
+    with pytest.raises(TypeError):
+        emailee.ServerConfig("smtp.fakeemail.com", **bad_kwargs)
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs",
+    [
+        {"port": 70000},
+        {"timeout": 0},
+        {"SSLTLS": "STARTTLS"},
+        {"weight": 0},
+        {"chunkSize": -1},
+    ],
+)
+def test_server_config_invalid_value(bad_kwargs):
+    with pytest.raises(ValueError):
+        emailee.ServerConfig("smtp.fakeemail.com", **bad_kwargs)
+
+
+def test_emailee_is_slotted():
+    assert not hasattr(emailee.Emailee(), "__dict__")
+
+
+# --- AsyncThreads/AsyncMP with MailItem/ServerConfig tests --- #
+
+
+@pytest.mark.parametrize("chunkSize, error", [(True, TypeError), (-1, ValueError)])
+def test_server_dict_chunk_size_invalid(chunkSize, error, tmp_path):
+    with pytest.raises(error):
+        emailee.AsyncThreads(
+            [fakeMailItem()],
+            [{"smtpServer": "smtp.fakeemail.com", "chunkSize": chunkSize}],
+            outputFile=str(tmp_path / "output.txt"),
+        )
+
+
+def test_send_mail_items_threaded(tmp_path):
+    mailList = [helper_mail_item(subject=f"MailItem {i}") for i in range(3)]
+    with SMTPSink() as sink:
+        email = emailee.AsyncThreads(
+            mailList,
+            emailee.ServerConfig(sink.host, port=sink.port, timeout=5),
+            outputFile=str(tmp_path / "output.txt"),
+        )
+    assert len(sink.messages) == 3
+    assert sorted(i["subject"] for i in email.emailReport) == [
+        "MailItem 0",
+        "MailItem 1",
+        "MailItem 2",
+    ]
+
+
+def test_send_mixed_items_multiprocessing(tmp_path):
+    mailList = [
+        helper_mail_item(subject="MailItem"),
+        {
+            "sender": "fake.sender@fakeemail.com",
+            "subject": "dict",
+            "to": ["fake.receiver@fakeemail.com"],
+        },
+    ]
+    with SMTPSink() as sinkA, SMTPSink() as sinkB:
+        email = emailee.AsyncMP(
+            mailList,
+            [
+                emailee.ServerConfig(sinkA.host, port=sinkA.port, timeout=5),
+                {"smtpServer": sinkB.host, "port": sinkB.port, "timeout": 5},
+            ],
+            outputFile=str(tmp_path / "output.txt"),
+            maxProcesses=2,
+        )
+    assert len(sinkA.messages) + len(sinkB.messages) == 2
+    assert sorted(i["subject"] for i in email.emailReport) == ["MailItem", "dict"]
+    # the caller's dict isn't filled in with defaults
+    assert "replyTo" not in mailList[1]
@@ -0,0 +1,121 @@
+from pathlib import Path
+
+import pytest
+
+import emailee
+import emailee.emailee_validate as emailee_validate
+from emailee.emailee_validate import _validateMailList
+from tests.smtp_sink import SMTPSink, fakeMailItem, fakeMailList, sinkServer
+
+ATTACHMENTS = Path(__file__).parent / "test_attachments"
+
+
+def helper_invalid_items():
+    # mail items with one problem each, by the index they're put at
+    return {
+        1: fakeMailItem(["not an address"]),
+        3: fakeMailItem(attachmentFiles=["missing-attachment.txt"]),
+        4: fakeMailItem(subject="s" * 256),
+        6: fakeMailItem(sender=""),
+        7: "not a mail item",
+    }
+
+
+def helper_mail_list(count):
+    mailList = fakeMailList(count)
+    for index, mailItem in helper_invalid_items().items():
+        mailList[index] = mailItem
+    return mailList
+
+
+# --- validation tests --- #
+
+
+def test_validate_mail_list():
+    report = _validateMailList(helper_mail_list(10))
+    assert [i["index"] for i in report] == sorted(helper_invalid_items())
+    assert all(i["outcome"] == "invalid" and i["error"] for i in report)
+    assert "subject string too long" in report[2]["error"]
+    assert report[4] == {"index": 7, "error": report[4]["error"], "outcome": "invalid"}
+
+
+def test_validate_ignore_errors():
+    mailItem = fakeMailItem(
+        ["not an address", "fake.receiver@fakeemail.com"], ignoreErrors=True
+    )
+    assert _validateMailList([mailItem]) == []
+
+
+def test_validate_attachment_size():
+    attachment = str(ATTACHMENTS / "kitten_pic.jpg")
+    size = Path(attachment).stat().st_size
+    mailList = [fakeMailItem(attachmentFiles=[attachment])]
+    assert _validateMailList(mailList, maxAttachmentSize=size) == []
+    [report] = _validateMailList(mailList, maxAttachmentSize=size - 1)
+    assert "Attachment is over" in report["error"]
+
+
+def test_validate_parallel(monkeypatch):
+    monkeypatch.setattr(emailee_validate, "_PARALLEL_MIN_ITEMS", 10)
+    mailList = helper_mail_list(40)
+    assert _validateMailList(mailList, processes=2) == _validateMailList(mailList)
+
+
+# --- AsyncThreads/AsyncMP validation tests --- #
+
+
+@pytest.mark.parametrize(
+    "bad_kwargs, error",
+    [
+        ({"preflight": 1}, TypeError),
+        ({"maxAttachmentSize": "1"}, TypeError),
+        ({"maxAttachmentSize": True}, TypeError),
+        ({"maxAttachmentSize": 0}, ValueError),
+    ],
+)
+def test_validation_invalid_options(bad_kwargs, error, tmp_path):
+    with pytest.raises(error):
+        emailee.AsyncThreads(
+            fakeMailList(1), {}, outputFile=str(tmp_path / "output.txt"), **bad_kwargs
+        )
+
+
+@pytest.mark.parametrize("senderClass", [emailee.AsyncThreads, emailee.AsyncMP])
+def test_preflight_sends_nothing(senderClass, tmp_path):
+    with SMTPSink() as sink:
+        emails = senderClass(
+            helper_mail_list(10),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            preflight=True,
+            autoRun=False,
+        )
+        with pytest.raises(ValueError, match="5 mail items failed validation"):
+            emails.run()
+    assert sink.messages == []
+    assert [i["index"] for i in emails.validationReport] == sorted(
+        helper_invalid_items()
+    )
+
+
+def test_preflight_valid_list_sent(tmp_path):
+    with SMTPSink() as sink:
+        emails = emailee.AsyncThreads(
+            fakeMailList(3),
+            sinkServer(sink.port),
+            outputFile=str(tmp_path / "output.txt"),
+            preflight=True,
+        )
+    assert emails.validationReport == []
+    assert len(sink.messages) == 3
+
+
+def test_validate_without_sending(tmp_path):
+    emails = emailee.AsyncMP(
+        helper_mail_list(10),
+        {},
+        outputFile=str(tmp_path / "output.txt"),
+        autoRun=False,
+    )
+    assert emails.validate() == emails.validationReport
+    assert len(emails.validationReport) == 5